@@ -5,10 +5,11 @@
 
 from ._checking import check_host_services, execute_checkmk_checks, get_aggregated_result
 from .active import active_check_checking
-from .commandline import commandline_checking
+from .commandline import commandline_batch_checking, commandline_checking
 
 __all__ = [
     "active_check_checking",
+    "commandline_batch_checking",
     "commandline_checking",
     "check_host_services",
     "execute_checkmk_checks",
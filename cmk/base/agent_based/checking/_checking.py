@@ -48,6 +48,7 @@ from cmk.utils.type_defs.result import Result
 from cmk.snmplib.type_defs import SNMPBackendEnum, SNMPRawData
 
 from cmk.core_helpers import FetcherType
+from cmk.core_helpers.timing import PhaseTimes
 from cmk.core_helpers.type_defs import SectionNameCollection, SourceInfo
 
 import cmk.base.api.agent_based.register as agent_based_register
@@ -97,6 +98,7 @@ def execute_checkmk_checks(
     run_plugin_names: Container[CheckPluginName],
     selected_sections: SectionNameCollection,
     submitter: Submitter,
+    phase_times: Optional[PhaseTimes] = None,
 ) -> ActiveCheckResult:
     config_cache = config.get_config_cache()
     host_config = config_cache.get_host_config(hostname)
@@ -115,7 +117,7 @@ def execute_checkmk_checks(
         logger=logging.getLogger("cmk.base.checking"),
     )
     store_piggybacked_sections(host_sections)
-    broker = make_broker(host_sections)
+    broker = make_broker(host_sections, cache_parse_results=config.parse_result_cache)
     with CPUTracker() as tracker:
         service_results = check_host_services(
             config_cache=config_cache,
@@ -131,6 +133,7 @@ def execute_checkmk_checks(
                 host_config,
                 parsed_sections_broker=broker,
             )
+        broker.save_parse_results()
         timed_results = [
             *summarize_host_sections(
                 source_results=source_results,
@@ -151,7 +154,9 @@ def execute_checkmk_checks(
         ]
     return ActiveCheckResult.from_subresults(
         *timed_results,
-        _timing_results(tracker.duration, tuple((f[0], f[2]) for f in fetched)),
+        _timing_results(
+            tracker.duration, tuple((f[0], f[2]) for f in fetched), phase_times=phase_times
+        ),
     )
 
 
@@ -178,7 +183,10 @@ def _do_inventory_actions_during_checking_for(
 
 
 def _timing_results(
-    total_times: Snapshot, fetched: Sequence[Tuple[SourceInfo, Snapshot]]
+    total_times: Snapshot,
+    fetched: Sequence[Tuple[SourceInfo, Snapshot]],
+    *,
+    phase_times: Optional[PhaseTimes] = None,
 ) -> ActiveCheckResult:
     for duration in (f[1] for f in fetched):
         total_times += duration
@@ -212,6 +220,12 @@ def _timing_results(
     for phase, duration in summary.items():
         perfdata.append("cmk_time_%s=%.3f" % (phase, duration.idle))
 
+    if phase_times is not None:
+        for phase_name, phase_time in sorted(phase_times.by_phase().items()):
+            perfdata.append("cmk_time_%s=%.3f" % (phase_name, phase_time.seconds))
+            if phase_time.nbytes:
+                perfdata.append("cmk_bytes_%s=%d" % (phase_name, phase_time.nbytes))
+
     return ActiveCheckResult(0, infotext, (), perfdata)
 
 
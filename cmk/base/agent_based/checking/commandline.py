@@ -3,9 +3,12 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import multiprocessing
+from contextlib import nullcontext
 from functools import partial
-from typing import Callable, Container, Optional
+from typing import Callable, Container, Iterable, Iterator, Optional, Tuple
 
+import cmk.utils.debug
 import cmk.utils.version as cmk_version
 from cmk.utils.check_utils import ActiveCheckResult
 from cmk.utils.exceptions import OnError
@@ -14,6 +17,7 @@ from cmk.utils.type_defs import CheckPluginName, EVERYTHING, HostAddress, HostNa
 
 from cmk.snmplib.type_defs import SNMPBackendEnum
 
+from cmk.core_helpers import timing
 from cmk.core_helpers.type_defs import Mode, NO_SELECTION, SectionNameCollection
 
 import cmk.base.agent_based.error_handling as error_handling
@@ -24,6 +28,8 @@ from cmk.base.submitters import Submitter
 
 from ._checking import execute_checkmk_checks
 
+_BatchResult = Tuple[HostName, ServiceState, str]
+
 
 def commandline_checking(
     host_name: HostName,
@@ -59,6 +65,76 @@ def commandline_checking(
     )
 
 
+def commandline_batch_checking(
+    host_names: Iterable[HostName],
+    *,
+    run_plugin_names: Container[CheckPluginName] = EVERYTHING,
+    selected_sections: SectionNameCollection = NO_SELECTION,
+    make_submitter: Callable[[HostName], Submitter],
+    workers: int = 1,
+) -> Iterator[_BatchResult]:
+    """Check many hosts with the configuration and plugins loaded once
+
+    The hosts are checked by `workers` forked processes, the results are
+    yielded as soon as they are available (not in the order of the hosts).
+    """
+    job = partial(
+        _batch_checking,
+        run_plugin_names=run_plugin_names,
+        selected_sections=selected_sections,
+        make_submitter=make_submitter,
+    )
+    if workers <= 1:
+        yield from map(job, host_names)
+        return
+
+    # The job is inherited by the forked workers, only host names and results are pickled.
+    with multiprocessing.get_context("fork").Pool(
+        workers, initializer=_init_batch_worker, initargs=(job,)
+    ) as pool:
+        yield from pool.imap_unordered(_run_batch_job, host_names)
+
+
+_batch_job: Optional[Callable[[HostName], _BatchResult]] = None
+
+
+def _init_batch_worker(job: Callable[[HostName], _BatchResult]) -> None:
+    global _batch_job
+    _batch_job = job
+
+
+def _run_batch_job(host_name: HostName) -> _BatchResult:
+    assert _batch_job is not None
+    return _batch_job(host_name)
+
+
+def _batch_checking(
+    host_name: HostName,
+    *,
+    run_plugin_names: Container[CheckPluginName],
+    selected_sections: SectionNameCollection,
+    make_submitter: Callable[[HostName], Submitter],
+) -> _BatchResult:
+    output = []
+    try:
+        state = commandline_checking(
+            host_name,
+            None,
+            run_plugin_names=run_plugin_names,
+            selected_sections=selected_sections,
+            submitter=make_submitter(host_name),
+            active_check_handler=lambda _host_name, text: output.append(text),
+            # Keep the output away from stdout, we report it with the host name.
+            keepalive=True,
+        )
+    except Exception as exc:
+        # Do not let one host (e.g. an unknown one) stop the batch.
+        if cmk.utils.debug.enabled():
+            raise
+        return host_name, 3, f"{exc}"
+    return host_name, state, "".join(output)
+
+
 def _commandline_checking(
     host_name: HostName,
     ipaddress: Optional[HostAddress],
@@ -76,29 +152,33 @@ def _commandline_checking(
     if ipaddress is None and not host_config.is_cluster:
         ipaddress = config.lookup_ip_address(host_config)
 
-    fetched = fetch_all(
-        make_sources(
-            host_config,
-            ipaddress,
-            ip_lookup=lambda host_name: config.lookup_ip_address(
-                config_cache.get_host_config(host_name)
+    with (
+        timing.record(host_name) if config.fetch_phase_statistics else nullcontext()
+    ) as phase_times:
+        fetched = fetch_all(
+            make_sources(
+                host_config,
+                ipaddress,
+                ip_lookup=lambda host_name: config.lookup_ip_address(
+                    config_cache.get_host_config(host_name)
+                ),
+                selected_sections=selected_sections,
+                force_snmp_cache_refresh=False,
+                on_scan_error=OnError.RAISE,
+                simulation_mode=config.simulation_mode,
+                missing_sys_description=config.get_config_cache().in_binary_hostlist(
+                    host_config.hostname,
+                    config.snmp_without_sys_descr,
+                ),
+                file_cache_max_age=host_config.max_cachefile_age,
             ),
+            mode=Mode.CHECKING if selected_sections is NO_SELECTION else Mode.FORCE_SECTIONS,
+        )
+        return execute_checkmk_checks(
+            hostname=host_name,
+            fetched=fetched,
+            run_plugin_names=run_plugin_names,
             selected_sections=selected_sections,
-            force_snmp_cache_refresh=False,
-            on_scan_error=OnError.RAISE,
-            simulation_mode=config.simulation_mode,
-            missing_sys_description=config.get_config_cache().in_binary_hostlist(
-                host_config.hostname,
-                config.snmp_without_sys_descr,
-            ),
-            file_cache_max_age=host_config.max_cachefile_age,
-        ),
-        mode=Mode.CHECKING if selected_sections is NO_SELECTION else Mode.FORCE_SECTIONS,
-    )
-    return execute_checkmk_checks(
-        hostname=host_name,
-        fetched=fetched,
-        run_plugin_names=run_plugin_names,
-        selected_sections=selected_sections,
-        submitter=submitter,
-    )
+            submitter=submitter,
+            phase_times=phase_times,
+        )
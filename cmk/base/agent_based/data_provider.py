@@ -5,9 +5,15 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import marshal
+import os
+import pickle
+from pathlib import Path
 from typing import (
     Any,
+    Callable,
     Dict,
     Final,
     Iterable,
@@ -22,8 +28,12 @@ from typing import (
     TYPE_CHECKING,
 )
 
+import cmk.utils.debug
+import cmk.utils.paths
 import cmk.utils.piggyback
+import cmk.utils.store as store
 import cmk.utils.tty as tty
+import cmk.utils.version as cmk_version
 from cmk.utils.log import console
 from cmk.utils.type_defs import (
     AgentRawData,
@@ -67,6 +77,132 @@ class ResolvedResult(NamedTuple):
     section: SectionPlugin
 
 
+class ParseResultCache:
+    """Parsed sections of a host, kept from one check cycle to the next
+
+    Cached agent sections and persisted sections mostly deliver the very same
+    raw data cycle after cycle.  For those we keep the parsed object along with
+    a hash of the raw data and of the parse function.  Only the entries used in
+    the current cycle are saved, the other ones are evicted.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path: Final = path
+        self._loaded: Optional[Dict[SectionName, Tuple[bytes, bytes]]] = None
+        self._current: Dict[SectionName, Tuple[bytes, bytes]] = {}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._path!r})"
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @classmethod
+    def for_host(cls, host_key: HostKey) -> ParseResultCache:
+        return cls(
+            Path(
+                cmk.utils.paths.tmp_dir,
+                "parsed_sections",
+                host_key.source_type.name.lower(),
+                str(host_key.hostname),
+            )
+        )
+
+    def _load(self) -> Dict[SectionName, Tuple[bytes, bytes]]:
+        if self._loaded is not None:
+            return self._loaded
+        try:
+            self._loaded = pickle.loads(self._path.read_bytes())
+        except FileNotFoundError:
+            self._loaded = {}
+        except Exception:
+            if cmk.utils.debug.enabled():
+                raise
+            self._loaded = {}
+        assert self._loaded is not None
+        return self._loaded
+
+    def get(self, section_name: SectionName, key: bytes) -> ParsedSectionContent:
+        """The parsed section stored for `key`
+
+        Raises:
+            KeyError, if there is none.
+
+        """
+        entry = self._load().get(section_name)
+        if entry is None or entry[0] != key:
+            raise KeyError(section_name)
+        try:
+            parsed = pickle.loads(entry[1])
+        except Exception as exc:
+            if cmk.utils.debug.enabled():
+                raise
+            raise KeyError(section_name) from exc
+        self._current[section_name] = entry
+        return parsed
+
+    def set(self, section_name: SectionName, key: bytes, parsed: ParsedSectionContent) -> None:
+        # Pickle right away: the check functions may modify the parsed section.
+        try:
+            self._current[section_name] = (key, pickle.dumps(parsed))
+        except Exception:
+            # Some parse functions return objects that cannot be pickled.
+            self._current.pop(section_name, None)
+
+    def save(self) -> None:
+        if self._current == self._load():
+            return
+        try:
+            if not self._current:
+                self._path.unlink(missing_ok=True)
+            else:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                store.save_bytes_to_file(self._path, pickle.dumps(self._current))
+        except Exception:
+            if cmk.utils.debug.enabled():
+                raise
+            return
+        self._loaded = dict(self._current)
+
+
+_plugin_versions: Dict[SectionName, bytes] = {}
+
+
+def _plugin_version(section: SectionPlugin) -> bytes:
+    """The code of the parse function, including the code it wraps"""
+    if (version := _plugin_versions.get(section.name)) is not None:
+        return version
+
+    hasher = hashlib.blake2b(cmk_version.__version__.encode(), digest_size=16)
+    functions: List[Callable] = [section.parse_function]
+    while functions:
+        function = functions.pop()
+        code = getattr(function, "__code__", None)
+        if code is None:
+            continue
+        hasher.update(marshal.dumps(code))
+        try:
+            hasher.update(str(os.stat(code.co_filename).st_mtime_ns).encode())
+        except OSError:
+            pass
+        # The wrappers of the legacy parse functions keep them in their closure.
+        functions.extend(
+            cell.cell_contents
+            for cell in function.__closure__ or ()
+            if callable(cell.cell_contents)
+        )
+    return _plugin_versions.setdefault(section.name, hasher.digest())
+
+
+def _parse_cache_key(section: SectionPlugin, raw_data: object) -> Optional[bytes]:
+    try:
+        dumped = marshal.dumps(raw_data)
+    except ValueError:
+        return None
+    return hashlib.blake2b(dumped, digest_size=16, key=_plugin_version(section)).digest()
+
+
 class SectionsParser:
     """Call the sections parse function and return the parsing result."""
 
@@ -74,12 +210,15 @@ class SectionsParser:
         self,
         host_sections: HostSections,
         host_name: HostName,
+        *,
+        parse_cache: Optional[ParseResultCache] = None,
     ) -> None:
         super().__init__()
         self._host_sections = host_sections
         self._parsing_errors: List[str] = []
         self._memoized_results: Dict[SectionName, Optional[ParsingResult]] = {}
         self._host_name = host_name
+        self._parse_cache = parse_cache
 
     def __repr__(self) -> str:
         return "%s(host_sections=%r, host_name=%r)" % (
@@ -110,14 +249,31 @@ class SectionsParser:
         for section_name in raw_section_names:
             self._memoized_results[section_name] = None
 
+    def save_parse_results(self) -> None:
+        if self._parse_cache is not None:
+            self._parse_cache.save()
+
     def _parse_raw_data(self, section: SectionPlugin) -> Any:  # yes *ANY*
         try:
             raw_data = self._host_sections.sections[section.name]
         except KeyError:
             return None
 
+        # Only cached and persisted sections are likely to be unchanged.
+        cache_key = (
+            _parse_cache_key(section, raw_data)
+            if self._parse_cache is not None and self._get_cache_info(section.name) is not None
+            else None
+        )
+        if cache_key is not None:
+            assert self._parse_cache is not None
+            try:
+                return self._parse_cache.get(section.name, cache_key)
+            except KeyError:
+                pass
+
         try:
-            return section.parse_function(list(raw_data))
+            parsed = section.parse_function(list(raw_data))
         except Exception:
             if cmk.utils.debug.enabled():
                 raise
@@ -132,6 +288,11 @@ class SectionsParser:
             )
             return None
 
+        if cache_key is not None and parsed is not None:
+            assert self._parse_cache is not None
+            self._parse_cache.set(section.name, cache_key, parsed)
+        return parsed
+
     def _get_cache_info(self, section_name: SectionName) -> CacheInfo:
         return self._host_sections.cache_info.get(section_name)
 
@@ -297,6 +458,10 @@ class ParsedSectionsBroker:
             start=[],
         )
 
+    def save_parse_results(self) -> None:
+        for _resolver, parser in self._providers.values():
+            parser.save_parse_results()
+
 
 def parse_messages(
     fetched: Iterable[Tuple[SourceInfo, result.Result[AgentRawData | SNMPRawData, Exception]]],
@@ -360,6 +525,8 @@ def store_piggybacked_sections(collected_host_sections: Mapping[HostKey, HostSec
 
 def make_broker(
     host_sections: Mapping[HostKey, HostSections],
+    *,
+    cache_parse_results: bool = False,
 ) -> ParsedSectionsBroker:
     return ParsedSectionsBroker(
         {
@@ -370,7 +537,13 @@ def make_broker(
                         for section_name in host_sections.sections
                     ],
                 ),
-                SectionsParser(host_sections=host_sections, host_name=host_key.hostname),
+                SectionsParser(
+                    host_sections=host_sections,
+                    host_name=host_key.hostname,
+                    parse_cache=(
+                        ParseResultCache.for_host(host_key) if cache_parse_results else None
+                    ),
+                ),
             )
             for host_key, host_sections in host_sections.items()
         }
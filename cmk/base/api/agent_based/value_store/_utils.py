@@ -3,6 +3,7 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import marshal
 from ast import literal_eval
 from contextlib import contextmanager
 from pathlib import Path
@@ -33,12 +34,17 @@ from cmk.utils.type_defs import CheckPluginName, HostName, Item, ServiceID
 
 _PluginName = str
 _UserKey = str
-_ValueStoreKey = Tuple[HostName, _PluginName, Item, _UserKey]
+_ServiceKey = Tuple[HostName, _PluginName, Item]
 
 _TKey = TypeVar("_TKey", bound=Hashable)
 _TValue = TypeVar("_TValue")
 _TDefault = TypeVar("_TDefault")
 
+# The removed keys and the updated items of a service
+_ServiceChanges = Tuple[Container[_UserKey], Iterable[Tuple[_UserKey, Any]]]
+
+_MAGIC: Final = b"CMKVAL01"
+
 
 class _DynamicDiskSyncedMapping(Dict[_TKey, _TValue]):
     """Represents the values that have been changed in a session
@@ -69,11 +75,12 @@ class _DynamicDiskSyncedMapping(Dict[_TKey, _TValue]):
         return super().pop(key, *args)
 
 
-class _StaticDiskSyncedMapping(Mapping[_TKey, _TValue]):
+class _StaticDiskSyncedMapping(Mapping[_ServiceKey, Mapping[_UserKey, Any]]):
     """Represents the values stored on disk
 
     This class provides a Mapping-interface for the values stored
-    on disk.
+    on disk, by service.  The values of every service are serialized
+    separately and only deserialized when they are accessed.
 
     The only way to modify the values is the disksync method.
     """
@@ -83,36 +90,35 @@ class _StaticDiskSyncedMapping(Mapping[_TKey, _TValue]):
         *,
         path: Path,
         log_debug: Callable[[str], None],
-        serializer: Callable[[Mapping[_TKey, _TValue]], str],
-        deserializer: Callable[[str], Mapping[_TKey, _TValue]],
     ) -> None:
         self._path: Final = path
         self._last_sync: Optional[float] = None
-        self._data: Mapping[_TKey, _TValue] = {}
+        self._raw: Mapping[_ServiceKey, bytes] = {}
+        self._data: Dict[_ServiceKey, Mapping[_UserKey, Any]] = {}
         self._log_debug = log_debug
-        self._serializer: Final = serializer
-        self._deserializer: Final = deserializer
         self.disksync()
 
-    def __getitem__(self, key: _TKey) -> _TValue:
-        return self._data.__getitem__(key)
+    def __getitem__(self, key: _ServiceKey) -> Mapping[_UserKey, Any]:
+        try:
+            return self._data[key]
+        except KeyError:
+            pass
+        values = self._data[key] = marshal.loads(self._raw[key])
+        return values
 
-    def __iter__(self) -> Iterator[_TKey]:
-        return self._data.__iter__()
+    def __iter__(self) -> Iterator[_ServiceKey]:
+        return self._raw.__iter__()
 
     def __len__(self) -> int:
-        return len(self._data)
+        return len(self._raw)
 
-    def disksync(
-        self,
-        *,
-        removed: Container[_TKey] = (),
-        updated: Iterable[Tuple[_TKey, _TValue]] = (),
-    ) -> None:
+    def disksync(self, *, changes: Optional[Mapping[_ServiceKey, _ServiceChanges]] = None) -> None:
         """Re-load and write the changes of the stored values
 
         This method will reload the values from disk, apply the changes (remove keys
-        and update values) as specified by the arguments, and then write the result to disk.
+        and update values of the services) as specified by the arguments, and then write
+        the result to disk.  Only the services whose values have actually changed are
+        serialized again, and nothing is written if there are none.
 
         When this method returns, the data provided via the Mapping-interface and
         the data stored on disk must be in sync.
@@ -128,16 +134,27 @@ class _StaticDiskSyncedMapping(Mapping[_TKey, _TValue]):
                 self._log_debug("already loaded")
             else:
                 self._log_debug("loading from disk")
-                self._data = self._deserializer(
-                    store.load_text_from_file(self._path, default="{}", lock=False)
-                )
-
-            if removed or updated:
-                data = {k: v for k, v in self._data.items() if k not in removed}
-                data.update(updated)
+                self._raw = _deserialize(store.load_bytes_from_file(self._path))
+                self._data = {}
+
+            raw = dict(self._raw)
+            data = {}
+            for key, (removed, updated) in (changes or {}).items():
+                values = {k: v for k, v in self.get(key, {}).items() if k not in removed}
+                values.update(updated)
+                if not values:
+                    raw.pop(key, None)
+                    continue
+                if (serialized := marshal.dumps(values)) != raw.get(key):
+                    raw[key] = serialized
+                    data[key] = values
+
+            if len(raw) != len(self._raw) or data:
                 self._log_debug("writing to disk")
-                store.save_text_to_file(self._path, self._serializer(data))
-                self._data = data
+                store.save_bytes_to_file(self._path, _MAGIC + marshal.dumps(raw))
+                self._raw = raw
+                self._data = {k: v for k, v in self._data.items() if k in raw}
+                self._data.update(data)
 
             self._last_sync = self._path.stat().st_mtime
         except Exception as exc:
@@ -146,37 +163,35 @@ class _StaticDiskSyncedMapping(Mapping[_TKey, _TValue]):
             store.release_lock(self._path)
 
 
+def _deserialize(raw: bytes) -> Mapping[_ServiceKey, bytes]:
+    if not raw:
+        return {}
+    if raw.startswith(_MAGIC):
+        return marshal.loads(raw[len(_MAGIC) :])
+
+    # Written by an older version: the repr of all values of the host.
+    legacy: Dict[_ServiceKey, Dict[_UserKey, Any]] = {}
+    for (host_name, plugin_name, item, user_key), value in literal_eval(raw.decode()).items():
+        legacy.setdefault((host_name, plugin_name, item), {})[user_key] = value
+    return {key: marshal.dumps(values) for key, values in legacy.items()}
+
+
 class _DiskSyncedMapping(MutableMapping[_TKey, _TValue]):  # pylint: disable=too-many-ancestors
     """Implements the overlay logic between dynamic and static value store"""
 
-    @classmethod
-    def make(
-        cls,
-        *,
-        path: Path,
-        log_debug: Callable[[str], None],
-        serializer: Callable[[Mapping[_TKey, _TValue]], str],
-        deserializer: Callable[[str], Mapping[_TKey, _TValue]],
-    ) -> "_DiskSyncedMapping":
-        return cls(
-            dynamic=_DynamicDiskSyncedMapping(),
-            static=_StaticDiskSyncedMapping(
-                path=path,
-                log_debug=log_debug,
-                serializer=serializer,
-                deserializer=deserializer,
-            ),
-        )
-
     def __init__(
         self,
         *,
         dynamic: _DynamicDiskSyncedMapping[_TKey, _TValue],
-        static: _StaticDiskSyncedMapping[_TKey, _TValue],
+        static: Mapping[_TKey, _TValue],
     ) -> None:
         self._dynamic = dynamic
         self.static = static
 
+    def changes(self) -> Tuple[Set[_TKey], Iterable[Tuple[_TKey, _TValue]]]:
+        """The removed keys and the updated items"""
+        return self._dynamic.removed_keys, self._dynamic.items()
+
     def _keys(self) -> Set[_TKey]:
         return {
             k
@@ -217,55 +232,38 @@ class _DiskSyncedMapping(MutableMapping[_TKey, _TValue]):  # pylint: disable=too
     def __len__(self) -> int:
         return len(self._keys())
 
-    def commit(self) -> None:
-        self.static.disksync(
-            removed=self._dynamic.removed_keys,
-            updated=self._dynamic.items(),
-        )
-        self._dynamic = _DynamicDiskSyncedMapping()
-
 
 class _ValueStore(MutableMapping[_UserKey, Any]):  # pylint: disable=too-many-ancestors
     """Implements the mutable mapping that is exposed to the plugins
 
     This class ensures that every service has its own name space in the
-    persisted values, by adding the service ID (check plugin name and item) to
-    the user supplied keys.
+    persisted values: the values are stored by service ID (check plugin
+    name and item), and this is the mapping of one service.
     """
 
-    def __init__(
-        self,
-        *,
-        data: MutableMapping[_ValueStoreKey, Any],
-        service_id: Tuple[CheckPluginName, Item],
-        host_name: HostName,
-    ) -> None:
-        self._prefix = (host_name, str(service_id[0]), service_id[1])
+    def __init__(self, *, data: MutableMapping[_UserKey, Any]) -> None:
         self._data = data
 
-    def _map_key(self, user_key: _UserKey) -> _ValueStoreKey:
+    @staticmethod
+    def _check_key(user_key: _UserKey) -> _UserKey:
         if not isinstance(user_key, _UserKey):
             raise TypeError(f"value store key must be {_UserKey}")
-        return (self._prefix[0], self._prefix[1], self._prefix[2], user_key)
+        return user_key
 
     def __getitem__(self, key: _UserKey) -> Any:
-        return self._data.__getitem__(self._map_key(key))
+        return self._data.__getitem__(self._check_key(key))
 
     def __setitem__(self, key: _UserKey, value: Any) -> Any:
-        return self._data.__setitem__(self._map_key(key), value)
+        return self._data.__setitem__(self._check_key(key), value)
 
     def __delitem__(self, key: _UserKey) -> Any:
-        return self._data.__delitem__(self._map_key(key))
+        return self._data.__delitem__(self._check_key(key))
 
     def __iter__(self) -> Iterator[_UserKey]:
-        return (
-            user_key
-            for (host_name, check_name, item, user_key) in self._data
-            if (host_name, check_name, item) == self._prefix
-        )
+        return self._data.__iter__()
 
     def __len__(self) -> int:
-        return sum(1 for _ in self)
+        return len(self._data)
 
 
 class ValueStoreManager:
@@ -284,15 +282,26 @@ class ValueStoreManager:
     STORAGE_PATH = Path(cmk.utils.paths.counters_dir)
 
     def __init__(self, host_name: HostName) -> None:
-        self._value_store: _DiskSyncedMapping[_ValueStoreKey, Any] = _DiskSyncedMapping.make(
+        self._value_store = _StaticDiskSyncedMapping(
             path=self.STORAGE_PATH / str(host_name),
             log_debug=lambda x: logger.debug("value store: %s", x),
-            serializer=repr,
-            deserializer=literal_eval,
         )
+        # The services whose values have been accessed in this session
+        self._service_stores: Dict[_ServiceKey, _DiskSyncedMapping[_UserKey, Any]] = {}
         self.active_service_interface: Optional[_ValueStore] = None
         self._host_name = host_name
 
+    def _service_store(self, key: _ServiceKey) -> _DiskSyncedMapping[_UserKey, Any]:
+        try:
+            return self._service_stores[key]
+        except KeyError:
+            pass
+        service_store = self._service_stores[key] = _DiskSyncedMapping(
+            dynamic=_DynamicDiskSyncedMapping(),
+            static=self._value_store.get(key, {}),
+        )
+        return service_store
+
     @contextmanager
     def namespace(
         self, service_id: ServiceID, host_name: Optional[HostName] = None
@@ -305,7 +314,7 @@ class ValueStoreManager:
             host_name = self._host_name
         old_sif = self.active_service_interface
         self.active_service_interface = _ValueStore(
-            data=self._value_store, service_id=service_id, host_name=host_name
+            data=self._service_store((host_name, str(service_id[0]), service_id[1]))
         )
         try:
             yield
@@ -314,5 +323,10 @@ class ValueStoreManager:
 
     def save(self) -> None:
         """Write all current values of this host to disk"""
-        if isinstance(self._value_store, _DiskSyncedMapping):
-            self._value_store.commit()
+        changes: Dict[_ServiceKey, _ServiceChanges] = {}
+        for key, service_store in self._service_stores.items():
+            removed, updated = service_store.changes()
+            if removed or updated:
+                changes[key] = (removed, updated)
+        self._value_store.disksync(changes=changes)
+        self._service_stores = {}
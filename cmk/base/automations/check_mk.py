@@ -25,6 +25,7 @@ import cmk.utils.debug
 import cmk.utils.log as log
 import cmk.utils.man_pages as man_pages
 import cmk.utils.password_store
+import cmk.utils.piggyback as piggyback
 from cmk.utils.diagnostics import deserialize_cl_parameters, DiagnosticsCLParameters
 from cmk.utils.encoding import ensure_str_with_fallback
 from cmk.utils.exceptions import MKBailOut, MKGeneralException, MKSNMPError, OnError
@@ -53,11 +54,13 @@ from cmk.utils.type_defs import (
     DiscoveredHostLabelsDict,
     DiscoveryResult,
     HostAddress,
+    HostKey,
     HostName,
     ServiceDetails,
     ServiceState,
     SetAutochecksTable,
     SetAutochecksTablePre20,
+    SourceType,
 )
 
 from cmk.automations import results as automation_results
@@ -68,7 +71,7 @@ from cmk.snmplib.type_defs import BackendOIDSpec, BackendSNMPTree, SNMPCredentia
 
 import cmk.core_helpers.cache
 from cmk.core_helpers import factory, FetcherType, get_raw_data
-from cmk.core_helpers.cache import FileCacheGlobals
+from cmk.core_helpers.cache import FileCacheGlobals, SectionStore
 from cmk.core_helpers.program import ProgramFetcher
 from cmk.core_helpers.summarize import summarize
 from cmk.core_helpers.tcp import TCPFetcher
@@ -88,6 +91,7 @@ import cmk.base.notify as notify
 import cmk.base.parent_scan
 import cmk.base.plugin_contexts as plugin_contexts
 import cmk.base.sources as sources
+from cmk.base.agent_based.data_provider import ParseResultCache
 from cmk.base.api.agent_based.checking_classes import CheckPlugin
 from cmk.base.autochecks import AutocheckEntry, AutocheckServiceWithNodes
 from cmk.base.automations import Automation, automations, MKAutomationError
@@ -454,15 +458,20 @@ class AutomationRenameHosts(Automation):
             if self._rename_host_file(tmp_dir + "/" + d + "/", oldname, newname):
                 actions.append(d)
 
-        if self._rename_host_dir(tmp_dir + "/piggyback/", oldname, newname):
+        # The locks of the persisted sections are created again when needed
+        for path in _section_store_lock_paths(oldname):
+            path.unlink(missing_ok=True)
+
+        # The parsed sections are cached for one check cycle only
+        for path in _parse_result_cache_paths(HostName(oldname)):
+            path.unlink(missing_ok=True)
+
+        if piggyback.rename_piggybacked_host(HostName(oldname), HostName(newname)):
             actions.append("piggyback-load")
 
         # Rename piggy files *created* by the host
-        piggybase = tmp_dir + "/piggyback/"
-        if os.path.exists(piggybase):
-            for piggydir in os.listdir(piggybase):
-                if self._rename_host_file(piggybase + piggydir, oldname, newname):
-                    actions.append("piggyback-pig")
+        if piggyback.rename_source_host(HostName(oldname), HostName(newname)):
+            actions.append("piggyback-pig")
 
         # Logwatch
         if self._rename_host_dir(logwatch_dir, oldname, newname):
@@ -879,6 +888,21 @@ class AutomationAnalyseHost(Automation):
 automations.register(AutomationAnalyseHost())
 
 
+def _section_store_lock_paths(hostname: str) -> list[Path]:
+    """The lock files of the persisted sections of the host, see `SectionStore`"""
+    store_paths = [Path(var_dir, "persisted", hostname)]
+    persisted_sections_dir = Path(var_dir, "persisted_sections")
+    if persisted_sections_dir.is_dir():
+        store_paths.extend(source_dir / hostname for source_dir in persisted_sections_dir.iterdir())
+    return [SectionStore.lock_path_of(path) for path in store_paths]
+
+
+def _parse_result_cache_paths(hostname: HostName) -> list[Path]:
+    return [
+        ParseResultCache.for_host(HostKey(hostname, source_type)).path for source_type in SourceType
+    ]
+
+
 class ABCDeleteHosts:
     needs_config = False
     needs_checks = False
@@ -908,6 +932,14 @@ class ABCDeleteHosts:
             filename = "%s/%s/%s" % (data_source_cache_dir, data_source_name, hostname)
             self._delete_if_exists(filename)
 
+    def _delete_section_store_locks(self, hostname: HostName) -> None:
+        for path in _section_store_lock_paths(hostname):
+            self._delete_if_exists(str(path))
+
+    def _delete_parse_result_caches(self, hostname: HostName) -> None:
+        for path in _parse_result_cache_paths(hostname):
+            self._delete_if_exists(str(path))
+
     def _delete_baked_agents(self, hostname: HostName) -> None:
         # softlinks for baked agents. obsolete packages are removed upon next bake action
         # TODO: Move to bakery code
@@ -917,16 +949,14 @@ class ABCDeleteHosts:
                 self._delete_if_exists("%s/%s" % (folder, hostname))
 
     def _delete_logwatch_and_piggyback_dirs(self, hostname: HostName) -> None:
-        # logwatch and piggyback folders
-        for what_dir in [
-            "%s/%s" % (logwatch_dir, hostname),
-            "%s/piggyback/%s" % (tmp_dir, hostname),
-        ]:
-            try:
-                shutil.rmtree(what_dir)
-            except OSError as e:
-                if e.errno != errno.ENOENT:
-                    raise
+        # logwatch folder
+        try:
+            shutil.rmtree("%s/%s" % (logwatch_dir, hostname))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+        piggyback.remove_piggybacked_host_data(hostname)
 
     def _delete_if_exists(self, path: str) -> None:
         """Delete the given file or folder in case it exists"""
@@ -969,6 +999,8 @@ class AutomationDeleteHosts(ABCDeleteHosts, Automation):
             self._delete_if_exists(path)
 
         self._delete_datasource_dirs(hostname)
+        self._delete_section_store_locks(hostname)
+        self._delete_parse_result_caches(hostname)
         self._delete_baked_agents(hostname)
         self._delete_logwatch_and_piggyback_dirs(hostname)
 
@@ -1009,6 +1041,8 @@ class AutomationDeleteHostsKnownRemote(ABCDeleteHosts, Automation):
             self._delete_if_exists(path)
 
         self._delete_datasource_dirs(hostname)
+        self._delete_section_store_locks(hostname)
+        self._delete_parse_result_caches(hostname)
         self._delete_logwatch_and_piggyback_dirs(hostname)
 
 
@@ -12,6 +12,7 @@ import inspect
 import ipaddress
 import itertools
 import marshal
+import mmap
 import os
 import pickle
 import py_compile
@@ -64,6 +65,7 @@ import cmk.utils.tags
 import cmk.utils.translations
 import cmk.utils.version as cmk_version
 from cmk.utils.caching import config_cache as _config_cache
+from cmk.utils.caching import LRUCache
 from cmk.utils.check_utils import maincheckify, section_name_of, unwrap_parameters
 from cmk.utils.config_path import ConfigPath
 from cmk.utils.exceptions import MKGeneralException, MKIPAddressLookupError, MKTerminate
@@ -372,6 +374,8 @@ def load_packed_config(config_path: ConfigPath) -> None:
 def _initialize_config() -> None:
     _add_check_variables_to_default_config()
     load_default_config()
+    global _precomputed_check_parameters
+    _precomputed_check_parameters = {}
 
 
 def _perform_post_config_loading_actions() -> None:
@@ -832,14 +836,114 @@ class PackedConfigGenerator:
 
             helper_config[varname] = val
 
+        #
+        # Add the configured parameters of the discovered services
+        #
+
+        helper_config["_precomputed_check_parameters"] = self._precompute_check_parameters(
+            active_hosts
+        )
+
         return helper_config
 
+    def _precompute_check_parameters(
+        self, hostnames: Iterable[HostName]
+    ) -> Dict[HostName, Dict[_CheckParametersKey, TimespecificParameters]]:
+        """Resolve the check parameter rulesets now instead of at every check
+
+        The parameters of enforced services are part of their rules, we only
+        need this for the discovered services.
+        """
+        precomputed: Dict[HostName, Dict[_CheckParametersKey, TimespecificParameters]] = {}
+        for hostname in hostnames:
+            for service in self._config_cache.get_autochecks_of(hostname):
+                plugin = agent_based_register.get_check_plugin(service.check_plugin_name)
+                if plugin is None:
+                    continue
+                host = self._config_cache.host_of_clustered_service(hostname, service.description)
+                of_host = precomputed.setdefault(host, {})
+                if (key := (plugin.name, service.item)) not in of_host:
+                    of_host[key] = _get_configured_parameters(host, plugin, service.item)
+        return precomputed
+
+
+class PluginIndexStore:
+    """The plugins needed for checking each host of the activated configuration"""
+
+    _MAGIC: Final = b"CMKPLX01"
+
+    def __init__(self, path: Path) -> None:
+        self.path: Final = path
+
+    @classmethod
+    def from_serial(cls, config_path: ConfigPath) -> PluginIndexStore:
+        return cls(Path(config_path) / "plugin_index")
+
+    def write(self, index: Mapping[HostName, NeededPlugins]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        store.save_bytes_to_file(
+            self.path,
+            self._MAGIC
+            + marshal.dumps(
+                {
+                    str(hostname): (
+                        tuple(entry.agent_based_modules),
+                        tuple(entry.legacy_check_files),
+                    )
+                    for hostname, entry in index.items()
+                }
+            ),
+        )
+
+    def read(self) -> Mapping[HostName, NeededPlugins]:
+        raw = self.path.read_bytes()
+        if not raw.startswith(self._MAGIC):
+            raise ValueError(f"Invalid plugin index: {self.path}")
+        return {
+            HostName(hostname): NeededPlugins(*entry)
+            for hostname, entry in marshal.loads(raw[len(self._MAGIC) :]).items()
+        }
+
+    def is_current(self) -> bool:
+        """Nothing the index depends on has changed since it was written"""
+        try:
+            index_mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        for path in (
+            *get_config_file_paths(with_conf_d=True),
+            Path(cmk.utils.paths.autochecks_dir),
+            cmk.utils.paths.local_agent_based_plugins_dir,
+            cmk.utils.paths.local_checks_dir,
+        ):
+            try:
+                if path.stat().st_mtime > index_mtime:
+                    return False
+            except FileNotFoundError:
+                continue
+        return True
+
 
 class PackedConfigStore:
-    """Caring about persistence of the packed configuration"""
+    """Caring about persistence of the packed configuration
+
+    The variables holding per host values are split into one shard per host.
+    The shards are stored in a separate file that is mapped into memory and
+    a shard is only unpickled on the first access to one of its hosts, so a
+    helper only pays for the hosts it actually checks.
+    """
+
+    _SHARDED_VARIABLES: Final = (
+        "_precomputed_check_parameters",
+        "explicit_snmp_communities",
+        "host_attributes",
+        "ipaddresses",
+        "ipv6addresses",
+    )
 
     def __init__(self, path: Path) -> None:
         self.path: Final = path
+        self.shards_path: Final = path.with_suffix(".shards")
 
     @classmethod
     def from_serial(cls, config_path: ConfigPath) -> PackedConfigStore:
@@ -851,14 +955,111 @@ class PackedConfigStore:
 
     def write(self, helper_config: Mapping[str, Any]) -> None:
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        sharded = [name for name in self._SHARDED_VARIABLES if name in helper_config]
+        shards: Dict[HostName, Dict[str, Any]] = {}
+        for varname in sharded:
+            for hostname, value in helper_config[varname].items():
+                shards.setdefault(hostname, {})[varname] = value
+        store.save_bytes_to_file(self.shards_path, _HostShards.serialize(sharded, shards))
+
         tmp_path = self.path.with_suffix(self.path.suffix + ".compiled")
         with tmp_path.open("wb") as compiled_file:
-            pickle.dump(helper_config, compiled_file)
+            pickle.dump(
+                {name: value for name, value in helper_config.items() if name not in sharded},
+                compiled_file,
+            )
         tmp_path.rename(self.path)
 
     def read(self) -> Mapping[str, Any]:
         with self.path.open("rb") as f:
-            return pickle.load(f)  # nosec B301 # BNS:c3c5e9
+            helper_config = pickle.load(f)  # nosec B301 # BNS:c3c5e9
+        try:
+            shards = _HostShards(self.shards_path)
+        except FileNotFoundError:
+            # Written by a version without shards.
+            return helper_config
+        for varname in shards.variables:
+            helper_config[varname] = _ShardedHostMapping(shards, varname)
+        return helper_config
+
+
+class _HostShards:
+    """The per host values of the packed configuration
+
+    File format: magic, length of the header, marshalled header, pickled shards.
+    The header holds the names of the sharded variables and, for every host,
+    the offset and length of its shard and the variables in the shard.
+    """
+
+    _MAGIC: Final = b"CMKSHD01"
+    _LENGTH: Final = struct.Struct("!Q")
+
+    def __init__(self, path: Path) -> None:
+        with path.open("rb") as f:
+            self._data: Final = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = len(self._MAGIC) + self._LENGTH.size
+        if self._data[: len(self._MAGIC)] != self._MAGIC:
+            raise ValueError(f"Invalid packed config shards: {path}")
+        (header_length,) = self._LENGTH.unpack_from(self._data, len(self._MAGIC))
+        variables, hosts = marshal.loads(self._data[start : start + header_length])
+        self.variables: Final[Sequence[str]] = variables
+        self._hosts: Final[Mapping[str, Tuple[int, int, Sequence[str]]]] = hosts
+        self._offset: Final = start + header_length
+        self._loaded: Dict[str, Mapping[str, Any]] = {}
+
+    @classmethod
+    def serialize(
+        cls, variables: Sequence[str], shards: Mapping[HostName, Mapping[str, Any]]
+    ) -> bytes:
+        hosts = {}
+        pickled = []
+        offset = 0
+        for hostname, shard in shards.items():
+            data = pickle.dumps(shard)
+            hosts[str(hostname)] = (offset, len(data), tuple(shard))
+            pickled.append(data)
+            offset += len(data)
+        header = marshal.dumps((tuple(variables), hosts))
+        return b"".join((cls._MAGIC, cls._LENGTH.pack(len(header)), header, *pickled))
+
+    def hosts_with(self, varname: str) -> Iterator[HostName]:
+        return (
+            HostName(hostname)
+            for hostname, (_offset, _length, variables) in self._hosts.items()
+            if varname in variables
+        )
+
+    def get(self, hostname: HostName) -> Mapping[str, Any]:
+        if (shard := self._loaded.get(hostname)) is not None:
+            return shard
+        try:
+            offset, length, _variables = self._hosts[hostname]
+        except KeyError:
+            return {}
+        start = self._offset + offset
+        return self._loaded.setdefault(
+            hostname, pickle.loads(self._data[start : start + length])  # nosec B301 # BNS:c3c5e9
+        )
+
+
+class _ShardedHostMapping(Mapping[HostName, Any]):
+    """One variable of the packed configuration, read from the host shards"""
+
+    def __init__(self, shards: _HostShards, varname: str) -> None:
+        self._shards: Final = shards
+        self._varname: Final = varname
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._varname!r})"
+
+    def __getitem__(self, hostname: HostName) -> Any:
+        return self._shards.get(hostname)[self._varname]
+
+    def __iter__(self) -> Iterator[HostName]:
+        return self._shards.hosts_with(self._varname)
+
+    def __len__(self) -> int:
+        return sum(1 for _hostname in self)
 
 
 @contextlib.contextmanager
@@ -1547,6 +1748,47 @@ def load_all_agent_based_plugins(
     return errors
 
 
+class NeededPlugins(NamedTuple):
+    agent_based_modules: Sequence[str]
+    legacy_check_files: Sequence[str]
+
+
+def load_agent_based_plugins_of(
+    hostnames: Iterable[HostName],
+    get_check_api_context: GetCheckApiContext,
+) -> Optional[List[str]]:
+    """Load only the checks and includes needed for checking the given hosts
+
+    The needed plugins are looked up in the plugin index of the activated
+    configuration.  Returns None if that is not possible, for example because
+    the configuration or the discovered services changed since the activation.
+    The caller has to load all plugins then.
+    """
+    index_store = PluginIndexStore.from_serial(cmk.utils.config_path.LATEST_CONFIG)
+    if not index_store.is_current():
+        return None
+    try:
+        index = index_store.read()
+        needed = [index[hostname] for hostname in hostnames]
+    except (OSError, ValueError, KeyError):
+        if cmk.utils.debug.enabled():
+            raise
+        return None
+
+    _initialize_data_structures()
+
+    errors = agent_based_register.load_selected_plugins(
+        sorted({module for entry in needed for module in entry.agent_based_modules})
+    )
+    errors.extend(
+        load_checks(
+            get_check_api_context,
+            sorted({path for entry in needed for path in entry.legacy_check_files}),
+        )
+    )
+    return errors
+
+
 def _initialize_data_structures() -> None:
     """Initialize some data structures which are populated while loading the checks"""
     global _all_checks_loaded
@@ -2270,6 +2512,14 @@ def get_host_label_parameters(
     )
 
 
+_CheckParametersKey = Tuple[CheckPluginName, Item]
+
+# Set by load_packed_config(): the configured parameters computed on activation.
+_precomputed_check_parameters: Mapping[
+    HostName, Mapping[_CheckParametersKey, TimespecificParameters]
+] = {}
+
+
 def compute_check_parameters(
     host: HostName,
     plugin_name: CheckPluginName,
@@ -2284,6 +2534,8 @@ def compute_check_parameters(
     if plugin is None:  # handle vanished check plugin
         return TimespecificParameters()
 
+    if configured_parameters is None:
+        configured_parameters = _precomputed_check_parameters.get(host, {}).get((plugin_name, item))
     if configured_parameters is None:
         configured_parameters = _get_configured_parameters(host, plugin, item)
 
@@ -2708,6 +2960,15 @@ class HostConfig:
             return 10
         return bulk_sizes[0]
 
+    @property
+    def snmp_max_parallel_walks(self) -> int:
+        max_parallel_walks = self._config_cache.host_extra_conf(
+            self.hostname, snmp_max_parallel_walks
+        )
+        if not max_parallel_walks:
+            return 1
+        return max_parallel_walks[0]
+
     def _snmp_character_encoding(self) -> Optional[str]:
         entries = self._config_cache.host_extra_conf(self.hostname, snmp_character_encodings)
         if not entries:
@@ -2738,10 +2999,16 @@ class HostConfig:
             host_backend = host_backend_config[0]
             if with_inline_snmp and host_backend == "inline":
                 return SNMPBackendEnum.INLINE
-            if host_backend == "classic":
+            # "pysnmp" is a leftover of the 2.1 beta, which used the classic backend.
+            if host_backend in ("classic", "pysnmp"):
                 return SNMPBackendEnum.CLASSIC
+            if host_backend == "pysnmp_backend":
+                return SNMPBackendEnum.PYSNMP
             raise MKGeneralException("Bad Host SNMP Backend configuration: %s" % host_backend)
 
+        if snmp_backend_default == "pysnmp_backend":
+            return SNMPBackendEnum.PYSNMP
+
         # TODO(sk): remove this when netsnmp is fixed
         # NOTE: Force usage of CLASSIC with SNMP-v1 to prevent memory leak in the netsnmp
         if self._is_host_snmp_v1():
@@ -3437,6 +3704,7 @@ class ConfigCache:
             clusters_of=self._clusters_of_cache,
             nodes_of=self._nodes_of_cache,
             all_configured_hosts=self._all_configured_hosts,
+            cache_size=ruleset_matching_cache_size,
         )
 
         self._all_active_clusters = set(_filter_active_hosts(self, self._all_configured_clusters))
@@ -3450,12 +3718,12 @@ class ConfigCache:
 
         self._cache_section_name_of: Dict[CheckPluginNameStr, str] = {}
 
-        self._cache_match_object_service: Dict[
+        self._cache_match_object_service: LRUCache[
             Tuple[HostName, ServiceName], RulesetMatchObject
-        ] = {}
-        self._cache_match_object_service_checkgroup: Dict[
+        ] = LRUCache("config_cache_match_object_service", ruleset_matching_cache_size)
+        self._cache_match_object_service_checkgroup: LRUCache[
             Tuple[HostName, Item, ServiceName], RulesetMatchObject
-        ] = {}
+        ] = LRUCache("config_cache_match_object_service_checkgroup", ruleset_matching_cache_size)
         self._cache_match_object_host: Dict[HostName, RulesetMatchObject] = {}
 
         # Host lookup
@@ -3785,8 +4053,10 @@ class ConfigCache:
         """
 
         cache_id = (hostname, svc_desc)
-        if cache_id in self._cache_match_object_service:
+        try:
             return self._cache_match_object_service[cache_id]
+        except KeyError:
+            pass
         if svc_labels is None:
             svc_labels = self.ruleset_matcher.labels_of_service(hostname, svc_desc)
         result = RulesetMatchObject(
@@ -3811,8 +4081,10 @@ class ConfigCache:
         """
 
         cache_id = (hostname, item, svc_desc)
-        if cache_id in self._cache_match_object_service_checkgroup:
+        try:
             return self._cache_match_object_service_checkgroup[cache_id]
+        except KeyError:
+            pass
 
         result = RulesetMatchObject(
             host_name=hostname,
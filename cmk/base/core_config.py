@@ -397,12 +397,29 @@ def _create_core_config(
     config_cache = config.get_config_cache()
     with config_path.create(is_cmc=core.is_cmc()), _backup_objects_file(core):
         core.create_config(config_path, config_cache, hosts_to_update=hosts_to_update)
+        _create_plugin_index(config_path, config_cache)
 
     cmk.utils.password_store.save_for_helpers(config_path)
 
     return get_configuration_warnings()
 
 
+def _create_plugin_index(config_path: VersionedConfigPath, config_cache: ConfigCache) -> None:
+    """Let the commands checking single hosts load only the plugins they need"""
+    from cmk.base.core_nagios import get_needed_plugins  # pylint: disable=import-outside-toplevel
+
+    index = {}
+    for hostname in sorted(config_cache.all_active_hosts() | config_cache.all_active_clusters()):
+        try:
+            index[hostname] = get_needed_plugins(config_cache, hostname)
+        except MKGeneralException as e:
+            # The commands will load all plugins for this host.
+            if cmk.utils.debug.enabled():
+                raise
+            console.verbose("Cannot determine the needed plugins of %s: %s\n", hostname, e)
+    config.PluginIndexStore.from_serial(config_path).write(index)
+
+
 def _verify_non_deprecated_checkgroups() -> None:
     """Verify that the user has no deprecated check groups configured."""
     # 'check_plugin.check_ruleset_name' is of type RuleSetName, which is an ABCName (good),
@@ -1103,30 +1103,7 @@ def _dump_precompiled_hostcheck(  # pylint: disable=too-many-branches
         needed_legacy_check_plugin_names,
         needed_agent_based_check_plugin_names,
         needed_agent_based_inventory_plugin_names,
-    ) = _get_needed_plugin_names(host_config)
-
-    if host_config.is_cluster:
-        if host_config.nodes is None:
-            raise TypeError()
-
-        for node_config in (config_cache.get_host_config(node) for node in host_config.nodes):
-            (
-                node_needed_legacy_check_plugin_names,
-                node_needed_agent_based_check_plugin_names,
-                node_needed_agent_based_inventory_plugin_names,
-            ) = _get_needed_plugin_names(node_config)
-            needed_legacy_check_plugin_names.update(node_needed_legacy_check_plugin_names)
-            needed_agent_based_check_plugin_names.update(node_needed_agent_based_check_plugin_names)
-            needed_agent_based_inventory_plugin_names.update(
-                node_needed_agent_based_inventory_plugin_names
-            )
-
-    needed_legacy_check_plugin_names.update(
-        _get_required_legacy_check_sections(
-            needed_agent_based_check_plugin_names,
-            needed_agent_based_inventory_plugin_names,
-        )
-    )
+    ) = _get_needed_plugin_names_with_nodes(config_cache, host_config)
 
     if not any(
         (
@@ -1320,6 +1297,64 @@ if '-d' in sys.argv:
     return output.getvalue()
 
 
+def get_needed_plugins(config_cache: ConfigCache, hostname: HostName) -> config.NeededPlugins:
+    """The agent based modules and legacy check files needed to check a host"""
+    (
+        needed_legacy_check_plugin_names,
+        needed_agent_based_check_plugin_names,
+        needed_agent_based_inventory_plugin_names,
+    ) = _get_needed_plugin_names_with_nodes(config_cache, config_cache.get_host_config(hostname))
+    return config.NeededPlugins(
+        agent_based_modules=_get_needed_agent_based_modules(
+            needed_agent_based_check_plugin_names,
+            needed_agent_based_inventory_plugin_names,
+        ),
+        legacy_check_files=sorted(
+            _get_legacy_check_file_names_to_load(needed_legacy_check_plugin_names)
+        ),
+    )
+
+
+def _get_needed_plugin_names_with_nodes(
+    config_cache: ConfigCache,
+    host_config: HostConfig,
+) -> Tuple[Set[CheckPluginNameStr], Set[CheckPluginName], Set[InventoryPluginName]]:
+    (
+        needed_legacy_check_plugin_names,
+        needed_agent_based_check_plugin_names,
+        needed_agent_based_inventory_plugin_names,
+    ) = _get_needed_plugin_names(host_config)
+
+    if host_config.is_cluster:
+        if host_config.nodes is None:
+            raise TypeError()
+
+        for node_config in (config_cache.get_host_config(node) for node in host_config.nodes):
+            (
+                node_needed_legacy_check_plugin_names,
+                node_needed_agent_based_check_plugin_names,
+                node_needed_agent_based_inventory_plugin_names,
+            ) = _get_needed_plugin_names(node_config)
+            needed_legacy_check_plugin_names.update(node_needed_legacy_check_plugin_names)
+            needed_agent_based_check_plugin_names.update(node_needed_agent_based_check_plugin_names)
+            needed_agent_based_inventory_plugin_names.update(
+                node_needed_agent_based_inventory_plugin_names
+            )
+
+    needed_legacy_check_plugin_names.update(
+        _get_required_legacy_check_sections(
+            needed_agent_based_check_plugin_names,
+            needed_agent_based_inventory_plugin_names,
+        )
+    )
+
+    return (
+        needed_legacy_check_plugin_names,
+        needed_agent_based_check_plugin_names,
+        needed_agent_based_inventory_plugin_names,
+    )
+
+
 def _get_needed_plugin_names(
     host_config: HostConfig,
 ) -> Tuple[Set[CheckPluginNameStr], Set[CheckPluginName], Set[InventoryPluginName]]:
@@ -7,6 +7,7 @@
 import os
 import sys
 import traceback
+import zlib
 from pathlib import Path
 from typing import Any, Dict, Literal, Mapping, Optional, Union
 
@@ -23,6 +24,8 @@ from cmk.utils.type_defs import (
     ServiceName,
 )
 
+from cmk.core_helpers.cache import read_cache_file
+
 CrashReportStore = crash_reporting.CrashReportStore
 
 
@@ -177,8 +180,7 @@ def _read_snmp_info(hostname: str) -> Optional[bytes]:
 def _read_agent_output(hostname: str) -> Optional[AgentRawData]:
     cache_path = Path(cmk.utils.paths.tcp_cache_dir, hostname)
     try:
-        with cache_path.open(mode="rb") as f:
-            return AgentRawData(f.read())
-    except IOError:
+        return AgentRawData(read_cache_file(cache_path))
+    except (IOError, zlib.error):
         pass
     return None
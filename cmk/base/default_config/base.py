@@ -60,6 +60,12 @@ default_host_group = "check_mk"
 check_max_cachefile_age = 0  # per default do not use cache files when checking
 cluster_max_cachefile_age = 90  # secs.
 piggyback_max_cachefile_age = 3600  # secs
+agent_file_cache_compression = False
+use_special_agent_forkserver = False
+fetch_phase_statistics = False
+parse_result_cache = False
+# Maximum number of entries of each of the ruleset matching caches (None: unbounded)
+ruleset_matching_cache_size: _Optional[int] = 200000
 # Ruleset for translating piggyback host names
 piggyback_translation: Ruleset[object] = []
 # Ruleset for translating service descriptions
@@ -85,7 +91,7 @@ http_proxies: dict[str, dict[str, str]] = {}
 # SNMP communities and encoding
 
 # Global config for SNMP Backend
-snmp_backend_default: _Literal["inline", "classic"] = "inline"
+snmp_backend_default: _Literal["inline", "classic", "pysnmp_backend"] = "inline"
 # Deprecated: Replaced by snmp_backend_hosts
 use_inline_snmp: bool = True
 
@@ -98,6 +104,8 @@ non_inline_snmp_hosts: Ruleset[object] = []
 snmp_limit_oid_range: Ruleset[object] = []
 # Ruleset to customize bulk size
 snmp_bulk_size: Ruleset[object] = []
+# Ruleset to walk the columns of SNMP tables concurrently
+snmp_max_parallel_walks: Ruleset[object] = []
 snmp_default_community = "public"
 snmp_communities: Ruleset[object] = []
 # override the rule based configuration
@@ -5,7 +5,7 @@
 
 import os
 import sys
-from collections.abc import Callable, Container, Mapping, Sequence
+from collections.abc import Callable, Container, Iterable, Iterator, Mapping, Sequence
 from functools import partial
 from pathlib import Path
 from typing import Final, Literal, overload, Protocol, TypedDict, TypeVar, Union
@@ -14,6 +14,7 @@ import cmk.utils.debug
 import cmk.utils.log as log
 import cmk.utils.paths
 import cmk.utils.piggyback as piggyback
+import cmk.utils.render as render
 import cmk.utils.store as store
 import cmk.utils.tty as tty
 import cmk.utils.version as cmk_version
@@ -695,6 +696,61 @@ modes.register(
     )
 )
 
+# .
+#   .--file-cache-usage----------------------------------------------------.
+#   |                    __ _ _                           _                |
+#   |                   / _(_) | ___        ___ __ _  ___| |__   ___       |
+#   |                  | |_| | |/ _ \_____ / __/ _` |/ __| '_ \ / _ \      |
+#   |                  |  _| | |  __/_____| (_| (_| | (__| | | |  __/      |
+#   |                  |_| |_|_|\___|      \___\__,_|\___|_| |_|\___|      |
+#   |                                                                      |
+#   '----------------------------------------------------------------------'
+
+
+def mode_file_cache_usage() -> None:
+    usage = sources.file_cache_usage()
+    for ident, (files, size) in usage.items():
+        out.output("%-30s %8d files %12s\n" % (ident, files, render.fmt_bytes(size)))
+
+    total = sum(size for _files, size in usage.values())
+    out.output(
+        "%s%-30s %8d files %12s%s\n"
+        % (
+            tty.bold,
+            "Total",
+            sum(files for files, _size in usage.values()),
+            render.fmt_bytes(total),
+            tty.normal,
+        )
+    )
+
+    try:
+        fs = os.statvfs(cmk.utils.paths.tmp_dir)
+    except OSError:
+        return
+    if fs_size := fs.f_blocks * fs.f_frsize:
+        out.output(
+            "%.1f%% of the %s available in %s\n"
+            % (100.0 * total / fs_size, render.fmt_bytes(fs_size), cmk.utils.paths.tmp_dir)
+        )
+
+
+modes.register(
+    Mode(
+        long_option="file-cache-usage",
+        handler_function=mode_file_cache_usage,
+        needs_config=False,
+        short_help="Show the space used by the cached data of the sources",
+        long_help=[
+            "Lists the number of files and the space used by the file caches "
+            "of every source type. The caches are kept in the temporary "
+            "file system (tmpfs) of the site, so this is memory taken from the system. "
+            "Enable the compression of the agent file caches in the global settings "
+            "to lower it.",
+        ],
+    )
+)
+
 # .
 #   .--package-------------------------------------------------------------.
 #   |                                 _                                    |
@@ -1897,8 +1953,117 @@ def register_mode_check(
     )
 
 
+_CheckingBatchOptions = TypedDict(
+    "_CheckingBatchOptions",
+    {
+        "cache": Literal[True],
+        "no-cache": Literal[True],
+        "no-tcp": Literal[True],
+        "usewalk": Literal[True],
+        "no-submit": bool,
+        "perfdata": bool,
+        "workers": int,
+        "detect-sections": frozenset[SectionName],
+        "plugins": frozenset[CheckPluginName],
+        "detect-plugins": frozenset[str],
+    },
+    total=False,
+)
+
+
+def _read_host_names(stream: Iterable[str]) -> Iterator[HostName]:
+    for line in stream:
+        if (host_name := line.strip()) and not host_name.startswith("#"):
+            yield HostName(host_name)
+
+
+def mode_check_batch(
+    get_submitter_: GetSubmitter,
+    options: _CheckingBatchOptions,
+    args: list[str],
+) -> None:
+    import cmk.base.agent_based.checking as checking  # pylint: disable=import-outside-toplevel
+    import cmk.base.item_state as item_state  # pylint: disable=import-outside-toplevel
+
+    _handle_fetcher_options(options)
+
+    if "no-submit" in options:
+        item_state.continue_on_counter_wrap()
+
+    host_names: Iterable[HostName] = (
+        modes.parse_hostname_list(args) if args else _read_host_names(sys.stdin)
+    )
+    selected_sections, run_plugin_names = _extract_plugin_selection(options, CheckPluginName)
+    for host_name, state, output in checking.commandline_batch_checking(
+        host_names,
+        selected_sections=selected_sections,
+        run_plugin_names=run_plugin_names,
+        make_submitter=partial(
+            get_submitter_,
+            config.check_submission,
+            config.monitoring_core,
+            dry_run=options.get("no-submit", False),
+            perfdata_format="pnp" if config.perfdata_format == "pnp" else "standard",
+            show_perfdata=options.get("perfdata", False),
+        ),
+        workers=options.get("workers", 1),
+    ):
+        sys.stdout.write(
+            "%s\t%d\t%s\n" % (host_name, state, output.rstrip("\n").replace("\n", "\\n"))
+        )
+        sys.stdout.flush()
+
+
+def register_mode_check_batch(get_submitter_: GetSubmitter) -> None:
+    modes.register(
+        Mode(
+            long_option="check-batch",
+            handler_function=partial(mode_check_batch, get_submitter_),
+            argument=True,
+            argument_descr="HOST1 HOST2...",
+            argument_optional=True,
+            short_help="Check all services on many hosts in one process",
+            long_help=[
+                "Execute all checks on the given hosts, like '--check' does for one host. "
+                "The configuration and the plugins are only loaded once. Without hosts on "
+                "the command line, the host names are read from the standard input, one "
+                "per line, and are checked as they come in.",
+                "For every host, one line is written to the standard output: the host name, "
+                "the state and the output of the Check_MK service, separated by tabs. Line "
+                "breaks in the output are written as '\\n'. The lines are written as the "
+                "hosts are done, which is not necessarily the order of the hosts.",
+                "Use '--workers N' to check N hosts in parallel.",
+            ],
+            sub_options=[
+                *_FETCHER_OPTIONS,
+                Option(
+                    long_option="no-submit",
+                    short_option="n",
+                    short_help="Do not submit results to core, do not save counters",
+                ),
+                Option(
+                    long_option="perfdata",
+                    short_option="p",
+                    short_help="Also show performance data (use with -v)",
+                ),
+                Option(
+                    long_option="workers",
+                    argument=True,
+                    argument_descr="N",
+                    argument_conv=int,
+                    short_help="Check up to N hosts in parallel. Defaults to 1.",
+                ),
+                _option_sections,
+                _get_plugins_option(CheckPluginName),
+                _option_detect_plugins,
+            ],
+        )
+    )
+
+
 if cmk_version.edition() is cmk_version.Edition.CRE:
     register_mode_check(get_submitter, active_check_handler=lambda *args: None, keepalive=False)
+    register_mode_check_batch(get_submitter)
 
 # .
 #   .--inventory-----------------------------------------------------------.
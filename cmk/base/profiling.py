@@ -7,11 +7,14 @@ import sys
 from pathlib import Path
 
 from cmk.utils.log import console
+from cmk.utils.rulesets import ruleset_matcher
 
+import cmk.base.config as config
 import cmk.base.obsolete_output as out
 
 _profile = None
 _profile_path = Path("profile.out")
+_ruleset_profile_path = Path("ruleset_profile.txt")
 
 
 def enable() -> None:
@@ -20,6 +23,7 @@ def enable() -> None:
 
     _profile = cProfile.Profile()
     _profile.enable()
+    ruleset_matcher.enable_profiling()
     console.verbose("Enabled profiling.\n")
 
 
@@ -52,3 +56,24 @@ stats.sort_stats('cumtime').print_stats()"""
     out.output(
         "Profile '%s' written. Please run %s.\n" % (_profile_path, show_profile), stream=sys.stderr
     )
+
+    _output_ruleset_profile()
+
+
+def _output_ruleset_profile() -> None:
+    if (profiler := ruleset_matcher.profiler()) is None:
+        return
+
+    _ruleset_profile_path.write_text(profiler.report(_ruleset_names()))
+    out.output("Ruleset profile '%s' written.\n" % _ruleset_profile_path, stream=sys.stderr)
+
+
+def _ruleset_names() -> dict[int, str]:
+    """The rulesets are identified by the ids of the objects in the loaded configuration"""
+    names = {
+        id(value): varname for varname, value in vars(config).items() if isinstance(value, list)
+    }
+    for varname in ["checkgroup_parameters", "static_checks"]:
+        for group, ruleset in getattr(config, varname).items():
+            names[id(ruleset)] = "%s:%s" % (varname, group)
+    return names
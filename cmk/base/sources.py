@@ -19,6 +19,7 @@ from typing import (
     Iterable,
     List,
     Mapping,
+    NamedTuple,
     Optional,
     Sequence,
     Tuple,
@@ -33,7 +34,15 @@ from cmk.utils.type_defs import HostAddress, HostName, result, SectionName, Sour
 
 from cmk.snmplib.type_defs import BackendSNMPTree, SNMPDetectSpec, SNMPRawData, SNMPRawDataSection
 
-from cmk.core_helpers import Fetcher, FetcherType, FileCache, get_raw_data, NoFetcher, Parser
+from cmk.core_helpers import (
+    Fetcher,
+    FetcherType,
+    FileCache,
+    get_raw_data,
+    NoFetcher,
+    Parser,
+    timing,
+)
 from cmk.core_helpers.agent import AgentFileCache, AgentParser, AgentRawData, AgentRawDataSection
 from cmk.core_helpers.cache import FileCacheGlobals, FileCacheMode, MaxAge, SectionStore
 from cmk.core_helpers.config import AgentParserConfig, SNMPParserConfig
@@ -60,6 +69,7 @@ from cmk.base.config import HostConfig
 
 __all__ = [
     "fetch_all",
+    "file_cache_usage",
     "make_non_cluster_sources",
     "make_sources",
     "make_plugin_store",
@@ -76,7 +86,8 @@ def parse(
 ) -> result.Result[HostSections[AgentRawDataSection | SNMPRawDataSection], Exception]:
     parser = _make_parser(source, logger=logger)
     try:
-        return raw_data.map(partial(parser.parse, selection=selection))
+        with timing.source(source.ident):
+            return raw_data.map(partial(parser.parse, selection=selection))
     except Exception as exc:
         return result.Error(exc)
 
@@ -141,6 +152,47 @@ def make_file_cache_path_template(
     }[fetcher_type]
 
 
+class FileCacheUsage(NamedTuple):
+    files: int
+    size: int
+
+
+def file_cache_usage() -> Mapping[str, FileCacheUsage]:
+    """Number of files and bytes used by the file caches, by source ident
+
+    The caches live in tmpfs, so this is the memory they take from the site.
+
+    """
+    # See `make_file_cache_path_template()` for the layout.
+    roots = [("agent", Path(cmk.utils.paths.tcp_cache_dir))]
+    try:
+        roots.extend(
+            (p.name, p) for p in Path(cmk.utils.paths.data_source_cache_dir).iterdir() if p.is_dir()
+        )
+    except FileNotFoundError:
+        pass
+
+    usage: Dict[str, FileCacheUsage] = {}
+    for ident, root in sorted(roots):
+        files = size = 0
+        for dirpath, _dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                try:
+                    size += os.stat(os.path.join(dirpath, filename)).st_size
+                except FileNotFoundError:
+                    continue  # removed in the meantime
+                files += 1
+        usage[ident] = FileCacheUsage(files, size)
+    return usage
+
+
+def _agent_file_cache_mode() -> FileCacheMode:
+    file_cache_mode = FileCacheGlobals.file_cache_mode()
+    if file_cache_mode is FileCacheMode.DISABLED or not config.agent_file_cache_compression:
+        return file_cache_mode
+    return file_cache_mode | FileCacheMode.COMPRESSED
+
+
 def _make_agent_parser_config(hostname: HostName) -> AgentParserConfig:
     # Move to `cmk.base.config` once the direction of the dependencies
     # has been fixed (ie, as little components as possible get the full,
@@ -396,6 +448,7 @@ class _Builder:
                 do_status_data_inventory=self.host_config.do_status_data_inventory,
                 section_store_path=make_persisted_section_dir(source),
                 snmp_config=self.host_config.snmp_config(source.ipaddress),
+                max_parallel_walks=self.host_config.snmp_max_parallel_walks,
             ),
             SNMPFileCache(
                 source.hostname,
@@ -446,6 +499,7 @@ class _Builder:
                     do_status_data_inventory=self.host_config.do_status_data_inventory,
                     section_store_path=make_persisted_section_dir(source),
                     snmp_config=self.host_config.snmp_config(source.ipaddress),
+                    max_parallel_walks=self.host_config.snmp_max_parallel_walks,
                 ),
                 SNMPFileCache(
                     source.hostname,
@@ -493,7 +547,7 @@ class _Builder:
                     use_outdated=self.simulation_mode or FileCacheGlobals.use_outdated,
                     simulation=self.simulation_mode,
                     use_only_cache=False,
-                    file_cache_mode=FileCacheGlobals.file_cache_mode(),
+                    file_cache_mode=_agent_file_cache_mode(),
                 ),
             )
         else:
@@ -534,7 +588,7 @@ class _Builder:
                     use_outdated=self.simulation_mode or FileCacheGlobals.use_outdated,
                     simulation=self.simulation_mode,
                     use_only_cache=False,
-                    file_cache_mode=FileCacheGlobals.file_cache_mode(),
+                    file_cache_mode=_agent_file_cache_mode(),
                 ),
             )
 
@@ -595,7 +649,7 @@ class _Builder:
                     use_outdated=self.simulation_mode or FileCacheGlobals.use_outdated,
                     simulation=self.simulation_mode,
                     use_only_cache=FileCacheGlobals.tcp_use_only_cache,
-                    file_cache_mode=FileCacheGlobals.file_cache_mode(),
+                    file_cache_mode=_agent_file_cache_mode(),
                 ),
             )
         raise NotImplementedError(f"connection mode {connection_mode!r}")
@@ -626,6 +680,7 @@ class _Builder:
                     params,
                 ),
                 is_cmc=config.is_cmc(),
+                use_forkserver=config.use_special_agent_forkserver,
             )
             file_cache = AgentFileCache(
                 source.hostname,
@@ -636,7 +691,7 @@ class _Builder:
                 use_outdated=self.simulation_mode or FileCacheGlobals.use_outdated,
                 simulation=self.simulation_mode,
                 use_only_cache=False,
-                file_cache_mode=FileCacheGlobals.file_cache_mode(),
+                file_cache_mode=_agent_file_cache_mode(),
             )
             yield source, fetcher, file_cache
 
@@ -677,7 +732,7 @@ def fetch_all(
     for source, file_cache, fetcher in sources:
         console.vverbose("  Source: %s\n" % (source,))
 
-        with CPUTracker() as tracker:
+        with CPUTracker() as tracker, timing.source(source.ident):
             raw_data = get_raw_data(file_cache, fetcher, mode)
         out.append((source, raw_data, tracker.duration))
     return out
@@ -5,10 +5,12 @@
 """This is an unsorted collection of functions which are needed in
 Check_MK modules and/or cmk.base modules code."""
 
+import logging
 import signal
 from types import FrameType
 from typing import NoReturn, Optional
 
+from cmk.utils.caching import lru_cache_statistics
 from cmk.utils.exceptions import MKTerminate
 
 # .
@@ -31,3 +33,29 @@ def _handle_keepalive_interrupt(signum: int, frame: Optional[FrameType]) -> NoRe
 
 def register_sigint_handler() -> None:
     signal.signal(signal.SIGINT, _handle_keepalive_interrupt)
+
+
+# register SIGUSR1 handler for dumping the cache statistics of long running processes
+def _handle_cache_statistics_request(signum: int, frame: Optional[FrameType]) -> None:
+    log_cache_statistics(logging.WARNING)
+
+
+def register_cache_statistics_handler() -> None:
+    signal.signal(signal.SIGUSR1, _handle_cache_statistics_request)
+
+
+def log_cache_statistics(level: int) -> None:
+    logger = logging.getLogger("cmk.base")
+    for name, info in lru_cache_statistics().items():
+        lookups = info.hits + info.misses
+        logger.log(
+            level,
+            "Cache %s: %d/%s entries, %d hits, %d misses (%.1f%% hit rate), %d evictions",
+            name,
+            info.size,
+            "unbounded" if info.maxsize is None else info.maxsize,
+            info.hits,
+            info.misses,
+            100.0 * info.hits / lookups if lookups else 0.0,
+            info.evictions,
+        )
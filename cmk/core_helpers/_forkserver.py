@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Run the Python special agents in children of a warm interpreter
+
+Most special agents are thin wrappers calling the `main()` function of a
+module in `cmk.special_agents`.  Executing them starts a new interpreter
+that imports the module and its (often heavy) dependencies, over and over.
+
+The fork server is a long-lived process that imports the agent modules
+once and forks a child for every run.  The child gets the argv, stdin,
+stdout and stderr the executed agent would get and only has to call
+`main()`.  Its exit code is that of the executed agent.
+
+Protocol, over a SOCK_SEQPACKET socket pair, one agent at a time:
+
+    client                                      server
+    {"module": ..., "argv": [...]} + 3 fds  ->
+                                            <-  {"pid": ...} (from the child) or {"error": ...}
+                                            <-  {"returncode": ...}
+
+"""
+
+import importlib
+import json
+import logging
+import os
+import re
+import selectors
+import shlex
+import socket
+import subprocess
+import sys
+from collections.abc import Callable, Sequence
+from contextlib import suppress
+from pathlib import Path
+from typing import Final, IO
+
+__all__ = ["ForkedProcess", "ForkServer", "special_agent_argv"]
+
+# Imported by the server on startup, the agent modules are imported on first use.
+_PRELOAD: Final = (
+    "cmk.special_agents.utils.agent_common",
+    "cmk.special_agents.utils.argument_parsing",
+    "requests",
+)
+
+_WRAPPER_IMPORT: Final = re.compile(r"from (cmk\.special_agents\.[\w.]+) import main")
+_WRAPPER_LINES: Final[Sequence[str | re.Pattern[str]]] = (
+    "import sys",
+    _WRAPPER_IMPORT,
+    'if __name__ == "__main__":',
+    "sys.exit(main())",
+)
+# Command lines using any of these need a shell.
+_SHELL_SPECIAL: Final = frozenset("\n\\$`*?[]{}~#;&|<>()")
+
+_BUFSIZE: Final = 64 * 1024
+
+
+def special_agent_argv(cmdline: str) -> tuple[str, Sequence[str]] | None:
+    """The module of the special agent and its argv, if it can be forked"""
+    if _SHELL_SPECIAL.intersection(cmdline):
+        return None
+    try:
+        argv = shlex.split(cmdline)
+    except ValueError:
+        return None
+    if not argv:
+        return None
+    module_name = _wrapped_module(Path(argv[0]))
+    if module_name is None:
+        return None
+    return module_name, argv
+
+
+def _wrapped_module(path: Path) -> str | None:
+    try:
+        if path.stat().st_size > 4096:
+            return None
+        lines = [
+            stripped
+            for line in path.read_text().splitlines()
+            if (stripped := line.strip()) and not stripped.startswith("#")
+        ]
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    if len(lines) != len(_WRAPPER_LINES):
+        return None
+    module_name = None
+    for line, expected in zip(lines, _WRAPPER_LINES):
+        if isinstance(expected, str):
+            if line != expected:
+                return None
+        elif (match := expected.fullmatch(line)) is None:
+            return None
+        else:
+            module_name = match.group(1)
+    return module_name
+
+
+class ForkedProcess:
+    """The subset of `subprocess.Popen` the ProgramFetcher uses"""
+
+    def __init__(
+        self,
+        server: "ForkServer",
+        pid: int,
+        *,
+        stdin: IO[bytes] | None,
+        stdout: IO[bytes],
+        stderr: IO[bytes],
+    ) -> None:
+        self._server: Final = server
+        self.pid: Final = pid
+        self.stdin: Final = stdin
+        self.stdout: Final = stdout
+        self.stderr: Final = stderr
+        self.returncode: int | None = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(pid={self.pid!r}, returncode={self.returncode!r})"
+
+    def communicate(self, input: bytes | None = None) -> tuple[bytes, bytes]:
+        # pylint: disable=redefined-builtin
+        output: dict[IO[bytes], list[bytes]] = {self.stdout: [], self.stderr: []}
+        with selectors.DefaultSelector() as selector:
+            for stream in output:
+                selector.register(stream, selectors.EVENT_READ)
+            pending = memoryview(input or b"")
+            if self.stdin is not None:
+                if pending:
+                    os.set_blocking(self.stdin.fileno(), False)
+                    selector.register(self.stdin, selectors.EVENT_WRITE)
+                else:
+                    self.stdin.close()
+
+            while selector.get_map():
+                for key, _events in selector.select():
+                    if key.fileobj is self.stdin:
+                        try:
+                            pending = pending[os.write(key.fd, pending[:_BUFSIZE]) :]
+                        except BrokenPipeError:
+                            pending = pending[:0]
+                        if not pending:
+                            selector.unregister(self.stdin)
+                            self.stdin.close()
+                        continue
+                    chunk = os.read(key.fd, _BUFSIZE)
+                    if chunk:
+                        output[key.fileobj].append(chunk)  # type: ignore[index]
+                    else:
+                        selector.unregister(key.fileobj)
+
+        self.wait()
+        return b"".join(output[self.stdout]), b"".join(output[self.stderr])
+
+    def wait(self) -> int:
+        if self.returncode is None:
+            self.returncode = self._server.wait(self.pid)
+        return self.returncode
+
+
+class ForkServer:
+    def __init__(self) -> None:
+        self._logger: Final = logging.getLogger("cmk.helper.program")
+        self._process: subprocess.Popen | None = None
+        self._socket: socket.socket | None = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+    def _start(self) -> socket.socket:
+        if self._socket is not None:
+            return self._socket
+
+        client, server = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self._process = subprocess.Popen(  # nosec # pylint:disable=consider-using-with
+                [sys.executable, "-m", __name__, str(server.fileno())],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(server.fileno(),),
+                close_fds=True,
+                # Signals for our process group are not meant for the server.
+                start_new_session=True,
+            )
+        except Exception:
+            client.close()
+            raise
+        finally:
+            server.close()
+        self._logger.debug("Started fork server (PID %d)", self._process.pid)
+        self._socket = client
+        return client
+
+    def stop(self) -> None:
+        """Stop the server, it is restarted on the next use"""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._process is not None:
+            # Closing the socket makes the server exit, this is just in case.
+            with suppress(OSError):
+                self._process.kill()
+            self._process.wait()
+            self._process = None
+
+    def _receive(self) -> dict[str, object]:
+        assert self._socket is not None
+        reply = self._socket.recv(_BUFSIZE)
+        if not reply:
+            raise ConnectionError("Fork server exited")
+        return json.loads(reply)
+
+    def spawn(self, module_name: str, argv: Sequence[str], *, with_stdin: bool) -> ForkedProcess:
+        """Run the `main()` of `module_name` in a child of the server
+
+        Raises:
+            OSError, if the server could not start or import the module.
+
+        """
+        stdin_r, stdin_w = os.pipe() if with_stdin else (os.open(os.devnull, os.O_RDONLY), -1)
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            sock = self._start()
+            socket.send_fds(
+                sock,
+                [json.dumps({"module": module_name, "argv": list(argv)}).encode()],
+                [stdin_r, stdout_w, stderr_w],
+            )
+            reply = self._receive()
+        except BaseException:
+            # Also on timeouts: we cannot tell where the server is in the protocol.
+            self.stop()
+            for fd in (stdin_w, stdout_r, stderr_r):
+                if fd >= 0:
+                    os.close(fd)
+            raise
+        finally:
+            for fd in (stdin_r, stdout_w, stderr_w):
+                os.close(fd)
+
+        if "pid" not in reply:
+            # An error, or the child died before it could report its PID.
+            for fd in (stdin_w, stdout_r, stderr_r):
+                if fd >= 0:
+                    os.close(fd)
+            raise OSError(f"Cannot fork {module_name}: {reply}")
+
+        pid = reply["pid"]
+        assert isinstance(pid, int)
+        return ForkedProcess(
+            self,
+            pid,
+            stdin=os.fdopen(stdin_w, "wb") if stdin_w >= 0 else None,
+            stdout=os.fdopen(stdout_r, "rb"),
+            stderr=os.fdopen(stderr_r, "rb"),
+        )
+
+    def wait(self, pid: int) -> int:
+        try:
+            reply = self._receive()
+        except BaseException:
+            self.stop()
+            raise
+        returncode = reply["returncode"]
+        assert isinstance(returncode, int)
+        return returncode
+
+
+def _serve(sock: socket.socket) -> Callable[[], object]:
+    """Serve the client until it goes away, return the job in the forked children"""
+    for module_name in _PRELOAD:
+        with suppress(ImportError):
+            importlib.import_module(module_name)
+
+    while True:
+        try:
+            msg, fds, _flags, _addr = socket.recv_fds(sock, _BUFSIZE, 3)
+        except OSError:
+            sys.exit(0)
+        if not msg:
+            sys.exit(0)
+
+        request = json.loads(msg)
+        try:
+            job = importlib.import_module(request["module"]).main
+            pid = os.fork()
+        except Exception as exc:
+            for fd in fds:
+                os.close(fd)
+            sock.send(json.dumps({"error": str(exc)}).encode())
+            continue
+
+        if pid == 0:
+            # Report the PID only once the child leads its own process group:
+            # the client kills the group on timeouts.
+            os.setsid()
+            sock.send(json.dumps({"pid": os.getpid()}).encode())
+            sock.close()
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+                os.close(fd)
+            sys.argv = request["argv"]
+            return job
+
+        for fd in fds:
+            os.close(fd)
+        _pid, status = os.waitpid(pid, 0)
+        sock.send(json.dumps({"returncode": os.waitstatus_to_exitcode(status)}).encode())
+
+
+def main() -> None:
+    job = _serve(socket.socket(fileno=int(sys.argv[1])))
+    # Leave through the interpreter so that we exit exactly like the executed agent.
+    sys.exit(job())
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from __future__ import annotations
 
 import abc
 import logging
+import re
 import time
 from collections.abc import Iterator, Mapping, MutableMapping, Sequence
 from typing import Any, final, Final, NamedTuple
@@ -17,6 +18,7 @@ import cmk.utils.misc
 from cmk.utils.translations import TranslationOptions
 from cmk.utils.type_defs import AgentRawData, HostName, SectionName
 
+from . import timing
 from ._base import Fetcher, Parser
 from ._markers import PiggybackMarker, SectionMarker
 from .cache import FileCache, SectionStore
@@ -63,6 +65,9 @@ class SectionWithHeader(NamedTuple):
 MutableSection = list[SectionWithHeader]
 ImmutableSection = Sequence[SectionWithHeader]
 
+# All markers start with "<<<", see `PiggybackMarker` and `SectionMarker`.
+_MARKER_CANDIDATE: Final = re.compile(rb"^[ \t\r\f\v]*<<<", re.MULTILINE)
+
 
 class ParserState(abc.ABC):
     """Base class for the state machine.
@@ -139,6 +144,13 @@ class ParserState(abc.ABC):
     def on_piggyback_footer(self, line: bytes) -> ParserState:
         raise NotImplementedError()
 
+    def ignores_data(self, selection: SectionNameCollection) -> bool:
+        """Whether `do_action` would throw the data lines away
+
+        The lines up to the next marker need not be passed to the parser then.
+        """
+        return True
+
     def to_noop_parser(self) -> NOOPParser:
         self._logger.debug("Transition %s -> %s", type(self).__name__, NOOPParser.__name__)
         return NOOPParser(
@@ -368,6 +380,9 @@ class PiggybackSectionParser(ParserState):
         self.current_host: Final = current_host
         self.current_section: Final = current_section
 
+    def ignores_data(self, selection: SectionNameCollection) -> bool:
+        return not (selection is NO_SELECTION or self.current_section.name in selection)
+
     def do_action(self, line: bytes) -> ParserState:
         assert self.piggyback_sections[self.current_host][-1].header == self.current_section
         self.piggyback_sections[self.current_host][-1].section.append(AgentRawData(line))
@@ -467,6 +482,9 @@ class HostSectionParser(ParserState):
         )
         self.current_section: Final = current_section
 
+    def ignores_data(self, selection: SectionNameCollection) -> bool:
+        return not (selection is NO_SELECTION or self.current_section.name in selection)
+
     def do_action(self, line: bytes) -> ParserState:
         if not self.current_section.nostrip:
             line = line.strip()
@@ -534,7 +552,9 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
 
         now = int(time.time())
 
-        raw_sections, piggyback_sections = self._parse_host_section(raw_data)
+        with timing.phase("parse") as sample:
+            raw_sections, piggyback_sections = self._parse_host_section(raw_data, selection)
+            sample.nbytes = len(raw_data)
         section_info = {
             header.name: header
             for header, _ in raw_sections
@@ -543,9 +563,13 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
 
         def decode_sections(
             sections: ImmutableSection,
+            *,
+            selection: SectionNameCollection,
         ) -> MutableMapping[SectionName, list[AgentRawDataSection]]:
             out: MutableMapping[SectionName, list[AgentRawDataSection]] = {}
             for header, content in sections:
+                if not (selection is NO_SELECTION or header.name in selection):
+                    continue
                 out.setdefault(header.name, []).extend(header.parse_line(line) for line in content)
             return out
 
@@ -576,22 +600,19 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
                     ).encode(header.encoding)
                 yield from (bytes(line) for line in content)
 
-        sections = {
-            name: content
-            for name, content in decode_sections(raw_sections).items()
-            if selection is NO_SELECTION or name in selection
-        }
-        piggybacked_raw_data = {
-            header.hostname: list(
-                flatten_piggyback_section(
-                    content,
-                    cached_at=now,
-                    cache_for=self.cache_piggybacked_data_for,
-                    selection=selection,
+        with timing.phase("parse"):
+            sections = decode_sections(raw_sections, selection=selection)
+            piggybacked_raw_data = {
+                header.hostname: list(
+                    flatten_piggyback_section(
+                        content,
+                        cached_at=now,
+                        cache_for=self.cache_piggybacked_data_for,
+                        selection=selection,
+                    )
                 )
-            )
-            for header, content in piggyback_sections.items()
-        }
+                for header, content in piggyback_sections.items()
+            }
         cache_info = {
             header.name: cache_info_tuple
             for header in section_info.values()
@@ -620,8 +641,14 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
     def _parse_host_section(
         self,
         raw_data: AgentRawData,
+        selection: SectionNameCollection = NO_SELECTION,
     ) -> tuple[ImmutableSection, Mapping[PiggybackMarker, ImmutableSection]]:
-        """Split agent output in chunks, splits lines by whitespaces."""
+        """Split agent output in chunks, splits lines by whitespaces.
+
+        The lines that the parser ignores anyway (for example the content of
+        the sections that are not selected) are skipped without splitting them.
+
+        """
         parser: ParserState = NOOPParser(
             self.hostname,
             [],
@@ -630,7 +657,26 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
             encoding_fallback=self.encoding_fallback,
             logger=self._logger,
         )
-        for line in raw_data.split(b"\n"):
-            parser = parser(line.rstrip(b"\r"))
+        if selection is NO_SELECTION:
+            for line in raw_data.split(b"\n"):
+                parser = parser(line.rstrip(b"\r"))
+            return parser.sections, parser.piggyback_sections
+
+        pos = 0
+        while pos < len(raw_data):
+            # Every line that may be a marker must go through the parser.
+            marker = _MARKER_CANDIDATE.search(raw_data, pos)
+            marker_begin = len(raw_data) if marker is None else marker.start()
+            if not parser.ignores_data(selection):
+                for line in raw_data[pos:marker_begin].split(b"\n"):
+                    parser = parser(line.rstrip(b"\r"))
+            if marker is None:
+                break
+
+            marker_end = raw_data.find(b"\n", marker_begin)
+            if marker_end == -1:
+                marker_end = len(raw_data)
+            parser = parser(raw_data[marker_begin:marker_end].rstrip(b"\r"))
+            pos = marker_end + 1
 
         return parser.sections, parser.piggyback_sections
@@ -44,9 +44,12 @@ Cache hierarchy
 """
 
 import abc
+import ast
 import copy
 import enum
 import logging
+import marshal
+import zlib
 from collections.abc import Callable, Iterator, Mapping, MutableMapping, Sequence
 from pathlib import Path
 from typing import Any, Final, Generic, NamedTuple, TypeVar
@@ -59,6 +62,7 @@ from cmk.utils.type_defs import HostName, SectionName
 
 from cmk.snmplib.type_defs import SNMPRawDataSection, TRawData
 
+from . import timing
 from .type_defs import AgentRawDataSection, Mode
 
 __all__ = [
@@ -68,6 +72,7 @@ __all__ = [
     "PersistedSections",
     "SectionStore",
     "TRawDataSection",
+    "read_cache_file",
 ]
 
 # ABCRawDataSection is wrong from a typing point of view.
@@ -130,6 +135,15 @@ class PersistedSections(  # pylint: disable=too-many-ancestors
 
 
 class SectionStore(Generic[TRawDataSection]):
+    """Store the persisted sections of a source
+
+    The sections are marshalled into a binary file.  The file is replaced atomically
+    and all read-modify-write cycles are serialized by a lock on a separate file, as
+    the lock on the data file itself would be lost with the replaced file.
+    """
+
+    _MAGIC: Final = b"CMKSEC01"
+
     def __init__(
         self,
         path: str | Path,
@@ -143,6 +157,15 @@ class SectionStore(Generic[TRawDataSection]):
     def __repr__(self) -> str:
         return f"{type(self).__name__}({self.path!r}, logger={self._logger!r})"
 
+    @staticmethod
+    def lock_path_of(path: Path) -> Path:
+        """The hidden lock file next to the store at `path`"""
+        return path.with_name(f".{path.name}.lock")
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.lock_path_of(self.path)
+
     def store(self, sections: PersistedSections[TRawDataSection]) -> None:
         if not sections:
             self._logger.debug("No persisted sections")
@@ -150,15 +173,21 @@ class SectionStore(Generic[TRawDataSection]):
             return
 
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        _store.save_object_to_file(
+        _store.save_bytes_to_file(
             self.path,
-            {str(k): v for k, v in sections.items()},
-            pretty=False,
+            self._MAGIC + marshal.dumps({str(k): tuple(v) for k, v in sections.items()}),
         )
         self._logger.debug("Stored persisted sections: %s", ", ".join(str(s) for s in sections))
 
     def load(self) -> PersistedSections[TRawDataSection]:
-        raw_sections_data = _store.load_object_from_file(self.path, default={})
+        raw = _store.load_bytes_from_file(self.path)
+        if not raw:
+            raw_sections_data = {}
+        elif raw.startswith(self._MAGIC):
+            raw_sections_data = marshal.loads(raw[len(self._MAGIC) :])
+        else:
+            # Written by an older version
+            raw_sections_data = ast.literal_eval(raw.decode("utf-8"))
         return PersistedSections[TRawDataSection](
             {SectionName(k): v for k, v in raw_sections_data.items()}
         )
@@ -171,12 +200,13 @@ class SectionStore(Generic[TRawDataSection]):
         now: int,
         keep_outdated: bool,
     ) -> Mapping[SectionName, Sequence[TRawDataSection]]:
-        persisted_sections = self._update(
-            sections,
-            lookup_persist,
-            now=now,
-            keep_outdated=keep_outdated,
-        )
+        with timing.phase("store_update"):
+            persisted_sections = self._update(
+                sections,
+                lookup_persist,
+                now=now,
+                keep_outdated=keep_outdated,
+            )
         return self._add_persisted_sections(
             sections,
             cache_info,
@@ -191,23 +221,33 @@ class SectionStore(Generic[TRawDataSection]):
         now: int,
         keep_outdated: bool,
     ) -> PersistedSections[TRawDataSection]:
-        # TODO: This is not race condition free when modifying the data. Either remove
-        # the possible write here and simply ignore the outdated sections or lock when
-        # reading and unlock after writing
-        persisted_sections = self.load()
-        persisted_sections.update(
-            PersistedSections[TRawDataSection].from_sections(
-                sections=sections,
-                lookup_persist=lookup_persist,
-            )
-        )
-        if not keep_outdated:
-            for section_name in tuple(persisted_sections):
-                (_created_at, valid_until, _section_content) = persisted_sections[section_name]
-                if valid_until < now:
-                    del persisted_sections[section_name]
-
-        self.store(persisted_sections)
+        with _store.locked(self._lock_path):
+            persisted_sections = self.load()
+            changed = False
+            for section_name, entry in (
+                PersistedSections[TRawDataSection]
+                .from_sections(
+                    sections=sections,
+                    lookup_persist=lookup_persist,
+                )
+                .items()
+            ):
+                # Keep the entry (and when it was created) if neither
+                # its validity nor its content have changed.
+                previous = persisted_sections.get(section_name)
+                if previous is None or tuple(previous[1:]) != entry[1:]:
+                    persisted_sections[section_name] = entry
+                    changed = True
+
+            if not keep_outdated:
+                for section_name in tuple(persisted_sections):
+                    (_created_at, valid_until, _section_content) = persisted_sections[section_name]
+                    if valid_until < now:
+                        del persisted_sections[section_name]
+                        changed = True
+
+            if changed:
+                self.store(persisted_sections)
         return persisted_sections
 
     def _add_persisted_sections(
@@ -270,6 +310,31 @@ class FileCacheMode(enum.IntFlag):
     READ = enum.auto()
     WRITE = enum.auto()
     READ_WRITE = READ | WRITE
+    # Write the cache file gzip compressed.  Compressed files are
+    # always recognized on read, whatever the mode.
+    COMPRESSED = enum.auto()
+
+
+_GZIP_MAGIC: Final = b"\x1f\x8b"
+_GZIP_WBITS: Final = 16 + zlib.MAX_WBITS
+_READ_CHUNK_SIZE: Final = 64 * 1024
+
+
+def read_cache_file(path: Path) -> bytes:
+    """Read a cache file, decompress it on the fly if it has been compressed"""
+    with path.open("rb") as f:
+        head = f.read(len(_GZIP_MAGIC))
+        if head != _GZIP_MAGIC:
+            return head + f.read()
+
+        decompressor = zlib.decompressobj(wbits=_GZIP_WBITS)
+        chunks = [decompressor.decompress(head)]
+        while chunk := f.read(_READ_CHUNK_SIZE):
+            chunks.append(decompressor.decompress(chunk))
+        chunks.append(decompressor.flush())
+        if not decompressor.eof:
+            raise zlib.error("Truncated cache file")
+        return b"".join(chunks)
 
 
 class FileCache(Generic[TRawData], abc.ABC):
@@ -415,18 +480,23 @@ class FileCache(Generic[TRawData], abc.ABC):
 
         # TODO: Use some generic store file read function to generalize error handling,
         # but there is currently no function that simply reads data from the file
-        try:
-            cache_file = path.read_bytes()
-        except FileNotFoundError:
-            self._logger.debug("Not using cache (Does not exist)")
-            return None
-
-        if not cache_file:
-            self._logger.debug("Not using cache (Empty)")
-            return None
-
-        self._logger.log(VERBOSE, "Using data from cache file %s", path)
-        return self._from_cache_file(cache_file)
+        with timing.phase("cache_read") as sample:
+            try:
+                cache_file = read_cache_file(path)
+            except FileNotFoundError:
+                self._logger.debug("Not using cache (Does not exist)")
+                return None
+            except zlib.error as e:
+                self._logger.debug("Not using cache (Corrupted: %s)", e)
+                return None
+
+            if not cache_file:
+                self._logger.debug("Not using cache (Empty)")
+                return None
+
+            self._logger.log(VERBOSE, "Using data from cache file %s", path)
+            sample.nbytes = len(cache_file)
+            return self._from_cache_file(cache_file)
 
     def write(self, raw_data: TRawData, mode: Mode) -> None:
         if FileCacheMode.WRITE not in self.file_cache_mode or not self._do_cache(mode):
@@ -439,10 +509,17 @@ class FileCache(Generic[TRawData], abc.ABC):
             raise MKGeneralException(f"Cannot create directory {path.parent!r}: {e}")
 
         self._logger.debug("Write data to cache file %s", path)
-        try:
-            _store.save_bytes_to_file(path, self._to_cache_file(raw_data))
-        except Exception as e:
-            raise MKGeneralException(f"Cannot write cache file {path}: {e}")
+        with timing.phase("cache_write") as sample:
+            cache_file = self._to_cache_file(raw_data)
+            if FileCacheMode.COMPRESSED in self.file_cache_mode:
+                # Favor speed: agent output compresses well even at the lowest level.
+                compressor = zlib.compressobj(level=1, wbits=_GZIP_WBITS)
+                cache_file = compressor.compress(cache_file) + compressor.flush()
+            try:
+                _store.save_bytes_to_file(path, cache_file)
+            except Exception as e:
+                raise MKGeneralException(f"Cannot write cache file {path}: {e}")
+            sample.nbytes = len(cache_file)
 
 
 class FileCacheGlobals:
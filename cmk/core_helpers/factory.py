@@ -43,4 +43,10 @@ def backend(
     if snmp_config.snmp_backend == SNMPBackendEnum.CLASSIC:
         return ClassicSNMPBackend(snmp_config, logger)
 
+    if snmp_config.snmp_backend == SNMPBackendEnum.PYSNMP:
+        # Importing pysnmp is expensive: Only pay for it if the backend is used.
+        from .snmp_backend.pysnmp_backend import PySNMPBackend
+
+        return PySNMPBackend(snmp_config, logger)
+
     raise NotImplementedError(f"Unknown SNMP backend: {snmp_config.snmp_backend}")
@@ -24,6 +24,7 @@ from cmk.utils.exceptions import MKFetcherError
 from cmk.utils.log import VERBOSE
 from cmk.utils.type_defs import AgentRawData, HostAddress
 
+from . import timing
 from ._base import Fetcher
 from .type_defs import Mode
 
@@ -80,7 +81,10 @@ class IPMIFetcher(Fetcher[AgentRawData]):
         if self._command is None:
             raise MKFetcherError("Not connected")
 
-        return AgentRawData(b"" + self._sensors_section() + self._firmware_section())
+        with timing.phase("ipmi") as sample:
+            raw_data = AgentRawData(b"" + self._sensors_section() + self._firmware_section())
+            sample.nbytes = len(raw_data)
+        return raw_data
 
     def open(self) -> None:
         self._logger.debug(
@@ -17,9 +17,14 @@ from six import ensure_str
 from cmk.utils.exceptions import MKFetcherError
 from cmk.utils.type_defs import AgentRawData
 
+from . import timing
 from ._base import Fetcher
+from ._forkserver import ForkedProcess, ForkServer, special_agent_argv
 from .type_defs import Mode
 
+# Started on first use, lives as long as the (keepalive) helper process.
+_fork_server: Final = ForkServer()
+
 
 class ProgramFetcher(Fetcher[AgentRawData]):
     def __init__(
@@ -28,12 +33,16 @@ class ProgramFetcher(Fetcher[AgentRawData]):
         cmdline: bytes | str,
         stdin: str | None,
         is_cmc: bool,
+        use_forkserver: bool = False,
     ) -> None:
         super().__init__(logger=logging.getLogger("cmk.helper.program"))
         self.cmdline: Final = cmdline
         self.stdin: Final = stdin
         self.is_cmc: Final = is_cmc
-        self._process: subprocess.Popen | None = None
+        # Run the Python special agents in the fork server.  Only with the CMC,
+        # the Nagios helpers do not live long enough to benefit from it.
+        self.use_forkserver: Final = use_forkserver
+        self._process: subprocess.Popen | ForkedProcess | None = None
 
     def __repr__(self) -> str:
         return (
@@ -43,6 +52,7 @@ class ProgramFetcher(Fetcher[AgentRawData]):
                     f"cmdline={self.cmdline!r}",
                     f"stdin={self.stdin!r}",
                     f"is_cmc={self.is_cmc!r}",
+                    f"use_forkserver={self.use_forkserver!r}",
                 )
             )
             + ")"
@@ -57,6 +67,7 @@ class ProgramFetcher(Fetcher[AgentRawData]):
             "cmdline": self.cmdline,
             "stdin": self.stdin,
             "is_cmc": self.is_cmc,
+            "use_forkserver": self.use_forkserver,
         }
 
     def open(self) -> None:
@@ -68,7 +79,9 @@ class ProgramFetcher(Fetcher[AgentRawData]):
                 len(self.stdin),
             )
 
-        if self.is_cmc:
+        if self.is_cmc and self.use_forkserver and (process := self._fork()) is not None:
+            self._process = process
+        elif self.is_cmc:
             # Warning:
             # The preexec_fn parameter is not safe to use in the presence of threads in your
             # application. The child process could deadlock before exec is called. If you
@@ -101,6 +114,18 @@ class ProgramFetcher(Fetcher[AgentRawData]):
                 close_fds=True,
             )
 
+    def _fork(self) -> ForkedProcess | None:
+        agent = special_agent_argv(os.fsdecode(self.cmdline))
+        if agent is None:
+            return None
+
+        module_name, argv = agent
+        try:
+            return _fork_server.spawn(module_name, argv, with_stdin=bool(self.stdin))
+        except OSError as exc:
+            self._logger.debug("Cannot use fork server, executing %s: %s", argv[0], exc)
+            return None
+
     def close(self):
         if self._process is None:
             return
@@ -118,6 +143,9 @@ class ProgramFetcher(Fetcher[AgentRawData]):
         if self.is_cmc:
             with suppress(OSError):
                 os.killpg(os.getpgid(self._process.pid), signal.SIGTERM)
+            # Outside of the above: the fork server reports the exit code even if the
+            # process is gone already.
+            with suppress(OSError):
                 self._process.wait()
 
         # The stdout and stderr pipe are not closed correctly on a MKTimeout
@@ -135,9 +163,11 @@ class ProgramFetcher(Fetcher[AgentRawData]):
             raise MKFetcherError("No process")
         # ? do they have the default byte type, because in open() none of the "text", "encoding",
         #  "errors", "universal_newlines" were specified?
-        stdout, stderr = self._process.communicate(
-            input=self.stdin.encode() if self.stdin else None
-        )
+        with timing.phase("program") as sample:
+            stdout, stderr = self._process.communicate(
+                input=self.stdin.encode() if self.stdin else None
+            )
+            sample.nbytes = len(stdout)
         if self._process.returncode == 127:
             exepath = self.cmdline.split()[0]  # for error message, hide options!
             # ? exepath is AnyStr
@@ -153,4 +183,4 @@ class ProgramFetcher(Fetcher[AgentRawData]):
                     ensure_str(stderr).strip(),  # pylint: disable= six-ensure-str-bin-call
                 )
             )
-        return stdout
+        return AgentRawData(stdout)
@@ -25,7 +25,7 @@ from cmk.snmplib.type_defs import (
     SNMPRawDataSection,
 )
 
-from . import factory
+from . import factory, timing
 from ._base import Fetcher, Parser, verify_ipaddress
 from .cache import FileCache, PersistedSections, SectionStore
 from .host_sections import HostSections
@@ -150,6 +150,7 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
         do_status_data_inventory: bool,
         section_store_path: Path | str,
         snmp_config: SNMPHostConfig,
+        max_parallel_walks: int = 1,
     ) -> None:
         super().__init__(logger=logging.getLogger("cmk.helper.snmp"))
         self.sections: Final = sections
@@ -157,6 +158,7 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
         self.missing_sys_description: Final = missing_sys_description
         self.do_status_data_inventory: Final = do_status_data_inventory
         self.snmp_config: Final = snmp_config
+        self.max_parallel_walks: Final = max_parallel_walks
         self._section_store = SectionStore[SNMPRawDataSection](
             section_store_path,
             logger=self._logger,
@@ -190,6 +192,7 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
                     f"do_status_data_inventory={self.do_status_data_inventory!r}",
                     f"section_store_path={self.section_store_path!r}",
                     f"snmp_config={self.snmp_config!r}",
+                    f"max_parallel_walks={self.max_parallel_walks!r}",
                 )
             )
             + ")"
@@ -217,6 +220,7 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
             do_status_data_inventory=serialized_["do_status_data_inventory"],
             section_store_path=serialized_["section_store_path"],
             snmp_config=SNMPHostConfig.deserialize(serialized_["snmp_config"]),
+            max_parallel_walks=serialized_.get("max_parallel_walks", 1),
         )
 
     def to_json(self) -> Mapping[str, Any]:
@@ -227,6 +231,7 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
             "do_status_data_inventory": self.do_status_data_inventory,
             "section_store_path": str(self._section_store.path),
             "snmp_config": self.snmp_config.serialize(),
+            "max_parallel_walks": self.max_parallel_walks,
         }
 
     def open(self) -> None:
@@ -309,7 +314,10 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
             else PersistedSections[SNMPRawDataSection]({})
         )
         section_names = self._get_selection(mode)
-        section_names |= self._detect(select_from=self._get_detected_sections(mode) - section_names)
+        with timing.phase("snmp_detect"):
+            section_names |= self._detect(
+                select_from=self._get_detected_sections(mode) - section_names
+            )
 
         walk_cache = snmp_table.WalkCache(self._backend.hostname)
         if self._update_snmpwalk_cache(mode):
@@ -326,23 +334,34 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
             )
 
         fetched_data: MutableMapping[SectionName, Sequence[SNMPRawDataSection]] = {}
-        for section_name in self._sort_section_names(section_names):
-            try:
-                _from, until, _section = persisted_sections[section_name]
-                if now > until:
-                    raise LookupError(section_name)
-            except LookupError:
-                self._logger.debug("%s: Fetching data (%s)", section_name, walk_cache_msg)
-
-                fetched_data[section_name] = [
-                    snmp_table.get_snmp_table(
-                        section_name=section_name,
-                        tree=tree,
-                        walk_cache=walk_cache,
-                        backend=self._backend,
-                    )
-                    for tree in self.plugin_store[section_name].trees
-                ]
+        with timing.phase("snmp_walk"), snmp_table.parallel_walks_executor(
+            self._backend, self.max_parallel_walks
+        ) as executor:
+            for section_name in self._sort_section_names(section_names):
+                try:
+                    _from, until, _section = persisted_sections[section_name]
+                    if now > until:
+                        raise LookupError(section_name)
+                except LookupError:
+                    self._logger.debug("%s: Fetching data (%s)", section_name, walk_cache_msg)
+
+                    if executor is not None:
+                        snmp_table.prefetch_snmpwalks(
+                            section_name=section_name,
+                            trees=self.plugin_store[section_name].trees,
+                            walk_cache=walk_cache,
+                            backend=self._backend,
+                            executor=executor,
+                        )
+                    fetched_data[section_name] = [
+                        snmp_table.get_snmp_table(
+                            section_name=section_name,
+                            tree=tree,
+                            walk_cache=walk_cache,
+                            backend=self._backend,
+                        )
+                        for tree in self.plugin_store[section_name].trees
+                    ]
 
         walk_cache.save()
 
@@ -3,15 +3,23 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import logging
 import subprocess
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping, Sequence
 
 import cmk.utils.tty as tty
 from cmk.utils.exceptions import MKGeneralException, MKSNMPError, MKTimeout
 from cmk.utils.log import console
 from cmk.utils.type_defs import SectionName
 
-from cmk.snmplib.type_defs import OID, SNMPBackend, SNMPContextName, SNMPRawValue, SNMPRowInfo
+from cmk.snmplib.type_defs import (
+    OID,
+    SNMPBackend,
+    SNMPContextName,
+    SNMPHostConfig,
+    SNMPRawValue,
+    SNMPRowInfo,
+)
 
 from ._utils import strip_snmp_value
 
@@ -19,6 +27,16 @@ __all__ = ["ClassicSNMPBackend"]
 
 
 class ClassicSNMPBackend(SNMPBackend):
+    supports_concurrent_walks = True
+
+    def __init__(self, snmp_config: SNMPHostConfig, logger: logging.Logger) -> None:
+        super().__init__(snmp_config, logger)
+        self._running_walks: set[subprocess.Popen[str]] = set()
+
+    def abort_walks(self) -> None:
+        for snmp_process in list(self._running_walks):
+            snmp_process.kill()
+
     def get(self, oid: OID, context_name: SNMPContextName | None = None) -> SNMPRawValue | None:
         if oid.endswith(".*"):
             oid_prefix = oid[:-2]
@@ -84,6 +102,86 @@ class ClassicSNMPBackend(SNMPBackend):
 
         return strip_snmp_value(value)
 
+    def get_many(
+        self, oids: Sequence[OID], context_name: SNMPContextName | None = None
+    ) -> Mapping[OID, SNMPRawValue | None]:
+        """Fetch many OIDs with one snmpget per chunk of variable bindings
+
+        The chunk size is the bulk size configured for the host, as that is
+        what the user has told us the device can handle in one PDU.
+        """
+        chunk_size = max(self.config.bulk_walk_size_of, 1)
+        values: dict[OID, SNMPRawValue | None] = {}
+        for begin in range(0, len(oids), chunk_size):
+            values.update(self._get_chunk(oids[begin : begin + chunk_size], context_name))
+        return values
+
+    def _get_chunk(
+        self, oids: Sequence[OID], context_name: SNMPContextName | None
+    ) -> Mapping[OID, SNMPRawValue | None]:
+        protospec = self._snmp_proto_spec()
+        ipaddress = self.config.ipaddress or "0.0.0.0"
+        if self.config.is_ipv6_primary:
+            ipaddress = "[" + ipaddress + "]"
+        portspec = self._snmp_port_spec()
+        command = self._snmp_base_command("get", context_name) + [
+            "-On",
+            "-OQ",
+            "-Oe",
+            "-Ot",
+            f"{protospec}{ipaddress}{portspec}",
+            *oids,
+        ]
+
+        console.vverbose("Running '%s'\n" % subprocess.list2cmdline(command))
+
+        with subprocess.Popen(
+            command,
+            close_fds=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+        ) as snmp_process:
+            assert snmp_process.stdout
+            assert snmp_process.stderr
+            try:
+                output = snmp_process.stdout.read()
+                error = snmp_process.stderr.read()
+            except MKTimeout:
+                snmp_process.kill()
+                raise
+
+        # SNMPv1 agents fail the whole PDU with noSuchName if one OID is missing.
+        # snmpget then drops the failed OID, repeats the request with the others
+        # and exits with 2, so the output is valid regardless of the exit code.
+        values: dict[OID, SNMPRawValue | None] = {}
+        reason = ""
+        for line in error.splitlines():
+            if line.startswith("Reason:"):
+                reason = line
+            elif line.startswith("Failed object:") and "(noSuchName)" in reason:
+                values[line.split(":", 1)[1].strip()] = None
+        for line in output.splitlines():
+            oid, sep, value = line.partition("=")
+            if sep and value.strip().startswith(
+                ("No Such Object available", "No Such Instance currently exists")
+            ):
+                values[oid.strip()] = None
+        values.update(self._get_rowinfo_from_walk_output(output.splitlines()))
+
+        if not values:
+            console.verbose(
+                tty.red + tty.bold + "ERROR: " + tty.normal + "SNMP error: %s\n" % error.strip()
+            )
+            raise MKSNMPError(
+                "SNMP Error on %s: %s (Exit-Code: %d)"
+                % (ipaddress, error.strip(), snmp_process.returncode)
+            )
+
+        requested = set(oids)
+        return {oid: value for oid, value in values.items() if oid in requested}
+
     def walk(
         self,
         oid: str,
@@ -113,12 +211,15 @@ class ClassicSNMPBackend(SNMPBackend):
         ) as snmp_process:
             assert snmp_process.stdout
             assert snmp_process.stderr
+            self._running_walks.add(snmp_process)
             try:
                 rowinfo = self._get_rowinfo_from_walk_output(snmp_process.stdout)
                 error = snmp_process.stderr.read()
             except MKTimeout:
                 snmp_process.kill()
                 raise
+            finally:
+                self._running_walks.discard(snmp_process)
 
         if snmp_process.returncode:
             console.verbose(
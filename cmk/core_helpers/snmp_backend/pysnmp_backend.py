@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""SNMP backend on top of pysnmp
+
+In contrast to the classic backend, no process is forked per request.
+All requests go through long-lived SNMP engines, so that transports are
+reused and the results of the SNMPv3 engine ID discovery and time
+synchronization are kept between gets and walks (and between fetches
+in long-running helpers).
+
+"""
+
+import threading
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any
+
+import pysnmp.hlapi as hlapi  # type: ignore[import]
+from pyasn1.type import univ  # type: ignore[import]
+from pysnmp.proto import rfc1902, rfc1905  # type: ignore[import]
+
+import cmk.utils.tty as tty
+from cmk.utils.exceptions import MKGeneralException, MKSNMPError
+from cmk.utils.log import console
+from cmk.utils.type_defs import SectionName
+
+from cmk.snmplib.type_defs import (
+    OID,
+    SNMPBackend,
+    SNMPContextName,
+    SNMPCredentials,
+    SNMPRawValue,
+    SNMPRowInfo,
+)
+
+__all__ = ["PySNMPBackend"]
+
+
+class _NoSuchNameError(MKSNMPError):
+    """An SNMPv1 agent does not know one of the requested OIDs"""
+
+
+class _SNMPEngines(threading.local):
+    def __init__(self) -> None:
+        self.engines: dict[SNMPCredentials, hlapi.SnmpEngine] = {}
+
+
+_snmp_engines = _SNMPEngines()
+
+
+def _get_snmp_engine(credentials: SNMPCredentials) -> hlapi.SnmpEngine:
+    """The long-lived SNMP engine for the given credentials
+
+    pysnmp identifies the configured users by name only, so hosts
+    with different credentials must not share an engine.  All hosts
+    with the same credentials share the engine and its transports.
+
+    The synchronous API runs the dispatcher of the engine for every
+    request, so every thread (see `snmp_table.prefetch_snmpwalks`)
+    gets engines of its own.
+    """
+    engines = _snmp_engines.engines
+    try:
+        return engines[credentials]
+    except KeyError:
+        return engines.setdefault(credentials, hlapi.SnmpEngine())
+
+
+class PySNMPBackend(SNMPBackend):
+    supports_concurrent_walks = True
+
+    def get(self, oid: OID, context_name: SNMPContextName | None = None) -> SNMPRawValue | None:
+        if oid.endswith(".*"):
+            oid_prefix = oid[:-2]
+            try:
+                rows = self._request(hlapi.nextCmd, [oid_prefix], context_name, maxRows=1)
+            except MKSNMPError as e:
+                console.verbose(tty.red + tty.bold + "ERROR: " + tty.normal + "%s\n" % e)
+                return None
+            for row_oid, value in rows.items():
+                # In case of .*, check if prefix is the one we are looking for
+                return value if row_oid.startswith(oid_prefix + ".") else None
+            return None
+
+        try:
+            return self.get_many([oid], context_name).get(oid)
+        except MKSNMPError as e:
+            console.verbose(tty.red + tty.bold + "ERROR: " + tty.normal + "%s\n" % e)
+            return None
+
+    def get_many(
+        self, oids: Sequence[OID], context_name: SNMPContextName | None = None
+    ) -> Mapping[OID, SNMPRawValue | None]:
+        chunk_size = max(self.config.bulk_walk_size_of, 1)
+        values: dict[OID, SNMPRawValue | None] = {}
+        for begin in range(0, len(oids), chunk_size):
+            values.update(self._get_chunk(oids[begin : begin + chunk_size], context_name))
+        return values
+
+    def _get_chunk(
+        self, oids: Sequence[OID], context_name: SNMPContextName | None
+    ) -> Mapping[OID, SNMPRawValue | None]:
+        try:
+            return self._request(hlapi.getCmd, oids, context_name)
+        except _NoSuchNameError:
+            if len(oids) == 1:
+                return {oids[0]: None}
+            # SNMPv1 fails the whole PDU if a single variable is missing.
+            values: dict[OID, SNMPRawValue | None] = {}
+            for oid in oids:
+                values.update(self._get_chunk([oid], context_name))
+            return values
+
+    def walk(
+        self,
+        oid: OID,
+        section_name: SectionName | None = None,
+        table_base_oid: OID | None = None,
+        context_name: SNMPContextName | None = None,
+    ) -> SNMPRowInfo:
+        console.vverbose("Walking %s via pysnmp\n" % oid)
+        if self.config.is_bulkwalk_host:
+            return list(
+                self._iter_rows(
+                    hlapi.bulkCmd,
+                    oid,
+                    context_name,
+                    args=(0, max(self.config.bulk_walk_size_of, 1)),
+                )
+            )
+        return list(self._iter_rows(hlapi.nextCmd, oid, context_name))
+
+    def _iter_rows(
+        self,
+        command: Any,
+        oid: OID,
+        context_name: SNMPContextName | None,
+        *,
+        args: tuple[int, ...] = (),
+    ) -> Iterable[tuple[OID, SNMPRawValue]]:
+        for error_indication, error_status, _error_index, var_binds in command(
+            _get_snmp_engine(self.config.credentials),
+            self._auth_data(),
+            self._transport_target(),
+            hlapi.ContextData(contextName=context_name or ""),
+            *args,
+            hlapi.ObjectType(hlapi.ObjectIdentity(oid.lstrip("."))),
+            lexicographicMode=False,
+            lookupMib=False,
+        ):
+            if error_indication:
+                raise MKSNMPError(
+                    "SNMP Error on %s: %s" % (self.config.ipaddress, error_indication)
+                )
+            if error_status:
+                if self._is_snmpv1 and error_status == 2:  # noSuchName: end of the MIB
+                    return
+                raise MKSNMPError(
+                    "SNMP Error on %s: %s" % (self.config.ipaddress, error_status.prettyPrint())
+                )
+            for name, value in var_binds:
+                if (raw_value := _to_raw_value(value)) is not None:
+                    yield "." + str(name), raw_value
+
+    def _request(
+        self,
+        command: Any,
+        oids: Sequence[OID],
+        context_name: SNMPContextName | None,
+        **options: object,
+    ) -> Mapping[OID, SNMPRawValue | None]:
+        error_indication, error_status, _error_index, var_binds = next(
+            command(
+                _get_snmp_engine(self.config.credentials),
+                self._auth_data(),
+                self._transport_target(),
+                hlapi.ContextData(contextName=context_name or ""),
+                *(hlapi.ObjectType(hlapi.ObjectIdentity(oid.lstrip("."))) for oid in oids),
+                lookupMib=False,
+                **options,
+            )
+        )
+        if error_indication:
+            raise MKSNMPError("SNMP Error on %s: %s" % (self.config.ipaddress, error_indication))
+        if error_status:
+            message = "SNMP Error on %s: %s" % (self.config.ipaddress, error_status.prettyPrint())
+            if self._is_snmpv1 and error_status == 2:  # noSuchName
+                raise _NoSuchNameError(message)
+            raise MKSNMPError(message)
+        return {"." + str(name): _to_raw_value(value) for name, value in var_binds}
+
+    @property
+    def _is_snmpv1(self) -> bool:
+        return not (
+            self.config.is_snmpv3_host
+            or self.config.is_bulkwalk_host
+            or self.config.is_snmpv2or3_without_bulkwalk_host
+        )
+
+    def _auth_data(self) -> hlapi.CommunityData | hlapi.UsmUserData:
+        credentials = self.config.credentials
+        if isinstance(credentials, str):
+            return hlapi.CommunityData(credentials, mpModel=0 if self._is_snmpv1 else 1)
+
+        # TODO: Fix the horrible credentials typing
+        if len(credentials) == 6:
+            _sec_level, auth_proto, sec_name, auth_pass, priv_proto, priv_pass = credentials
+            return hlapi.UsmUserData(
+                sec_name,
+                authKey=auth_pass,
+                privKey=priv_pass,
+                authProtocol=_auth_proto_for(auth_proto),
+                privProtocol=_priv_proto_for(priv_proto),
+            )
+        if len(credentials) == 4:
+            _sec_level, auth_proto, sec_name, auth_pass = credentials
+            return hlapi.UsmUserData(
+                sec_name,
+                authKey=auth_pass,
+                authProtocol=_auth_proto_for(auth_proto),
+            )
+        if len(credentials) == 2:
+            _sec_level, sec_name = credentials
+            return hlapi.UsmUserData(sec_name)
+        raise MKGeneralException(
+            "Invalid SNMP credentials '%r' for host %s: must be "
+            "string, 2-tuple, 4-tuple or 6-tuple" % (credentials, self.config.hostname)
+        )
+
+    def _transport_target(self) -> hlapi.UdpTransportTarget | hlapi.Udp6TransportTarget:
+        transport = (
+            hlapi.Udp6TransportTarget if self.config.is_ipv6_primary else hlapi.UdpTransportTarget
+        )
+        settings = self.config.timing
+        return transport(
+            (self.config.ipaddress or "0.0.0.0", self.config.port),
+            # Same defaults as the Net-SNMP command line tools
+            timeout=settings.get("timeout", 1),
+            retries=settings.get("retries", 5),
+        )
+
+
+def _to_raw_value(value: object) -> SNMPRawValue | None:
+    """Format the value the way the classic backend reads it from Net-SNMP"""
+    if isinstance(
+        value, (rfc1905.NoSuchObject, rfc1905.NoSuchInstance, rfc1905.EndOfMibView, univ.Null)
+    ):
+        return None
+    if isinstance(value, rfc1902.IpAddress):
+        return value.prettyPrint().encode()
+    if isinstance(value, univ.OctetString):
+        return bytes(value.asOctets())
+    if isinstance(value, univ.ObjectIdentifier):
+        return ("." + str(value)).encode()
+    return str(int(value)).encode()  # type: ignore[call-overload]
+
+
+def _auth_proto_for(proto_name: str) -> tuple[int, ...]:
+    try:
+        return {
+            "md5": hlapi.usmHMACMD5AuthProtocol,
+            "sha": hlapi.usmHMACSHAAuthProtocol,
+            "SHA-224": hlapi.usmHMAC128SHA224AuthProtocol,
+            "SHA-256": hlapi.usmHMAC192SHA256AuthProtocol,
+            "SHA-384": hlapi.usmHMAC256SHA384AuthProtocol,
+            "SHA-512": hlapi.usmHMAC384SHA512AuthProtocol,
+        }[proto_name]
+    except KeyError:
+        raise MKGeneralException("Invalid SNMP auth protocol: %s" % proto_name)
+
+
+def _priv_proto_for(proto_name: str) -> tuple[int, ...]:
+    try:
+        return {
+            "DES": hlapi.usmDESPrivProtocol,
+            "AES": hlapi.usmAesCfb128Protocol,
+        }[proto_name]
+    except KeyError:
+        raise MKGeneralException("Invalid SNMP priv protocol: %s" % proto_name)
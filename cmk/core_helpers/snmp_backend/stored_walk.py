@@ -4,13 +4,23 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """Abstract classes and types."""
 
+import array
+import bisect
+import mmap
+import os
+import struct
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Final
+
 import cmk.utils.agent_simulator as agent_simulator
 import cmk.utils.paths
+import cmk.utils.store as store
 from cmk.utils.exceptions import MKGeneralException, MKSNMPError
 from cmk.utils.log import console
 from cmk.utils.type_defs import AgentRawData, SectionName
 
-import cmk.snmplib.snmp_cache as snmp_cache
 from cmk.snmplib.type_defs import OID, SNMPBackend, SNMPContextName, SNMPRawValue, SNMPRowInfo
 
 from ._utils import strip_snmp_value
@@ -46,42 +56,16 @@ class StoredWalkSNMPBackend(SNMPBackend):
             oid_prefix = oid
             dot_star = False
 
-        host_cache = snmp_cache.host_cache()
+        path = Path(cmk.utils.paths.snmpwalks_dir, self.config.hostname)
+        console.vverbose(f"  Loading {oid} from {path}\n")
         try:
-            lines = host_cache[self.config.hostname]
-        except KeyError:
-            path = cmk.utils.paths.snmpwalks_dir + "/" + self.config.hostname
-            console.vverbose(f"  Loading {oid} from {path}\n")
-            try:
-                lines = StoredWalkSNMPBackend.read_walk_data(path)
-            except OSError:
-                raise MKSNMPError("No snmpwalk file %s" % path)
-            host_cache[self.config.hostname] = lines
-
-        begin = 0
-        end = len(lines)
-        hit = None
-        while end - begin > 0:
-            current = (begin + end) // 2
-            parts = lines[current].split(None, 1)
-            comp = parts[0]
-            hit = StoredWalkSNMPBackend._compare_oids(oid_prefix, comp)
-            if hit == 0:
-                break
-            if hit == 1:  # we are too low
-                begin = current + 1
-            else:
-                end = current
-
-        if hit != 0:
-            return []  # not found
-
-        rowinfo = StoredWalkSNMPBackend._collect_until(oid, oid_prefix, lines, current, -1)
-        rowinfo.reverse()
-        rowinfo += StoredWalkSNMPBackend._collect_until(oid, oid_prefix, lines, current + 1, 1)
+            walk = _WalkFile(path, Path(cmk.utils.paths.tmp_dir, "snmpwalk_index", path.name))
+            rowinfo = walk.subtree(StoredWalkSNMPBackend._to_bin_string(oid_prefix))
+        except OSError:
+            raise MKSNMPError("No snmpwalk file %s" % path)
 
         if dot_star:
-            return [rowinfo[0]]
+            return [row for row in rowinfo if row[0] != "." + oid_prefix][:1]
 
         return rowinfo
 
@@ -115,37 +99,103 @@ class StoredWalkSNMPBackend(SNMPBackend):
         except Exception:
             raise MKGeneralException("Invalid OID %s" % oid)
 
-    @staticmethod
-    def _collect_until(
-        oid: OID, oid_prefix: OID, lines: list[str], index: int, direction: int
-    ) -> SNMPRowInfo:
-        rows = []
-        # Handle case, where we run after the end of the lines list
-        if index >= len(lines):
-            if direction > 0:
+
+class _WalkFile:
+    """Random access to the records of a stored walk
+
+    The stored walks may be huge.  Rather than reading them into memory, we map
+    them and look the records up in an index of the record offsets.  The index is
+    built once per walk file and invalidated when the walk file changes.
+
+    Just like before the index, the records of the walk must be sorted by OID.
+    """
+
+    _HEADER = struct.Struct("<8sQQ")
+    _MAGIC = b"WALKIDX1"
+
+    def __init__(self, path: Path, index_path: Path) -> None:
+        self.path: Final = path
+        self.index_path: Final = index_path
+
+    def subtree(self, oid: tuple[int, ...]) -> SNMPRowInfo:
+        """All records with an OID equal to or below `oid`"""
+        if not oid:
+            raise MKGeneralException("Invalid OID")
+
+        with self.path.open("rb") as walk_file:
+            stat = os.fstat(walk_file.fileno())
+            if not stat.st_size:
                 return []
-            index -= 1
-        while True:
-            line = lines[index]
-            parts = line.split(None, 1)
-            o = parts[0]
-            if o.startswith("."):
-                o = o[1:]
-            if o == oid or o.startswith(oid_prefix + "."):
-                if len(parts) > 1:
-                    # FIXME: This encoding ping-pong os horrible...
-                    value = agent_simulator.process(
-                        AgentRawData(
-                            parts[1].encode(),
-                        ),
-                    ).decode()
-                else:
-                    value = ""
-                # Fix for missing starting oids
-                rows.append(("." + o, strip_snmp_value(value)))
-                index += direction
-                if index < 0 or index >= len(lines):
-                    break
-            else:
-                break
-        return rows
+            with mmap.mmap(walk_file.fileno(), 0, access=mmap.ACCESS_READ) as walk:
+                with self._offsets(walk, stat.st_mtime_ns, stat.st_size) as offsets:
+                    return self._subtree(walk, offsets, oid)
+
+    @classmethod
+    def _subtree(cls, walk: mmap.mmap, offsets: Sequence[int], oid: tuple[int, ...]) -> SNMPRowInfo:
+        def record(idx: int) -> bytes:
+            return walk[offsets[idx] : offsets[idx + 1] if idx + 1 < len(offsets) else len(walk)]
+
+        def oid_of(idx: int) -> tuple[int, ...]:
+            end = walk.find(b"\n", offsets[idx])
+            line = walk[offsets[idx] : end if end != -1 else len(walk)]
+            return StoredWalkSNMPBackend._to_bin_string(line.split(None, 1)[0].decode())
+
+        begin = bisect.bisect_left(range(len(offsets)), oid, key=oid_of)
+        # The first OID after the subtree: 1.2.3 -> 1.2.4
+        end = bisect.bisect_left(range(begin, len(offsets)), oid[:-1] + (oid[-1] + 1,), key=oid_of)
+        return [cls._parse_record(record(idx).decode()) for idx in range(begin, begin + end)]
+
+    @staticmethod
+    def _parse_record(line: str) -> tuple[OID, SNMPRawValue]:
+        parts = line.split(None, 1)
+        if len(parts) > 1:
+            # FIXME: This encoding ping-pong os horrible...
+            value = agent_simulator.process(
+                AgentRawData(
+                    parts[1].encode(),
+                ),
+            ).decode()
+        else:
+            value = ""
+        # Fix for missing starting oids
+        return "." + parts[0].lstrip("."), strip_snmp_value(value)
+
+    @contextmanager
+    def _offsets(self, walk: mmap.mmap, mtime_ns: int, size: int) -> Iterator[Sequence[int]]:
+        """The offsets of the records in the walk"""
+        header = self._HEADER.pack(self._MAGIC, mtime_ns, size)
+        if (index_file := self._open_index(header)) is None:
+            console.vverbose(f"  Indexing {self.path}\n")
+            offsets = self._build_index(walk)
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            store.save_bytes_to_file(self.index_path, header + offsets.tobytes())
+            yield offsets
+            return
+
+        with index_file, mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+            with memoryview(index)[self._HEADER.size :].cast("Q") as mapped_offsets:
+                yield mapped_offsets
+
+    def _open_index(self, header: bytes) -> BinaryIO | None:
+        """Open the index, if it is up to date"""
+        try:
+            index_file = self.index_path.open("rb")
+        except FileNotFoundError:
+            return None
+        if index_file.read(len(header)) != header:
+            index_file.close()
+            return None
+        return index_file
+
+    @staticmethod
+    def _build_index(walk: mmap.mmap) -> array.array:
+        # Sometimes there are newlines in the data of snmpwalks.
+        # Only lines starting with a dot start a new record.
+        offsets = array.array("Q")
+        if walk[:1] == b".":
+            offsets.append(0)
+        pos = walk.find(b"\n.")
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = walk.find(b"\n.", pos + 1)
+        return offsets
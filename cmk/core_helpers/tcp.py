@@ -3,25 +3,160 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import asyncio
 import copy
 import logging
 import socket
 import ssl
-from collections.abc import Mapping
+from collections.abc import Callable, Iterable, Mapping, Sequence
 from typing import Any, Final
 from uuid import UUID
 
 import cmk.utils.debug
 from cmk.utils import paths
 from cmk.utils.agent_registration import get_uuid_link_manager
-from cmk.utils.encryption import decrypt_by_agent_protocol, TransportProtocol
+from cmk.utils.encryption import AgentDecryptor, TransportProtocol
 from cmk.utils.exceptions import MKFetcherError
-from cmk.utils.type_defs import AgentRawData, HostAddress, HostName
+from cmk.utils.log import VERBOSE
+from cmk.utils.type_defs import AgentRawData, HostAddress, HostName, result
 
+from . import timing
 from ._base import Fetcher, verify_ipaddress
-from .tcp_agent_ctl import AgentCtlMessage
+from .tcp_agent_ctl import AgentCtlMessageDecoder
 from .type_defs import Mode
 
+__all__ = ["TCPFetcher", "fetch_concurrently"]
+
+# The outputs of big hosts are many megabytes, receive them in big chunks.
+_RECV_SIZE: Final = 256 * 1024
+
+
+class _AgentOutput:
+    """The agent output in a transport protocol, decrypted as it arrives
+
+    Use `buffer()` and `commit()` to receive from a socket, or `feed()` for
+    data from elsewhere.  Plain output is received right into the output
+    buffer, encrypted output into a scratch buffer and decrypted from there.
+
+    """
+
+    def __init__(self, protocol: TransportProtocol, passphrase: str | None) -> None:
+        self.protocol: Final = protocol
+        self._passphrase: Final = passphrase
+        self._decryptor: AgentDecryptor | None = None
+        self._nbytes = 0
+        if protocol is TransportProtocol.PLAIN:
+            self._buffer = bytearray(protocol.value)  # bring back stolen bytes
+            self._size = len(self._buffer)
+        else:
+            self._buffer = bytearray(_RECV_SIZE)
+            self._size = 0
+
+    def buffer(self) -> memoryview:
+        """The buffer to receive into, release it before calling `commit()`"""
+        if self.protocol is not TransportProtocol.PLAIN:
+            return memoryview(self._buffer)
+        if len(self._buffer) - self._size < _RECV_SIZE:
+            # Grow geometrically, like a list.
+            self._buffer.extend(bytes(max(self._size, _RECV_SIZE)))
+        return memoryview(self._buffer)[self._size :]
+
+    def commit(self, nbytes: int) -> None:
+        """Take the `nbytes` received into the buffer"""
+        self._nbytes += nbytes
+        if self.protocol is TransportProtocol.PLAIN:
+            self._size += nbytes
+            return
+        with memoryview(self._buffer) as received:
+            self._decrypt(received[:nbytes])
+
+    def feed(self, data: bytes | memoryview) -> None:
+        self._nbytes += len(data)
+        if self.protocol is TransportProtocol.PLAIN:
+            del self._buffer[self._size :]
+            self._buffer += data
+            self._size = len(self._buffer)
+            return
+        self._decrypt(data)
+
+    def _decrypt(self, data: bytes | memoryview) -> None:
+        try:
+            with timing.phase("decrypt") as sample:
+                sample.nbytes = len(data)
+                if self._decryptor is None:
+                    if self._passphrase is None:
+                        raise KeyError("passphrase")
+                    self._decryptor = AgentDecryptor(self._passphrase, self.protocol)
+                self._decryptor.update(data)
+        except Exception as e:
+            raise MKFetcherError("Failed to decrypt agent output: %s" % e) from e
+
+    def result(self) -> AgentRawData:
+        if not self._nbytes:
+            return AgentRawData(b"")  # nothing to to, validation will fail
+
+        if self._decryptor is None:
+            del self._buffer[self._size :]
+            return AgentRawData(bytes(self._buffer))
+
+        try:
+            with timing.phase("decrypt"):
+                return AgentRawData(bytes(self._decryptor.finalize()))
+        except Exception as e:
+            raise MKFetcherError("Failed to decrypt agent output: %s" % e) from e
+
+
+class _AgentCtlOutput:
+    """The agent output in an agent controller message, as it arrives
+
+    The message is decompressed chunk by chunk.  The transport protocol of
+    its payload is only known once the first two bytes are there.
+
+    """
+
+    def __init__(self, make_output: Callable[[bytes], _AgentOutput]) -> None:
+        self._make_output: Final = make_output
+        self._decoder: Final = AgentCtlMessageDecoder()
+        self._raw_protocol = bytearray()
+        self._output: _AgentOutput | None = None
+        self._buffer = bytearray(_RECV_SIZE)
+
+    def buffer(self) -> memoryview:
+        """The buffer to receive into, the caller has to release it before `commit()`"""
+        return memoryview(self._buffer)
+
+    def commit(self, nbytes: int) -> None:
+        """Take the `nbytes` received into the buffer"""
+        with memoryview(self._buffer) as data:
+            self.feed(data[:nbytes])
+
+    def feed(self, data: bytes | memoryview) -> None:
+        try:
+            payload = self._decoder.decode(data)
+        except ValueError as e:
+            raise MKFetcherError(f"Failed to deserialize versioned agent data: {e!r}") from e
+        self._feed_payload(payload)
+
+    def _feed_payload(self, payload: bytes | memoryview) -> None:
+        if self._output is None:
+            missing = 2 - len(self._raw_protocol)
+            self._raw_protocol += payload[:missing]
+            payload = payload[missing:]
+            if len(self._raw_protocol) < 2:
+                return
+            self._output = self._make_output(bytes(self._raw_protocol))
+        if payload:
+            self._output.feed(payload)
+
+    def result(self) -> AgentRawData:
+        try:
+            self._feed_payload(self._decoder.finish())
+        except ValueError as e:
+            raise MKFetcherError(f"Failed to deserialize versioned agent data: {e!r}") from e
+        if self._output is None:
+            self._output = self._make_output(bytes(self._raw_protocol))
+        return self._output.result()
+
 
 class TCPFetcher(Fetcher[AgentRawData]):
     def __init__(
@@ -89,7 +224,8 @@ class TCPFetcher(Fetcher[AgentRawData]):
         self._opt_socket = socket.socket(self.family, socket.SOCK_STREAM)
         try:
             self._socket.settimeout(self.timeout)
-            self._socket.connect(self.address)
+            with timing.phase("connect"):
+                self._socket.connect(self.address)
             self._socket.settimeout(None)
         except OSError as e:
             self._close_socket()
@@ -112,10 +248,9 @@ class TCPFetcher(Fetcher[AgentRawData]):
         if mode is not Mode.CHECKING:
             raise MKFetcherError(f"Refusing to fetch live data during {mode.name.lower()}")
 
-        agent_data, protocol = self._get_agent_data()
-        return self._validate_decrypted_data(self._decrypt(protocol, agent_data))
+        return self._validate_decrypted_data(self._get_agent_data())
 
-    def _get_agent_data(self) -> tuple[AgentRawData, TransportProtocol]:
+    def _get_agent_data(self) -> AgentRawData:
         try:
             raw_protocol = self._socket.recv(2, socket.MSG_WAITALL)
         except OSError as e:
@@ -130,16 +265,22 @@ class TCPFetcher(Fetcher[AgentRawData]):
 
         if protocol is TransportProtocol.TLS:
             with self._wrap_tls(controller_uuid) as ssock:
-                raw_agent_data = self._recvall(ssock)
-            try:
-                agent_data = AgentCtlMessage.from_bytes(raw_agent_data).payload
-            except ValueError as e:
-                raise MKFetcherError(f"Failed to deserialize versioned agent data: {e!r}") from e
-            return AgentRawData(agent_data[2:]), self._detect_transport_protocol(
-                agent_data[:2], empty_msg="Empty payload from controller at %s:%d" % self.address
-            )
+                return self._recvall(ssock, self._agent_ctl_output())
+
+        return self._recvall(self._socket, self._agent_output(protocol), socket.MSG_WAITALL)
 
-        return AgentRawData(self._recvall(self._socket, socket.MSG_WAITALL)), protocol
+    def _agent_output(self, protocol: TransportProtocol) -> _AgentOutput:
+        return _AgentOutput(protocol, self.encryption_settings.get("passphrase"))
+
+    def _agent_ctl_output(self) -> _AgentCtlOutput:
+        return _AgentCtlOutput(
+            lambda raw_protocol: self._agent_output(
+                self._detect_transport_protocol(
+                    raw_protocol,
+                    empty_msg="Empty payload from controller at %s:%d" % self.address,
+                )
+            )
+        )
 
     def _detect_transport_protocol(self, raw_protocol: bytes, empty_msg: str) -> TransportProtocol:
         try:
@@ -184,50 +325,210 @@ class TCPFetcher(Fetcher[AgentRawData]):
 
         self._logger.debug("Reading data from agent via TLS socket")
         try:
-            ctx = ssl.create_default_context(cafile=str(paths.root_cert_file))
-            ctx.load_cert_chain(certfile=paths.site_cert_file)
-            return ctx.wrap_socket(self._socket, server_hostname=str(controller_uuid))
+            with timing.phase("tls_handshake"):
+                return self._make_tls_context().wrap_socket(
+                    self._socket, server_hostname=str(controller_uuid)
+                )
         except ssl.SSLError as e:
             raise MKFetcherError("Error establishing TLS connection") from e
 
-    def _recvall(self, sock: socket.socket, flags: int = 0) -> bytes:
+    @staticmethod
+    def _make_tls_context() -> ssl.SSLContext:
+        ctx = ssl.create_default_context(cafile=str(paths.root_cert_file))
+        ctx.load_cert_chain(certfile=paths.site_cert_file)
+        return ctx
+
+    def _recvall(
+        self, sock: socket.socket, output: _AgentOutput | _AgentCtlOutput, flags: int = 0
+    ) -> AgentRawData:
         self._logger.debug("Reading data from agent")
-        buffer: list[bytes] = []
+        with timing.phase("receive") as sample:
+            try:
+                while True:
+                    with output.buffer() as buffer:
+                        nbytes = sock.recv_into(buffer, 0, flags)
+                    if not nbytes:
+                        break
+                    output.commit(nbytes)
+                    sample.nbytes += nbytes
+            except OSError as e:
+                if cmk.utils.debug.enabled():
+                    raise
+                raise MKFetcherError("Communication failed: %s" % e)
+        return output.result()
+
+    def _validate_decrypted_data(self, output: AgentRawData) -> AgentRawData:
+        if len(output) < 16:
+            raise MKFetcherError(
+                f"Too short payload from agent at {self.address[0]}:{self.address[1]}: {output!r}"
+            )
+        return output
+
+    async def fetch_async(self, mode: Mode) -> AgentRawData:
+        """Fetch the agent data on the running event loop.
+
+        This is the non-blocking counterpart to `fetch()`.  It opens its
+        own connection, so `open()` and `close()` are not used.
+
+        See Also:
+            `fetch_concurrently()`
+
+        """
+        self._logger.log(VERBOSE, "[%s] Execute data source (async)", self.__class__.__name__)
+        if mode is not Mode.CHECKING:
+            raise MKFetcherError(f"Refusing to fetch live data during {mode.name.lower()}")
+
+        verify_ipaddress(self.address[0])
+        self._logger.debug(
+            "Connecting via TCP to %s:%d (%ss timeout)",
+            self.address[0],
+            self.address[1],
+            self.timeout,
+        )
         try:
-            while True:
-                data = sock.recv(4096, flags)
-                if not data:
-                    break
-                buffer.append(data)
+            with timing.phase("connect"):
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.address[0], self.address[1], family=self.family),
+                    self.timeout,
+                )
+        except asyncio.TimeoutError as e:
+            raise MKFetcherError("Communication failed: timed out") from e
         except OSError as e:
-            if cmk.utils.debug.enabled():
-                raise
-            raise MKFetcherError("Communication failed: %s" % e)
-
-        return b"".join(buffer)
+            raise MKFetcherError("Communication failed: %s" % e) from e
 
-    def _decrypt(self, protocol: TransportProtocol, output: AgentRawData) -> AgentRawData:
-        if not output:
-            return output  # nothing to to, validation will fail
+        try:
+            agent_data = await self._get_agent_data_async(reader, writer)
+        finally:
+            self._logger.debug("Closing TCP connection to %s:%d", self.address[0], self.address[1])
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
 
-        if protocol is TransportProtocol.PLAIN:
-            return protocol.value + output  # bring back stolen bytes
+        return self._validate_decrypted_data(agent_data)
 
-        self._logger.debug("Try to decrypt output")
+    async def _get_agent_data_async(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> AgentRawData:
         try:
-            return AgentRawData(
-                decrypt_by_agent_protocol(
-                    self.encryption_settings["passphrase"],
-                    protocol,
-                    output,
+            raw_protocol = await reader.readexactly(2)
+        except asyncio.IncompleteReadError as e:
+            raw_protocol = e.partial
+        except OSError as e:
+            raise MKFetcherError(f"Communication failed: {e}") from e
+
+        protocol = self._detect_transport_protocol(
+            raw_protocol, empty_msg="Empty output from host %s:%d" % self.address
+        )
+
+        controller_uuid = get_uuid_link_manager().get_uuid(self.host_name)
+        self._validate_protocol(protocol, is_registered=controller_uuid is not None)
+
+        if protocol is TransportProtocol.TLS:
+            if controller_uuid is None:
+                raise MKFetcherError("Agent controller not registered")
+            self._logger.debug("Reading data from agent via TLS socket")
+            try:
+                with timing.phase("tls_handshake"):
+                    tls_writer = await self._start_tls_async(
+                        reader, writer, server_hostname=str(controller_uuid)
+                    )
+            except ssl.SSLError as e:
+                raise MKFetcherError("Error establishing TLS connection") from e
+            try:
+                return await self._recvall_async(reader, self._agent_ctl_output())
+            finally:
+                tls_writer.close()
+
+        return await self._recvall_async(reader, self._agent_output(protocol))
+
+    async def _start_tls_async(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, *, server_hostname: str
+    ) -> asyncio.StreamWriter:
+        """Upgrade the connection to TLS and return the writer for the TLS transport
+
+        The reader keeps reading from the same protocol, which now receives the
+        decrypted data.  (`asyncio.StreamWriter.start_tls()` needs Python 3.11.)
+        """
+        loop = asyncio.get_running_loop()
+        protocol = writer.transport.get_protocol()
+        await writer.drain()
+        transport = await loop.start_tls(
+            writer.transport, protocol, self._make_tls_context(), server_hostname=server_hostname
+        )
+        assert isinstance(transport, asyncio.Transport)
+        return asyncio.StreamWriter(transport, protocol, reader, loop)
+
+    async def _recvall_async(
+        self, reader: asyncio.StreamReader, output: _AgentOutput | _AgentCtlOutput
+    ) -> AgentRawData:
+        self._logger.debug("Reading data from agent")
+        with timing.phase("receive") as sample:
+            try:
+                while data := await reader.read(_RECV_SIZE):
+                    output.feed(data)
+                    sample.nbytes += len(data)
+            except OSError as e:
+                raise MKFetcherError("Communication failed: %s" % e) from e
+        return output.result()
+
+
+def fetch_concurrently(
+    fetchers: Iterable[TCPFetcher],
+    mode: Mode,
+    *,
+    max_concurrency: int,
+    timeout: float | None = None,
+) -> Sequence[result.Result[AgentRawData, Exception]]:
+    """Fetch the agent data of many hosts concurrently from one process.
+
+    Args:
+        fetchers: The fetchers to run.
+        mode: The fetch mode, see `Fetcher.fetch()`.
+        max_concurrency: The maximum number of open connections.
+        timeout: Upper bound for the overall duration of a single fetch
+            (connect, TLS handshake, receive and decrypt), or `None` for
+            no bound other than the connect timeout of the fetcher.
+
+    Returns:
+        The results in the same order as `fetchers`, exactly like
+        `Fetcher.fetch()` would have returned them.
+
+    """
+    return asyncio.run(
+        _fetch_concurrently(list(fetchers), mode, max_concurrency=max_concurrency, timeout=timeout)
+    )
+
+
+async def _fetch_concurrently(
+    fetchers: Sequence[TCPFetcher],
+    mode: Mode,
+    *,
+    max_concurrency: int,
+    timeout: float | None,
+) -> Sequence[result.Result[AgentRawData, Exception]]:
+    if max_concurrency < 1:
+        raise ValueError(max_concurrency)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(fetcher: TCPFetcher) -> result.Result[AgentRawData, Exception]:
+        async with semaphore:
+            try:
+                return result.OK(await asyncio.wait_for(fetcher.fetch_async(mode), timeout))
+            except asyncio.TimeoutError:
+                return result.Error(
+                    MKFetcherError(
+                        "Communication failed: timeout after %ss fetching from %s:%d"
+                        % (timeout, fetcher.address[0], fetcher.address[1])
+                    )
+                )
+            except MKFetcherError as exc:
+                return result.Error(exc)
+            except Exception as exc:
+                return result.Error(
+                    MKFetcherError(repr(exc) if any(exc.args) else type(exc).__name__)
                 )
-            )
-        except Exception as e:
-            raise MKFetcherError("Failed to decrypt agent output: %s" % e) from e
 
-    def _validate_decrypted_data(self, output: AgentRawData) -> AgentRawData:
-        if len(output) < 16:
-            raise MKFetcherError(
-                f"Too short payload from agent at {self.address[0]}:{self.address[1]}: {output!r}"
-            )
-        return output
+    return await asyncio.gather(*(fetch(fetcher) for fetcher in fetchers))
@@ -139,6 +139,60 @@ class MessageV1(Deserializer):
         return False
 
 
+class AgentCtlMessageDecoder:
+    """Decode an `AgentCtlMessage` as it arrives, chunk by chunk
+
+    `decode()` returns the next part of the payload, the complete (compressed)
+    message never has to be in memory.  The payloads are the same as with
+    `AgentCtlMessage.from_bytes()`, as are the errors.
+
+    """
+
+    def __init__(self) -> None:
+        self._header = bytearray()
+        self._header_length: Final = len(bytes(Version.V1)) + len(
+            HeaderV1(CompressionType.UNCOMPRESSED)
+        )
+        self._decompressor: zlib._Decompress | None = None
+        self._started = False
+
+    def _start(self) -> None:
+        version = Version.from_bytes(self._header)
+        if version is not Version.V1:
+            # unreachable
+            raise NotImplementedError
+        header = HeaderV1.from_bytes(self._header[len(bytes(version)) :])
+        if header.compression_type is CompressionType.ZLIB:
+            self._decompressor = zlib.decompressobj()
+        self._started = True
+
+    def decode(self, data: bytes | memoryview) -> bytes | memoryview:
+        view = memoryview(data)
+        if not self._started:
+            missing = self._header_length - len(self._header)
+            self._header += view[:missing]
+            view = view[missing:]
+            if len(self._header) < self._header_length:
+                return b""
+            self._start()
+
+        if self._decompressor is None:
+            return view
+        try:
+            return self._decompressor.decompress(view)
+        except zlib.error as e:
+            raise ValueError(f"Decompression with zlib failed: {e!r}") from e
+
+    def finish(self) -> bytes:
+        if not self._started:
+            return AgentCtlMessage.from_bytes(bytes(self._header)).payload
+        if self._decompressor is None:
+            return b""
+        if not self._decompressor.eof:
+            raise ValueError("Decompression with zlib failed: incomplete or truncated stream")
+        return self._decompressor.flush()
+
+
 def _decompress(
     compression_type: CompressionType,
     data: bytes,
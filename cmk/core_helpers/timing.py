@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Wall clock time and bytes of the phases of fetching and parsing
+
+The fetchers, file caches and parsers report their phases (connect, TLS
+handshake, receive, decrypt, parse, section store update, ...) with
+
+    with timing.phase("receive") as sample:
+        ...
+        sample.nbytes = len(data)
+
+This costs next to nothing unless the caller is recording:
+
+    with timing.record(host_name) as phase_times:
+        for source in sources:
+            with timing.source(source.ident):
+                ...
+
+On exit, `record()` adds the phase times to per source and phase
+histograms that are merged into a site-wide dump file every minute.
+Every bucket of the histograms names the last host that landed in it,
+which leads straight to the slow hosts.
+
+"""
+
+import atexit
+import bisect
+import logging
+import time
+from collections.abc import Iterator, Mapping, MutableMapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final
+
+import cmk.utils.debug
+import cmk.utils.paths
+import cmk.utils.store as store
+from cmk.utils.type_defs import HostName
+
+__all__ = [
+    "histograms_path",
+    "phase",
+    "PhaseTime",
+    "PhaseTimes",
+    "record",
+    "source",
+]
+
+# Upper bounds of the buckets in seconds, the last bucket is unbounded.
+BOUNDS: Final = tuple(0.001 * 2**n for n in range(17))  # 1ms to 65s
+_FLUSH_INTERVAL: Final = 60.0
+
+_current: Final[ContextVar["PhaseTimes | None"]] = ContextVar("phase_times", default=None)
+_source: Final[ContextVar[str]] = ContextVar("phase_source", default="")
+
+
+@dataclass
+class PhaseTime:
+    seconds: float = 0.0
+    nbytes: int = 0
+
+
+class PhaseTimes:
+    """The phase times of the sources of a host"""
+
+    def __init__(self, host_name: HostName) -> None:
+        self.host_name: Final = host_name
+        self.phases: Final[dict[tuple[str, str], PhaseTime]] = {}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.host_name!r})"
+
+    def add(self, source_ident: str, phase_name: str, seconds: float, nbytes: int) -> None:
+        entry = self.phases.setdefault((source_ident, phase_name), PhaseTime())
+        entry.seconds += seconds
+        entry.nbytes += nbytes
+
+    def by_phase(self) -> Mapping[str, PhaseTime]:
+        """The times of every phase, summed up over all sources"""
+        summed: dict[str, PhaseTime] = {}
+        for (_source_ident, phase_name), entry in self.phases.items():
+            total = summed.setdefault(phase_name, PhaseTime())
+            total.seconds += entry.seconds
+            total.nbytes += entry.nbytes
+        return summed
+
+
+@contextmanager
+def record(host_name: HostName) -> Iterator[PhaseTimes]:
+    phase_times = PhaseTimes(host_name)
+    token = _current.set(phase_times)
+    try:
+        yield phase_times
+    finally:
+        _current.reset(token)
+        _histograms.add(phase_times)
+
+
+@contextmanager
+def source(ident: str) -> Iterator[None]:
+    token = _source.set(ident)
+    try:
+        yield
+    finally:
+        _source.reset(token)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[PhaseTime]:
+    """Measure the wall clock time of a phase, the caller may set the bytes"""
+    sample = PhaseTime()
+    start = time.perf_counter()
+    try:
+        yield sample
+    finally:
+        if (phase_times := _current.get()) is not None:
+            phase_times.add(_source.get(), name, time.perf_counter() - start, sample.nbytes)
+
+
+def histograms_path() -> Path:
+    return Path(cmk.utils.paths.tmp_dir, "fetch_phase_histograms.mk")
+
+
+# source ident -> phase -> histogram
+_Dump = MutableMapping[str, MutableMapping[str, MutableMapping[str, object]]]
+
+
+class _Histograms:
+    """Collect the phase times of this process and merge them into the dump file"""
+
+    def __init__(self) -> None:
+        self._pending: _Dump = {}
+        self._last_flush = 0.0
+        self._atexit_registered = False
+
+    def add(self, phase_times: PhaseTimes) -> None:
+        for (source_ident, phase_name), entry in phase_times.phases.items():
+            histogram = self._pending.setdefault(source_ident, {}).setdefault(
+                phase_name, _empty_histogram()
+            )
+            _add_sample(histogram, entry, phase_times.host_name)
+
+        if not self._atexit_registered:
+            atexit.register(self._try_flush)
+            self._atexit_registered = True
+        if time.monotonic() - self._last_flush >= _FLUSH_INTERVAL:
+            self._try_flush()
+
+    def _try_flush(self) -> None:
+        try:
+            self.flush()
+        except Exception as exc:
+            if cmk.utils.debug.enabled():
+                raise
+            logging.getLogger("cmk.helper").debug("Cannot write %s: %s", histograms_path(), exc)
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+
+        path = histograms_path()
+        try:
+            dump = store.load_object_from_file(path, default={}, lock=True)
+            if dump.get("bounds") != BOUNDS:
+                dump = {"bounds": BOUNDS, "histograms": {}}
+            for source_ident, phases in self._pending.items():
+                for phase_name, histogram in phases.items():
+                    _merge(
+                        dump["histograms"]
+                        .setdefault(source_ident, {})
+                        .setdefault(phase_name, _empty_histogram()),
+                        histogram,
+                    )
+            store.save_object_to_file(path, dump)
+        finally:
+            store.release_lock(path)
+        self._pending = {}
+
+
+_histograms: Final = _Histograms()
+
+
+def _empty_histogram() -> MutableMapping[str, object]:
+    return {
+        "count": 0,
+        "seconds": 0.0,
+        "bytes": 0,
+        "buckets": [0] * (len(BOUNDS) + 1),
+        "exemplars": [None] * (len(BOUNDS) + 1),
+    }
+
+
+def _add_sample(histogram: MutableMapping, sample: PhaseTime, host_name: HostName) -> None:
+    index = bisect.bisect_left(BOUNDS, sample.seconds)
+    histogram["count"] += 1
+    histogram["seconds"] += sample.seconds
+    histogram["bytes"] += sample.nbytes
+    histogram["buckets"][index] += 1
+    histogram["exemplars"][index] = str(host_name)
+
+
+def _merge(into: MutableMapping, histogram: Mapping) -> None:
+    into["count"] += histogram["count"]
+    into["seconds"] += histogram["seconds"]
+    into["bytes"] += histogram["bytes"]
+    for index, (count, exemplar) in enumerate(zip(histogram["buckets"], histogram["exemplars"])):
+        into["buckets"][index] += count
+        if exemplar is not None:
+            into["exemplars"][index] = exemplar
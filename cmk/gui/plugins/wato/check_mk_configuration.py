@@ -2787,6 +2787,144 @@ class ConfigVariablePiggybackMaxCachefileAge(ConfigVariable):
         )
 
 
+@config_variable_registry.register
+class ConfigVariableAgentFileCacheCompression(ConfigVariable):
+    def group(self) -> Type[ConfigVariableGroup]:
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self) -> Type[ABCConfigDomain]:
+        return ConfigDomainCore
+
+    def ident(self) -> str:
+        return "agent_file_cache_compression"
+
+    def valuespec(self) -> ValueSpec:
+        return Checkbox(
+            title=_("Compress cached agent output"),
+            label=_("compress the agent file caches"),
+            help=_(
+                "The output of the agents, datasource programs and special agents is cached "
+                "in the temporary file system of the site, which is kept in memory. Agent "
+                "output usually compresses very well, so enabling this reduces the memory "
+                "used by the caches considerably at the cost of a little CPU time when the "
+                "cache files are written and read. Use <tt>cmk --file-cache-usage</tt> to "
+                "see the space used by the caches."
+            ),
+        )
+
+
+@config_variable_registry.register
+class ConfigVariableUseSpecialAgentForkserver(ConfigVariable):
+    def group(self) -> Type[ConfigVariableGroup]:
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self) -> Type[ABCConfigDomain]:
+        return ConfigDomainCore
+
+    def ident(self) -> str:
+        return "use_special_agent_forkserver"
+
+    def valuespec(self) -> ValueSpec:
+        return Checkbox(
+            title=_("Fork special agents from a preloaded interpreter"),
+            label=_("use the fork server for special agents"),
+            help=_(
+                "Most special agents shipped with Checkmk are written in Python. Executing "
+                "them means starting a new interpreter and importing the libraries they need "
+                "for every single run. With this option, the Checkmk helpers of the "
+                "Checkmk Micro Core keep a process around that has imported these libraries "
+                "once and let it fork a child process for every run instead. Other special "
+                "agents and datasource programs are executed as before. This option has no "
+                "effect with the Nagios core."
+            ),
+        )
+
+
+@config_variable_registry.register
+class ConfigVariableFetchPhaseStatistics(ConfigVariable):
+    def group(self) -> Type[ConfigVariableGroup]:
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self) -> Type[ABCConfigDomain]:
+        return ConfigDomainCore
+
+    def ident(self) -> str:
+        return "fetch_phase_statistics"
+
+    def valuespec(self) -> ValueSpec:
+        return Checkbox(
+            title=_("Record the times of the fetching phases"),
+            label=_("record connect, receive, decrypt and parse times"),
+            help=_(
+                "Measure how long the phases of fetching and parsing the monitoring data "
+                "take (connecting, TLS handshake, receiving, decrypting, executing "
+                "programs, SNMP walks, parsing and updating the caches), and how many bytes "
+                "they handle. The times are added to per-phase histograms in "
+                "<tt>tmp/check_mk/fetch_phase_histograms.mk</tt> that name an example host "
+                "for each bucket. With the Nagios core and on the command line, they are also "
+                "shown as performance data of the <i>Check_MK</i> service if the detailed "
+                "execution times are enabled."
+            ),
+        )
+
+
+@config_variable_registry.register
+class ConfigVariableParseResultCache(ConfigVariable):
+    def group(self) -> Type[ConfigVariableGroup]:
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self) -> Type[ABCConfigDomain]:
+        return ConfigDomainCore
+
+    def ident(self) -> str:
+        return "parse_result_cache"
+
+    def valuespec(self) -> ValueSpec:
+        return Checkbox(
+            title=_("Keep parsed sections between check cycles"),
+            label=_("reuse parsed cached and persisted sections"),
+            help=_(
+                "Cached agent sections and persisted sections often contain the same data "
+                "for many check cycles in a row. If this option is enabled, the parsed "
+                "sections are kept in <tt>tmp/check_mk/parsed_sections</tt> and are reused "
+                "as long as the raw data and the section plugin are unchanged, instead of "
+                "parsing them again. Sections that are fetched anew in every cycle are always "
+                "parsed."
+            ),
+        )
+
+
+@config_variable_registry.register
+class ConfigVariableRulesetMatchingCacheSize(ConfigVariable):
+    def group(self) -> Type[ConfigVariableGroup]:
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self) -> Type[ABCConfigDomain]:
+        return ConfigDomainCore
+
+    def ident(self) -> str:
+        return "ruleset_matching_cache_size"
+
+    def valuespec(self) -> ValueSpec:
+        return Optional(
+            valuespec=Integer(
+                minvalue=1000,
+                default_value=200000,
+                unit=_("entries"),
+            ),
+            title=_("Size of the ruleset matching caches"),
+            label=_("Limit the number of entries per cache"),
+            help=_(
+                "The results of the ruleset matching are cached per service and per rule "
+                "condition. In long running processes like the check helpers these caches may "
+                "grow large. With this option the least recently used entries are dropped once "
+                "a cache reaches the given size, which trades memory for CPU time. Sending the "
+                "signal <tt>SIGUSR1</tt> to a Checkmk process logs the statistics of the caches."
+            ),
+            none_label=_("(unbounded)"),
+        )
+
+
 @config_variable_registry.register
 class ConfigVariableCheckMKPerfdataWithTimes(ConfigVariable):
     def group(self) -> Type[ConfigVariableGroup]:
@@ -2840,20 +2978,25 @@ class ConfigVariableUseDNSCache(ConfigVariable):
 
 
 def transform_snmp_backend_default_to_valuespec(
-    backend: Literal["classic", "inline"]
+    backend: Literal["classic", "inline", "pysnmp_backend"]
 ) -> SNMPBackendEnum:
     return {
         "classic": SNMPBackendEnum.CLASSIC,
         "inline": SNMPBackendEnum.INLINE,
+        "pysnmp_backend": SNMPBackendEnum.PYSNMP,
     }[backend]
 
 
-def transform_snmp_backend_from_valuespec(backend: SNMPBackendEnum) -> Literal["classic", "inline"]:
+def transform_snmp_backend_from_valuespec(
+    backend: SNMPBackendEnum,
+) -> Literal["classic", "inline", "pysnmp_backend"]:
     match backend:
         case SNMPBackendEnum.CLASSIC:
             return "classic"
         case SNMPBackendEnum.INLINE:
             return "inline"
+        case SNMPBackendEnum.PYSNMP:
+            return "pysnmp_backend"
         case _:
             raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
@@ -2876,6 +3019,7 @@ class ConfigVariableChooseSNMPBackend(ConfigVariable):
                 choices=[
                     (SNMPBackendEnum.CLASSIC, _("Use Classic SNMP Backend")),
                     (SNMPBackendEnum.INLINE, _("Use Inline SNMP Backend")),
+                    (SNMPBackendEnum.PYSNMP, _("Use PySNMP Backend")),
                 ],
                 help=_(
                     "By default Checkmk uses command line calls of Net-SNMP tools like snmpget or "
@@ -2884,7 +3028,9 @@ class ConfigVariableChooseSNMPBackend(ConfigVariable):
                     "which calls the respective libraries directly via its python bindings. This "
                     "should increase the performance of SNMP checks in a significant way. Both "
                     "SNMP modes are features which improve the performance for large installations and are "
-                    "only available via our subscription."
+                    "only available via our subscription. The PySNMP backend keeps a long-lived "
+                    "SNMP session per set of credentials within the Checkmk process instead of "
+                    "running a command per request and is available in all editions."
                 ),
             ),
             to_valuespec=transform_snmp_backend_hosts_to_valuespec,
@@ -4967,6 +5113,38 @@ rulespec_registry.register(
 )
 
 
+def _valuespec_snmp_max_parallel_walks():
+    return Integer(
+        title=_("Number of parallel SNMP walks"),
+        label=_("Walk up to this number of OIDs at once: "),
+        minvalue=1,
+        maxvalue=32,
+        default_value=1,
+        help=_(
+            "By default Checkmk walks the OIDs of an SNMP section one after another. With this "
+            "rule, the OIDs of a section are walked concurrently instead, using at most the "
+            "configured number of parallel walks per device. This mostly helps for devices "
+            "behind links with a high latency, where the time needed for a walk is dominated "
+            "by the round trips. Only the classic and the PySNMP backend walk in parallel, "
+            "all other backends ignore this setting.<br><br>"
+            "<b>Warning:</b> Many devices, especially ones with a weak management CPU, handle "
+            "concurrent requests poorly. They may answer slowly, drop requests or even stop "
+            "responding, which results in timeouts and incomplete data. Only increase this "
+            "value for devices you know to cope with it, and check the duration of the SNMP "
+            "walks and the load of the device afterwards."
+        ),
+    )
+
+
+rulespec_registry.register(
+    HostRulespec(
+        group=RulespecGroupAgentSNMP,
+        name="snmp_max_parallel_walks",
+        valuespec=_valuespec_snmp_max_parallel_walks,
+    )
+)
+
+
 def _help_snmp_without_sys_descr():
     return _(
         "Devices which do not publish the system description OID .1.3.6.1.2.1.1.1.0 are "
@@ -5098,8 +5276,11 @@ def transform_snmp_backend_hosts_to_valuespec(backend):
         return SNMPBackendEnum.INLINE
     if backend in [True, "classic", "pysnmp"]:
         # We dropped pysnmp during the 2.1 beta because it is currently slow
-        # and unreliable.
+        # and unreliable. Rules of that time keep using the classic backend,
+        # the current PySNMP backend has to be chosen explicitly.
         return SNMPBackendEnum.CLASSIC
+    if backend == "pysnmp_backend":
+        return SNMPBackendEnum.PYSNMP
     raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
 
@@ -5110,6 +5291,7 @@ def _valuespec_snmp_backend():
             choices=[
                 (SNMPBackendEnum.INLINE, _("Use Inline SNMP Backend")),
                 (SNMPBackendEnum.CLASSIC, _("Use Classic Backend")),
+                (SNMPBackendEnum.PYSNMP, _("Use PySNMP Backend")),
             ],
         ),
         to_valuespec=transform_snmp_backend_hosts_to_valuespec,
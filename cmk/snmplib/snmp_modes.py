@@ -88,6 +88,46 @@ def get_single_oid(
     return decoded_value
 
 
+def prefetch_single_oids(
+    oids: Iterable[OID], *, section_name: SectionName | None = None, backend: SNMPBackend
+) -> None:
+    """Populate the single OID cache for many OIDs with as few requests as possible
+
+    OIDs that are cached already are skipped.  OIDs ending with ".*"
+    require a GETNEXT and are left to `get_single_oid()`, as are OIDs
+    that could not be fetched.  Only OIDs the device reported as
+    nonexistent are cached as None.
+    """
+    cache = snmp_cache.single_oid_cache()
+    missing = sorted(
+        {
+            oid
+            for oid in (oid if oid.startswith(".") else "." + oid for oid in oids)
+            if oid not in cache and not oid.endswith(".*")
+        }
+    )
+    if not missing:
+        return
+
+    console.vverbose("       Getting %d OIDs in bulk\n" % len(missing))
+    values: dict[OID, SNMPRawValue | None] = {}
+    for context_name in backend.config.snmpv3_contexts_of(section_name):
+        try:
+            values.update(
+                backend.get_many([oid for oid in missing if values.get(oid) is None], context_name)
+            )
+        except Exception as e:
+            if cmk.utils.debug.enabled():
+                raise
+            console.verbose("       Getting OIDs in bulk failed: %s\n" % e)
+            # The OIDs may exist in the context that failed.
+            values = {oid: value for oid, value in values.items() if value is not None}
+            break
+
+    for oid, value in values.items():
+        cache[oid] = None if value is None else backend.config.ensure_str(value)
+
+
 def walk_for_export(oid: OID, *, backend: SNMPBackend) -> SNMPRowInfoForStoredWalk:
     return _convert_rows_for_stored_walk(backend.walk(oid=oid))
 
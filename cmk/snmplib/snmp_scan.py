@@ -13,7 +13,7 @@ from cmk.utils.type_defs import SectionName, SNMPDetectBaseType
 
 import cmk.snmplib.snmp_cache as snmp_cache
 import cmk.snmplib.snmp_modes as snmp_modes
-from cmk.snmplib.type_defs import SNMPBackend
+from cmk.snmplib.type_defs import SNMPBackend, SNMPContext
 from cmk.snmplib.utils import evaluate_snmp_detection
 
 SNMPScanSection = tuple[SectionName, SNMPDetectBaseType]
@@ -51,7 +51,7 @@ OID_SYS_OBJ = ".1.3.6.1.2.1.1.2.0"
 
 
 def _snmp_scan(
-    sections: Iterable[SNMPScanSection],
+    sections: Collection[SNMPScanSection],
     *,
     on_error: OnError,
     missing_sys_description: bool,
@@ -65,6 +65,7 @@ def _snmp_scan(
     else:
         _prefetch_description_object(backend=backend)
 
+    _prefetch_detect_oids(sections, backend=backend)
     found_sections = _find_sections(
         sections,
         on_error=on_error,
@@ -88,6 +89,24 @@ def _prefetch_description_object(*, backend: SNMPBackend) -> None:
             )
 
 
+def _prefetch_detect_oids(sections: Iterable[SNMPScanSection], *, backend: SNMPBackend) -> None:
+    """Fetch all OIDs referenced by the detect specs upfront
+
+    The detection itself then runs from the single OID cache and
+    does not issue one request per OID.
+    """
+    # Sections with the same SNMPv3 contexts can share their requests.
+    oids_by_contexts: dict[tuple[SNMPContext, ...], tuple[SectionName, set[str]]] = {}
+    for name, specs in sections:
+        _name, oids = oids_by_contexts.setdefault(
+            tuple(backend.config.snmpv3_contexts_of(name)), (name, set())
+        )
+        oids.update(oid for alternative in specs for oid, _pattern, _flag in alternative)
+
+    for name, oids in oids_by_contexts.values():
+        snmp_modes.prefetch_single_oids(oids, section_name=name, backend=backend)
+
+
 def _fake_description_object() -> None:
     """Fake OID values to prevent issues with a lot of scan functions"""
     console.vverbose(
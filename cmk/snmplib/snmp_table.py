@@ -4,8 +4,22 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """Provide methods to get an snmp table with or without caching
 """
-from collections.abc import Callable, Iterable, Iterator, MutableMapping, Sequence
+import mmap
+import os
+import struct
+from collections.abc import (
+    Callable,
+    Collection,
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableMapping,
+    Sequence,
+)
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Final
 
 import cmk.utils.debug
 import cmk.utils.store as store
@@ -42,6 +56,9 @@ class WalkCache(
     The fetched data is always saved to a file *if* the respective OID is marked as being cached
     by the plugin using `OIDCached` (that is: if the save_to_cache attribute of the OID object
     is true).
+
+    All walks of a host are kept in a single file, indexed by fetchoid (see `_WalkCacheFile`).
+    Only the walks needed by the trees at hand are read from it.
     """
 
     __slots__ = ("_store", "_path")
@@ -50,19 +67,9 @@ class WalkCache(
         self._store: MutableMapping[str, tuple[bool, SNMPRowInfo]] = {}
         self._path = Path(cmk.utils.paths.var_dir, "snmp_cache", host_name)
 
-    def _read_row(self, path: Path) -> SNMPRowInfo:
-        return store.load_object_from_file(path, default=None)
-
-    def _write_row(self, path: Path, rowinfo: SNMPRowInfo) -> None:
-        return store.save_object_to_file(path, rowinfo, pretty=False)
-
-    @staticmethod
-    def _oid2name(fetchoid: str) -> str:
-        return f"OID{fetchoid}"
-
-    @staticmethod
-    def _name2oid(basename: str) -> str:
-        return basename[3:]
+    @property
+    def _file(self) -> "_WalkCacheFile":
+        return _WalkCacheFile(self._path / "walks")
 
     def _iterfiles(self) -> Iterable[Path]:
         if not self._path.is_dir():
@@ -96,7 +103,8 @@ class WalkCache(
         *,
         trees: Iterable[BackendSNMPTree],
     ) -> None:
-        """Try to read the OIDs data from cache files"""
+        """Try to read the OIDs data from the cache file"""
+        trees = list(trees)
         # Do not load the cached data if *any* plugin needs live data
         do_not_load = {
             f"{tree.base}.{oid.column}"
@@ -104,35 +112,151 @@ class WalkCache(
             for oid in tree.oids
             if not oid.save_to_cache
         }
+        fetchoids = {
+            f"{tree.base}.{oid.column}"
+            for tree in trees
+            for oid in tree.oids
+            if not isinstance(oid.column, SpecialColumn)
+        } - do_not_load
+        if not fetchoids:
+            return
+
+        walk_file = self._file
+        try:
+            walks = walk_file.read(fetchoids)
+        except Exception:
+            console.vverbose(f"  Failed to load walk cache {walk_file.path}\n")
+            if cmk.utils.debug.enabled():
+                raise
+            return
+
+        for fetchoid, read_walk in walks.items():
+            console.vverbose(f"  Loaded {fetchoid} from walk cache {walk_file.path}\n")
+            # 'False': no need to store this value: it is already stored!
+            self._store[fetchoid] = (False, read_walk)
 
-        for path in self._iterfiles():
-            fetchoid = self._name2oid(path.name)
-            if fetchoid in do_not_load:
-                continue
+    def save(self) -> None:
+        walks = {
+            fetchoid: rowinfo for fetchoid, (save_flag, rowinfo) in self._store.items() if save_flag
+        }
+        if not walks:
+            return
 
-            console.vverbose(f"  Loading {fetchoid} from walk cache {path}\n")
-            try:
-                read_walk = self._read_row(path)
-            except Exception:
-                console.vverbose(f"  Failed to load {fetchoid} from walk cache {path}\n")
-                if cmk.utils.debug.enabled():
-                    raise
-                continue
+        self._path.mkdir(parents=True, exist_ok=True)
+        walk_file = self._file
+        console.vverbose(f"  Saving walks of {', '.join(walks)} to walk cache {walk_file.path}\n")
+        walk_file.update(walks)
 
-            if read_walk is not None:
-                # 'False': no need to store this value: it is already stored!
-                self._store[fetchoid] = (False, read_walk)
 
-    def save(self) -> None:
-        self._path.mkdir(parents=True, exist_ok=True)
+class _WalkCacheFile:
+    """The walks of a host in a single file
 
-        for fetchoid, (save_flag, rowinfo) in self._store.items():
-            if not save_flag:
-                continue
+    The file is memory-mapped so that only the index and the walks that are
+    actually needed are ever read.  The layout (all integers little-endian) is:
 
-            path = self._path / self._oid2name(fetchoid)
-            console.vverbose(f"  Saving walk of {fetchoid} to walk cache {path}\n")
-            self._write_row(path, rowinfo)
+        magic     8 bytes
+        count     uint32: number of walks
+        index     count * (uint16 len(fetchoid), uint64 offset, uint64 length, fetchoid)
+        walks     per row (uint16 len(oid), uint32 len(value), oid, value)
+
+    where the offsets of the walks are relative to the end of the index.
+    """
+
+    MAGIC = b"CMKWALK\x01"
+    _COUNT = struct.Struct("<I")
+    _ENTRY = struct.Struct("<HQQ")
+    _ROW = struct.Struct("<HI")
+
+    def __init__(self, path: Path) -> None:
+        self.path: Final = path
+
+    @contextmanager
+    def _mapped(self) -> Iterator[memoryview]:
+        try:
+            file_ = self.path.open("rb")
+        except FileNotFoundError:
+            yield memoryview(b"")
+            return
+
+        with file_:
+            if not os.fstat(file_.fileno()).st_size:
+                yield memoryview(b"")
+                return
+            with mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    yield view
+
+    @classmethod
+    def _read_index(cls, buffer: memoryview) -> tuple[Mapping[OID, tuple[int, int]], int]:
+        """Return the location of the walks and the start of the data"""
+        if not buffer:
+            return {}, 0
+        if buffer[: len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError("not a walk cache file")
+
+        pos = len(cls.MAGIC)
+        (count,) = cls._COUNT.unpack_from(buffer, pos)
+        pos += cls._COUNT.size
+        index = {}
+        for _ in range(count):
+            oid_len, offset, length = cls._ENTRY.unpack_from(buffer, pos)
+            pos += cls._ENTRY.size
+            index[str(buffer[pos : pos + oid_len], "ascii")] = (offset, length)
+            pos += oid_len
+        return index, pos
+
+    @classmethod
+    def _decode_rows(cls, buffer: memoryview) -> SNMPRowInfo:
+        rowinfo = []
+        pos = 0
+        while pos < len(buffer):
+            oid_len, value_len = cls._ROW.unpack_from(buffer, pos)
+            pos += cls._ROW.size
+            oid = str(buffer[pos : pos + oid_len], "ascii")
+            pos += oid_len
+            rowinfo.append((oid, bytes(buffer[pos : pos + value_len])))
+            pos += value_len
+        return rowinfo
+
+    @classmethod
+    def _encode_rows(cls, rowinfo: SNMPRowInfo) -> bytes:
+        return b"".join(
+            cls._ROW.pack(len(oid), len(value)) + oid.encode("ascii") + value
+            for oid, value in rowinfo
+        )
+
+    @classmethod
+    def _encode(cls, walks: Mapping[OID, bytes]) -> bytes:
+        index = []
+        offset = 0
+        for fetchoid, data in walks.items():
+            encoded_oid = fetchoid.encode("ascii")
+            index.append(cls._ENTRY.pack(len(encoded_oid), offset, len(data)) + encoded_oid)
+            offset += len(data)
+        return b"".join((cls.MAGIC, cls._COUNT.pack(len(walks)), *index, *walks.values()))
+
+    def read(self, fetchoids: Collection[OID]) -> Mapping[OID, SNMPRowInfo]:
+        with self._mapped() as buffer:
+            index, start = self._read_index(buffer)
+            return {
+                fetchoid: self._decode_rows(
+                    buffer[start + offset : start + offset + length],
+                )
+                for fetchoid, (offset, length) in index.items()
+                if fetchoid in fetchoids
+            }
+
+    def update(self, walks: Mapping[OID, SNMPRowInfo]) -> None:
+        """Add or replace the walks, keep all other walks in the file"""
+        with self._mapped() as buffer:
+            index, start = self._read_index(buffer)
+            data = {
+                fetchoid: bytes(buffer[start + offset : start + offset + length])
+                for fetchoid, (offset, length) in index.items()
+                if fetchoid not in walks
+            }
+        data.update((fetchoid, self._encode_rows(rowinfo)) for fetchoid, rowinfo in walks.items())
+        store.save_bytes_to_file(self.path, self._encode(data))
 
 
 def get_snmp_table(
@@ -141,7 +265,17 @@ def get_snmp_table(
     tree: BackendSNMPTree,
     walk_cache: MutableMapping[str, tuple[bool, SNMPRowInfo]],
     backend: SNMPBackend,
+    max_parallel_walks: int = 1,
 ) -> Sequence[SNMPTable]:
+    with parallel_walks_executor(backend, max_parallel_walks) as executor:
+        if executor is not None:
+            prefetch_snmpwalks(
+                section_name=section_name,
+                trees=[tree],
+                walk_cache=walk_cache,
+                backend=backend,
+                executor=executor,
+            )
 
     index_column = -1
     index_format: SpecialColumn | None = None
@@ -195,6 +329,77 @@ def get_snmp_table(
     return _make_table(columns, backend.config)
 
 
+@contextmanager
+def parallel_walks_executor(
+    backend: SNMPBackend, max_parallel_walks: int
+) -> Iterator[Executor | None]:
+    """The executor for `prefetch_snmpwalks`, or None if the walks are done one by one
+
+    Pass the executor to all calls of `prefetch_snmpwalks` for a host, so that
+    the number of parallel walks to the device is bounded in total.
+    """
+    if max_parallel_walks < 1:
+        raise ValueError(max_parallel_walks)
+
+    if max_parallel_walks == 1 or not backend.supports_concurrent_walks:
+        yield None
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_parallel_walks, thread_name_prefix="snmpwalk")
+    try:
+        yield executor
+    except BaseException:
+        # The check timeout (MKTimeout) only interrupts the main thread.  Do not
+        # wait for the running walks, but abort them.
+        executor.shutdown(wait=False, cancel_futures=True)
+        backend.abort_walks()
+        raise
+    executor.shutdown()
+
+
+def prefetch_snmpwalks(
+    *,
+    section_name: SectionName | None,
+    trees: Iterable[BackendSNMPTree],
+    walk_cache: MutableMapping[str, tuple[bool, SNMPRowInfo]],
+    backend: SNMPBackend,
+    executor: Executor,
+) -> None:
+    """Walk the columns of the trees concurrently and put the results into the walk cache
+
+    The columns already in the walk cache are not walked again, and every column
+    is walked at most once.  `get_snmp_table` then only reads from the walk cache.
+    See `parallel_walks_executor` for the executor.
+    """
+    # fetchoid -> (tree base, save to walk cache), the first tree wins like in `_get_snmpwalk`
+    pending: dict[OID, tuple[str, bool]] = {}
+    for tree in trees:
+        for oid in tree.oids:
+            if isinstance(oid.column, SpecialColumn):
+                continue
+            fetchoid = f"{tree.base}.{oid.column}"
+            if fetchoid not in walk_cache:
+                pending.setdefault(fetchoid, (tree.base, oid.save_to_cache))
+
+    if len(pending) < 2:
+        # Nothing to gain here.  Let `_get_snmpwalk` do the work.
+        return
+
+    console.vverbose(f"Walking {len(pending)} OIDs in parallel\n")
+    futures = {
+        fetchoid: executor.submit(_perform_snmpwalk, section_name, base, fetchoid, backend=backend)
+        for fetchoid, (base, _save_walk_cache) in pending.items()
+    }
+    try:
+        for fetchoid, future in futures.items():
+            walk_cache[fetchoid] = (pending[fetchoid][1], future.result())
+    except BaseException:
+        # The executor is shared with the other sections of the host.
+        for future in futures.values():
+            future.cancel()
+        raise
+
+
 def _make_index_rows(
     max_column: SNMPRowInfo,
     index_format: SpecialColumn,
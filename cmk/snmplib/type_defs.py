@@ -76,6 +76,7 @@ TRawData = TypeVar("TRawData", bound=AbstractRawData)
 class SNMPBackendEnum(enum.Enum):
     INLINE = "Inline"
     CLASSIC = "Classic"
+    PYSNMP = "PySNMP"
 
     def serialize(self) -> str:
         return self.name
@@ -175,6 +176,9 @@ class SNMPHostConfig(NamedTuple):
 
 
 class SNMPBackend(abc.ABC):
+    # Whether `walk()` may be called from several threads at a time.
+    supports_concurrent_walks = False
+
     def __init__(self, snmp_config: SNMPHostConfig, logger: logging.Logger) -> None:
         super().__init__()
         self._logger = logger
@@ -204,6 +208,33 @@ class SNMPBackend(abc.ABC):
         """
         raise NotImplementedError()
 
+    def get_many(
+        self, oids: Sequence[OID], context_name: SNMPContextName | None = None
+    ) -> Mapping[OID, SNMPRawValue | None]:
+        """Fetch many single OIDs from the given host in the given SNMP context
+
+        Backends that can put several variable bindings into one request
+        should override this.  OIDs ending with .* are not supported.
+        OIDs the device reported as nonexistent map to None.  OIDs that
+        are not contained in the result could not be fetched.  Overriding
+        backends raise MKSNMPError if a request fails.
+        """
+        # `get()` does not tell missing OIDs from failed requests.
+        values: dict[OID, SNMPRawValue | None] = {}
+        for oid in oids:
+            value = self.get(oid, context_name)
+            if value is not None:
+                values[oid] = value
+        return values
+
+    def abort_walks(self) -> None:
+        """Abort the walks that are running in other threads
+
+        Called from the main thread, for example on the check timeout, which
+        only interrupts the main thread.  Backends that support concurrent walks
+        and can abort them should override this.
+        """
+
     @abc.abstractmethod
     def walk(
         self,
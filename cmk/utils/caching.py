@@ -7,14 +7,17 @@
 from __future__ import annotations
 
 import collections
-from collections.abc import Callable
+import weakref
+from collections.abc import Callable, Hashable
 from functools import lru_cache, wraps
-from typing import ParamSpec, TypeVar
+from typing import Generic, NamedTuple, ParamSpec, TypeVar
 
 import cmk.utils.misc
 
 P = ParamSpec("P")
 R = TypeVar("R")
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
 
 
 # Used as decorator wrapper for functools.lru_cache in order to bind the cache to an instance method
@@ -98,3 +101,75 @@ config_cache = CacheManager()
 # time of the current Checkmk process. Single cached may be cleaned
 # manually during execution.
 runtime_cache = CacheManager()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int | None
+
+
+class LRUCache(Generic[K, V]):
+    """A cache with a bounded number of entries
+
+    When the cache is full, adding an entry evicts the least recently used one. Lookups with
+    cache[key] are counted as hits or misses (raising KeyError), "key in cache" is not counted.
+
+    All caches are registered under their name, see lru_cache_statistics(). Creating another
+    cache with the same name replaces the previous one in the statistics.
+    """
+
+    __slots__ = ["_data", "_maxsize", "_hits", "_misses", "_evictions", "__weakref__"]
+
+    def __init__(self, name: str, maxsize: int | None = None) -> None:
+        self._data: collections.OrderedDict[K, V] = collections.OrderedDict()
+        self._maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        _lru_caches[name] = self
+
+    def __getitem__(self, key: K) -> V:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self._misses += 1
+            raise
+        self._hits += 1
+        if self._maxsize is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._data[key] = value
+        if self._maxsize is None:
+            return
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self._evictions += 1
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __bool__(self) -> bool:
+        return bool(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses, self._evictions, len(self._data), self._maxsize)
+
+
+_lru_caches: weakref.WeakValueDictionary[str, LRUCache] = weakref.WeakValueDictionary()
+
+
+def lru_cache_statistics() -> dict[str, CacheInfo]:
+    """Returns the statistics of all LRU caches of this process by name"""
+    return {name: cache.info() for name, cache in sorted(_lru_caches.items())}
@@ -78,6 +78,99 @@ def decrypt_by_agent_protocol(
     )
 
 
+class AgentDecryptor:
+    """Decrypt the agent output chunk by chunk
+
+    Passing all of the encrypted package to `update()` and calling `finalize()`
+    returns what `decrypt_by_agent_protocol()` does, but the encrypted package
+    never has to be in memory as a whole.
+    """
+
+    def __init__(self, password: str, protocol: TransportProtocol) -> None:
+        self._password = password
+        self._protocol = protocol
+        self._cipher: Any = None
+        # The header, then the incomplete block at the end.
+        self._pending = bytearray()
+        self._decrypted = bytearray()
+
+    def _header_length(self) -> int:
+        if self._protocol is TransportProtocol.PBKDF2:
+            return len(OPENSSL_SALTED_MARKER) + _PBKDF2_SALT_LENGTH
+        return 0
+
+    def _make_cipher(self, header: bytes) -> Any:
+        if self._protocol is TransportProtocol.PBKDF2:
+            key, iv = _derive_pbkdf2_key_and_iv(self._password, header[-_PBKDF2_SALT_LENGTH:])
+        else:
+            key, iv = _derive_openssl_key_and_iv(
+                self._password.encode("utf-8"),
+                hashlib.sha256 if self._protocol is TransportProtocol.SHA256 else hashlib.md5,
+                32,
+                AES.block_size,
+            )
+        return AES.new(key, AES.MODE_CBC, iv)
+
+    def update(self, data: bytes | bytearray | memoryview) -> None:
+        view = memoryview(data)
+        if self._cipher is None:
+            missing = self._header_length() - len(self._pending)
+            self._pending += view[:missing]
+            view = view[missing:]
+            if len(self._pending) < self._header_length():
+                return
+            self._cipher = self._make_cipher(bytes(self._pending))
+            self._pending.clear()
+
+        if self._pending:
+            missing = AES.block_size - len(self._pending)
+            self._pending += view[:missing]
+            view = view[missing:]
+            if len(self._pending) < AES.block_size:
+                return
+            self._decrypted += self._cipher.decrypt(bytes(self._pending))
+            self._pending.clear()
+
+        complete = len(view) - len(view) % AES.block_size
+        if complete:
+            self._decrypted += self._cipher.decrypt(view[:complete])
+        self._pending += view[complete:]
+
+    def finalize(self) -> bytearray:
+        """The decrypted data
+
+        Raises:
+            ValueError, if the encrypted package is incomplete.
+
+        """
+        if self._cipher is None:
+            raise ValueError("Encrypted package too short")
+        if self._pending:
+            # Raises, the package is not a multiple of the block size.
+            self._cipher.decrypt(bytes(self._pending))
+        if not self._decrypted:
+            raise ValueError("Encrypted package is empty")
+        # Exactly like `_strip_fill_bytes()`, also for nonsensical fill bytes.
+        fill = self._decrypted[-1]
+        del self._decrypted[max(len(self._decrypted) - fill, 0) if fill else 0 :]
+        return self._decrypted
+
+
+_PBKDF2_SALT_LENGTH = 8
+
+
+def _derive_pbkdf2_key_and_iv(password: str, salt: bytes) -> tuple[bytes, bytes]:
+    """Key derivation: PKBDF2, with SHA256 digest, 10000 cycles"""
+    KEY_LENGTH = 32
+    IV_LENGTH = 16
+    PBKDF2_CYCLES = 10_000
+
+    raw_key = PBKDF2(
+        password, salt, KEY_LENGTH + IV_LENGTH, count=PBKDF2_CYCLES, hmac_hash_module=SHA256
+    )
+    return raw_key[:KEY_LENGTH], raw_key[KEY_LENGTH:]
+
+
 def _decrypt_aes_256_cbc_pbkdf2(
     ciphertext: bytes,
     password: str,
@@ -87,19 +180,11 @@ def _decrypt_aes_256_cbc_pbkdf2(
     Salted: yes
     Key Derivation: PKBDF2, with SHA256 digest, 10000 cycles
     """
-    SALT_LENGTH = 8
-    KEY_LENGTH = 32
-    IV_LENGTH = 16
-    PBKDF2_CYCLES = 10_000
-
-    salt = ciphertext[:SALT_LENGTH]
-    raw_key = PBKDF2(
-        password, salt, KEY_LENGTH + IV_LENGTH, count=PBKDF2_CYCLES, hmac_hash_module=SHA256
-    )
-    key, iv = raw_key[:KEY_LENGTH], raw_key[KEY_LENGTH:]
+    salt = ciphertext[:_PBKDF2_SALT_LENGTH]
+    key, iv = _derive_pbkdf2_key_and_iv(password, salt)
 
     decryption_suite = AES.new(key, AES.MODE_CBC, iv)
-    decrypted_pkg = decryption_suite.decrypt(ciphertext[SALT_LENGTH:])
+    decrypted_pkg = decryption_suite.decrypt(ciphertext[_PBKDF2_SALT_LENGTH:])
 
     return _strip_fill_bytes(decrypted_pkg)
 
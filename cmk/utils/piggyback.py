@@ -5,10 +5,13 @@
 
 import errno
 import logging
+import marshal
 import os
+import shutil
 import tempfile
-from collections.abc import Container, Iterable, Iterator, Mapping, Sequence
-from contextlib import suppress
+import time
+from collections.abc import Container, Iterable, Iterator, Mapping, MutableMapping, Sequence
+from contextlib import contextmanager, suppress
 from pathlib import Path
 from typing import Final, NamedTuple
 
@@ -44,21 +47,39 @@ PiggybackTimeSettings = Sequence[_PiggybackTimeSetting]
 _PiggybackTimeSettingsMap = Mapping[tuple[str | None, str], int]
 
 # ***** Terminology *****
-# "piggybacked_host_folder":
-# - tmp/check_mk/piggyback/HOST
+# "source_folder":
+# - tmp/check_mk/piggyback/SOURCE
 #
-# "piggybacked_hostname":
-# - Path(tmp/check_mk/piggyback/HOST).name
-#
-# "piggybacked_host_source":
-# - tmp/check_mk/piggyback/HOST/SOURCE
+# "container":
+# - tmp/check_mk/piggyback/SOURCE/CONTAINER
+#   The data of all piggybacked hosts the source has sent at once.  A
+#   container is written once and never modified.
 #
 # "source_state_file":
 # - tmp/check_mk/piggyback_sources/SOURCE
 #
+# "source_index_file":
+# - tmp/check_mk/piggyback_index/SOURCE
+#   The piggybacked hosts of the source, the mtimes of their data and where
+#   to find it in the containers.  The lookups use it instead of listing the
+#   folders and stat()ing the files.
+#
+# "piggybacked_hostname":
+# - The keys of the source_index_file
+#
 # "source_hostname":
-# - Path(tmp/check_mk/piggyback/HOST/SOURCE).name
+# - Path(tmp/check_mk/piggyback/SOURCE).name
 # - Path(tmp/check_mk/piggyback_sources/SOURCE).name
+# - Path(tmp/check_mk/piggyback_index/SOURCE).name
+
+
+class _IndexEntry(NamedTuple):
+    """Where to find the data of a piggybacked host"""
+
+    mtime: float
+    container: str
+    offset: int
+    length: int
 
 
 def get_piggyback_raw_data(
@@ -74,7 +95,10 @@ def get_piggyback_raw_data(
     if not piggybacked_hostname:
         return []
 
-    piggyback_file_infos = _get_piggyback_processed_file_infos(piggybacked_hostname, time_settings)
+    sources = _get_sources_of(piggybacked_hostname)
+    piggyback_file_infos = _get_piggyback_processed_file_infos(
+        piggybacked_hostname, time_settings, sources
+    )
     if not piggyback_file_infos:
         logger.log(
             VERBOSE,
@@ -89,7 +113,7 @@ def get_piggyback_raw_data(
             # Raw data is always stored as bytes. Later the content is
             # converted to unicode in abstact.py:_parse_info which respects
             # 'encoding' in section options.
-            raw_data = AgentRawData(store.load_bytes_from_file(file_info.file_path))
+            raw_data = _read_piggyback_data(file_info.file_path, sources[file_info.source_hostname])
 
         except OSError as e:
             reason = "Cannot read piggyback raw data from source '%s'" % file_info.source_hostname
@@ -139,15 +163,15 @@ def get_source_and_piggyback_hosts(
 ) -> Iterator[tuple[HostName, HostName]]:
     """Generates all piggyback pig/piggybacked host pairs that have up-to-date data"""
 
-    # Pylint bug (https://github.com/PyCQA/pylint/issues/1660). Fixed with pylint 2.x
-    for piggybacked_host_folder in _get_piggybacked_host_folders():
+    for piggybacked_hostname, sources in _get_piggybacked_hosts_sources().items():
         for file_info in _get_piggyback_processed_file_infos(
-            HostName(piggybacked_host_folder.name),
+            piggybacked_hostname,
             time_settings,
+            sources,
         ):
             if not file_info.successfully_processed:
                 continue
-            yield HostName(file_info.source_hostname), HostName(piggybacked_host_folder.name)
+            yield HostName(file_info.source_hostname), piggybacked_hostname
 
 
 def has_piggyback_raw_data(
@@ -221,6 +245,7 @@ class _TimeSettingsMap:
 def _get_piggyback_processed_file_infos(
     piggybacked_hostname: HostName,
     time_settings: PiggybackTimeSettings,
+    sources: Mapping[HostName, _IndexEntry] | None = None,
 ) -> Sequence[PiggybackFileInfo]:
     """Gather a list of piggyback files to read for further processing.
 
@@ -229,17 +254,17 @@ def _get_piggyback_processed_file_infos(
     functions. Therefor all these functions needs to deal with suddenly vanishing or
     updated files/directories.
     """
-    source_hostnames = get_source_hostnames(piggybacked_hostname)
-    expanded_time_settings = _TimeSettingsMap(source_hostnames, piggybacked_hostname, time_settings)
+    source_entries = _get_sources_of(piggybacked_hostname) if sources is None else sources
+    expanded_time_settings = _TimeSettingsMap(source_entries, piggybacked_hostname, time_settings)
     return [
         _get_piggyback_processed_file_info(
             source_hostname,
             piggybacked_hostname,
-            _get_piggybacked_file_path(source_hostname, piggybacked_hostname),
+            _get_container_path(source_hostname, entry.container),
+            entry.mtime,
             expanded_time_settings,
         )
-        for source_hostname in source_hostnames
-        if not source_hostname.startswith(".")
+        for source_hostname, entry in source_entries.items()
     ]
 
 
@@ -247,15 +272,10 @@ def _get_piggyback_processed_file_info(
     source_hostname: HostName,
     piggybacked_hostname: HostName,
     piggyback_file_path: Path,
+    piggyback_file_mtime: float,
     settings: _TimeSettingsMap,
 ) -> PiggybackFileInfo:
-
-    try:
-        file_age = cmk.utils.cachefile_age(piggyback_file_path)
-    except FileNotFoundError:
-        return PiggybackFileInfo(
-            source_hostname, piggyback_file_path, False, "Piggyback file is missing", 0
-        )
+    file_age = time.time() - piggyback_file_mtime
 
     if (outdated := file_age - settings.max_cache_age(source_hostname, piggybacked_hostname)) > 0:
         return PiggybackFileInfo(
@@ -269,8 +289,8 @@ def _get_piggyback_processed_file_info(
     validity_period = settings.validity_period(source_hostname, piggybacked_hostname)
     validity_state = settings.validity_state(source_hostname, piggybacked_hostname)
 
-    status_file_path = _get_source_status_file_path(source_hostname)
-    if not status_file_path.exists():
+    status_file_mtime = _get_source_status_file_mtime(source_hostname)
+    if status_file_mtime is None:
         valid_msg = _validity_period_message(file_age, validity_period)
         return PiggybackFileInfo(
             source_hostname,
@@ -280,7 +300,7 @@ def _get_piggyback_processed_file_info(
             validity_state if valid_msg else 0,
         )
 
-    if _is_piggyback_file_outdated(status_file_path, piggyback_file_path):
+    if status_file_mtime > piggyback_file_mtime:
         valid_msg = _validity_period_message(file_age, validity_period)
         return PiggybackFileInfo(
             source_hostname,
@@ -308,18 +328,13 @@ def _validity_period_message(
     return f" (still valid, {Age(time_left)} left)"
 
 
-def _is_piggyback_file_outdated(
-    status_file_path: Path,
-    piggyback_file_path: Path,
-) -> bool:
+def _get_source_status_file_mtime(source_hostname: HostName) -> float | None:
     try:
-        # TODO use Path.stat() but be aware of:
-        # On POSIX platforms Python reads atime and mtime at nanosecond resolution
-        # but only writes them at microsecond resolution.
-        # (We're using os.utime() in _store_status_file_of())
-        return os.stat(str(status_file_path))[8] > os.stat(str(piggyback_file_path))[8]
+        # Compared to the mtimes in the index, which are read back from the status file
+        # in _store_status_file_of(): both have the same resolution.
+        return os.stat(str(_get_source_status_file_path(source_hostname))).st_mtime
     except FileNotFoundError:
-        return True
+        return None
 
 
 def _remove_piggyback_file(piggyback_file_path: Path) -> bool:
@@ -337,13 +352,57 @@ def remove_source_status_file(source_hostname: HostName) -> bool:
     return _remove_piggyback_file(source_status_path)
 
 
+def remove_piggybacked_host_data(piggybacked_hostname: HostName) -> None:
+    """Remove the data of this piggybacked host sent by any source"""
+    for source_hostname in _get_sources_of(piggybacked_hostname):
+        with _locked_source_index(source_hostname) as index:
+            index.pop(piggybacked_hostname, None)
+        _cleanup_unused_containers(source_hostname)
+
+
+def rename_piggybacked_host(old_hostname: HostName, new_hostname: HostName) -> bool:
+    """Move the data sent for the piggybacked host to its new name"""
+    sources = _get_sources_of(old_hostname)
+    for source_hostname in sources:
+        with _locked_source_index(source_hostname) as index:
+            if (entry := index.pop(old_hostname, None)) is not None:
+                index[new_hostname] = entry
+    return bool(sources)
+
+
+def rename_source_host(old_hostname: HostName, new_hostname: HostName) -> bool:
+    """Move the data sent by the source to its new name, replacing the data of that name"""
+    with store.locked(_get_source_index_lock_path(old_hostname)), store.locked(
+        _get_source_index_lock_path(new_hostname)
+    ):
+        old_index_file = _get_source_index_file_path(old_hostname)
+        if not old_index_file.exists():
+            return False
+
+        new_source_folder = _get_source_folder_path(new_hostname)
+        shutil.rmtree(new_source_folder, ignore_errors=True)
+        with suppress(FileNotFoundError):
+            _get_source_folder_path(old_hostname).rename(new_source_folder)
+        old_index_file.rename(_get_source_index_file_path(new_hostname))
+    return True
+
+
 def store_piggyback_raw_data(
     source_hostname: HostName,
     piggybacked_raw_data: Mapping[HostName, Sequence[bytes]],
 ) -> None:
-    piggyback_file_paths = []
+    # Store the last contact with this piggyback source to be able to filter outdated data later
+    # We use the mtime of this file later for comparison.
+    # Only do this for hosts that sent piggyback data this turn, cleanup the status file when no
+    # piggyback data was sent this turn.
+    if not piggybacked_raw_data:
+        logger.debug("Received no piggyback data")
+        remove_source_status_file(source_hostname)
+        return
+
+    logger.log(VERBOSE, "Received piggyback data for %d hosts", len(piggybacked_raw_data))
+    payloads = {}
     for piggybacked_hostname, lines in piggybacked_raw_data.items():
-        piggyback_file_path = _get_piggybacked_file_path(source_hostname, piggybacked_hostname)
         logger.log(
             VERBOSE,
             "Storing piggyback data for: %s",
@@ -352,36 +411,25 @@ def store_piggyback_raw_data(
         # Raw data is always stored as bytes. Later the content is
         # converted to unicode in abstact.py:_parse_info which respects
         # 'encoding' in section options.
-        store.save_bytes_to_file(piggyback_file_path, b"%s\n" % b"\n".join(lines))
-        piggyback_file_paths.append(piggyback_file_path)
+        payloads[piggybacked_hostname] = b"%s\n" % b"\n".join(lines)
 
-    # Store the last contact with this piggyback source to be able to filter outdated data later
-    # We use the mtime of this file later for comparison.
-    # Only do this for hosts that sent piggyback data this turn, cleanup the status file when no
-    # piggyback data was sent this turn.
-    if piggybacked_raw_data:
-        logger.log(VERBOSE, "Received piggyback data for %d hosts", len(piggybacked_raw_data))
-
-        status_file_path = _get_source_status_file_path(source_hostname)
-        _store_status_file_of(status_file_path, piggyback_file_paths)
-    else:
-        logger.debug("Received no piggyback data")
-        remove_source_status_file(source_hostname)
+    _store_status_file_of(source_hostname, payloads)
 
 
 def _store_status_file_of(
-    status_file_path: Path,
-    piggyback_file_paths: Iterable[Path],
+    source_hostname: HostName,
+    payloads: Mapping[HostName, bytes],
 ) -> None:
+    status_file_path = _get_source_status_file_path(source_hostname)
     store.makedirs(status_file_path.parent)
 
     # Cannot use store.save_bytes_to_file like:
     # 1. store.save_bytes_to_file(status_file_path, b"")
-    # 2. set utime of piggybacked host files
+    # 2. update the index
     # Between 1. and 2.:
-    # - the piggybacked host may check its files
-    # - status file is newer (before utime of piggybacked host files is set)
-    # => piggybacked host file is outdated
+    # - the piggybacked host may check its data
+    # - status file is newer (before the index is updated)
+    # => piggybacked host data is outdated
     with tempfile.NamedTemporaryFile(
         "wb",
         dir=str(status_file_path.parent),
@@ -392,20 +440,55 @@ def _store_status_file_of(
         os.chmod(tmp_path, 0o660)
         tmp.write(b"")
 
-        tmp_stats = os.stat(tmp_path)
-        status_file_times = (tmp_stats.st_atime, tmp_stats.st_mtime)
-        for piggyback_file_path in piggyback_file_paths:
-            try:
-                # TODO use Path.stat() but be aware of:
-                # On POSIX platforms Python reads atime and mtime at nanosecond resolution
-                # but only writes them at microsecond resolution.
-                # (We're using os.utime() in _store_status_file_of())
-                os.utime(str(piggyback_file_path), status_file_times)
-            except FileNotFoundError:
-                continue
+        # Read the time back, see _get_source_status_file_mtime().
+        os.utime(tmp_path, (now := time.time(), now))
+        status_file_mtime = os.stat(tmp_path).st_mtime
+
+        # The clean up removes the containers not in the index, hold the lock while writing.
+        with store.locked(_get_source_index_lock_path(source_hostname)):
+            with _updated_source_index(source_hostname) as index:
+                previous = {entry.container for entry in index.values()}
+                container = _write_container(source_hostname, payloads.values())
+                offset = 0
+                for piggybacked_hostname, payload in payloads.items():
+                    index[piggybacked_hostname] = _IndexEntry(
+                        status_file_mtime, container, offset, len(payload)
+                    )
+                    offset += len(payload)
+
+            # Remove the replaced containers right away, otherwise they pile up until the next
+            # clean up. Readers may still use the previous index, so keep its containers.
+            _remove_unused_containers(
+                source_hostname, previous | {entry.container for entry in index.values()}
+            )
     os.rename(tmp_path, str(status_file_path))
 
 
+def _write_container(source_hostname: HostName, payloads: Iterable[bytes]) -> str:
+    """Write the data of all piggybacked hosts to a new container, return its name
+
+    This is a single write and fsync() regardless of the number of piggybacked hosts.
+    The container is only visible to the readers once it is in the index, so it can
+    be written in place.
+    """
+    source_folder = _get_source_folder_path(source_hostname)
+    store.makedirs(source_folder)
+    with tempfile.NamedTemporaryFile("wb", dir=str(source_folder), delete=False) as container:
+        os.chmod(container.name, 0o660)
+        container.writelines(payloads)
+        container.flush()
+        os.fsync(container.fileno())
+    return Path(container.name).name
+
+
+def _read_piggyback_data(container_path: Path, entry: _IndexEntry) -> AgentRawData:
+    with container_path.open("rb") as container:
+        raw_data = os.pread(container.fileno(), entry.length, entry.offset)
+    if len(raw_data) != entry.length:
+        raise OSError(f"Truncated piggyback file {container_path}")
+    return AgentRawData(raw_data)
+
+
 #   .--folders/files-------------------------------------------------------.
 #   |         __       _     _                  ____ _ _                   |
 #   |        / _| ___ | | __| | ___ _ __ ___   / / _(_) | ___  ___         |
@@ -419,17 +502,30 @@ def _store_status_file_of(
 def get_source_hostnames(piggybacked_hostname: HostName | None = None) -> Sequence[HostName]:
     if piggybacked_hostname is None:
         return [
-            HostName(source_host.name)
-            for piggybacked_host_folder in _get_piggybacked_host_folders()
-            for source_host in _files_in(piggybacked_host_folder)
+            source_hostname
+            for source_hostname, index in _load_source_indexes().items()
+            for _piggybacked_hostname in index
         ]
 
-    piggybacked_host_folder = cmk.utils.paths.piggyback_dir / Path(piggybacked_hostname)
-    return [HostName(source_host.name) for source_host in _files_in(piggybacked_host_folder)]
+    return list(_get_sources_of(piggybacked_hostname))
+
 
+def _get_sources_of(piggybacked_hostname: HostName) -> Mapping[HostName, _IndexEntry]:
+    """The sources of the piggybacked host, with the index entries of its data"""
+    return {
+        source_hostname: entry
+        for source_hostname, index in _load_source_indexes().items()
+        if (entry := index.get(piggybacked_hostname)) is not None
+    }
 
-def _get_piggybacked_host_folders() -> Sequence[Path]:
-    return _files_in(cmk.utils.paths.piggyback_dir)
+
+def _get_piggybacked_hosts_sources() -> Mapping[HostName, Mapping[HostName, _IndexEntry]]:
+    """The sources of every piggybacked host, with the index entries of its data"""
+    piggybacked_hosts_sources: dict[HostName, dict[HostName, _IndexEntry]] = {}
+    for source_hostname, index in _load_source_indexes().items():
+        for piggybacked_hostname, entry in index.items():
+            piggybacked_hosts_sources.setdefault(piggybacked_hostname, {})[source_hostname] = entry
+    return piggybacked_hosts_sources
 
 
 def _get_source_state_files() -> Sequence[Path]:
@@ -447,11 +543,107 @@ def _get_source_status_file_path(source_hostname: HostName) -> Path:
     return cmk.utils.paths.piggyback_source_dir / str(source_hostname)
 
 
-def _get_piggybacked_file_path(
+def _get_source_folder_path(source_hostname: HostName) -> Path:
+    return cmk.utils.paths.piggyback_dir / str(source_hostname)
+
+
+def _get_container_path(source_hostname: HostName, container: str) -> Path:
+    return _get_source_folder_path(source_hostname) / container
+
+
+def _get_source_index_file_path(source_hostname: HostName) -> Path:
+    return cmk.utils.paths.piggyback_index_dir / str(source_hostname)
+
+
+def _get_source_index_lock_path(source_hostname: HostName) -> Path:
+    # The index file is replaced on every update, its lock would be lost.
+    return cmk.utils.paths.piggyback_index_dir / f".{source_hostname}.lock"
+
+
+# .
+#   .--index---------------------------------------------------------------.
+#   |                      _           _                                   |
+#   |                     (_)_ __   __| | _____  __                        |
+#   |                     | | '_ \ / _` |/ _ \ \/ /                        |
+#   |                     | | | | | (_| |  __/>  <                         |
+#   |                     |_|_| |_|\__,_|\___/_/\_\                        |
+#   |                                                                      |
+#   '----------------------------------------------------------------------'
+
+_INDEX_MAGIC: Final = b"CMKPIG02"
+
+# The indexes read by this process: path -> (identity of the file, index)
+_index_cache: dict[Path, tuple[tuple[int, int, int], Mapping[HostName, _IndexEntry]]] = {}
+
+
+def _load_source_indexes() -> Mapping[HostName, Mapping[HostName, _IndexEntry]]:
+    """The indexes of all sources, read only if they have changed since the last call"""
+    source_index_files = _files_in(cmk.utils.paths.piggyback_index_dir)
+    for cached_path in set(_index_cache) - set(source_index_files):
+        del _index_cache[cached_path]
+    return {
+        HostName(source_index_file.name): _load_source_index(source_index_file)
+        for source_index_file in source_index_files
+    }
+
+
+def _load_source_index(source_index_file: Path) -> Mapping[HostName, _IndexEntry]:
+    try:
+        stat = source_index_file.stat()
+    except FileNotFoundError:
+        _index_cache.pop(source_index_file, None)
+        return {}
+
+    identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if (cached := _index_cache.get(source_index_file)) is not None and cached[0] == identity:
+        return cached[1]
+
+    index = _read_source_index(source_index_file)
+    _index_cache[source_index_file] = (identity, index)
+    return index
+
+
+def _read_source_index(source_index_file: Path) -> dict[HostName, _IndexEntry]:
+    raw = store.load_bytes_from_file(source_index_file)
+    if not raw.startswith(_INDEX_MAGIC):
+        if raw:
+            logger.warning("Ignoring invalid piggyback index file %s", source_index_file)
+        return {}
+    return {
+        HostName(piggybacked_hostname): _IndexEntry(*entry)
+        for piggybacked_hostname, entry in marshal.loads(raw[len(_INDEX_MAGIC) :]).items()
+    }
+
+
+@contextmanager
+def _locked_source_index(
     source_hostname: HostName,
-    piggybacked_hostname: HostName,
-) -> Path:
-    return cmk.utils.paths.piggyback_dir / piggybacked_hostname / source_hostname
+) -> Iterator[MutableMapping[HostName, _IndexEntry]]:
+    """Read, modify and write the index of a source"""
+    with store.locked(_get_source_index_lock_path(source_hostname)):
+        with _updated_source_index(source_hostname) as index:
+            yield index
+
+
+@contextmanager
+def _updated_source_index(
+    source_hostname: HostName,
+) -> Iterator[MutableMapping[HostName, _IndexEntry]]:
+    """Read, modify and write the index of a source, the caller holds the lock"""
+    source_index_file = _get_source_index_file_path(source_hostname)
+    index = _read_source_index(source_index_file)
+    original = dict(index)
+    yield index
+    if index == original:
+        return
+    if not index:
+        with suppress(FileNotFoundError):
+            source_index_file.unlink()
+        return
+    store.save_bytes_to_file(
+        source_index_file,
+        _INDEX_MAGIC + marshal.dumps({str(k): tuple(v) for k, v in index.items()}),
+    )
 
 
 # .
@@ -487,42 +679,38 @@ def cleanup_piggyback_files(time_settings: PiggybackTimeSettings) -> None:
 
 def _get_piggybacked_hosts_settings(
     time_settings: PiggybackTimeSettings,
-) -> Sequence[tuple[Path, Sequence[Path], _TimeSettingsMap]]:
-    piggybacked_hosts_settings = []
-    for piggybacked_host_folder in _get_piggybacked_host_folders():
-        source_hosts = _files_in(piggybacked_host_folder)
-        time_settings_map = _TimeSettingsMap(
-            [HostName(source_host.name) for source_host in source_hosts],
-            HostName(piggybacked_host_folder.name),
-            time_settings,
-        )
-        piggybacked_hosts_settings.append(
-            (piggybacked_host_folder, source_hosts, time_settings_map)
+) -> Sequence[tuple[HostName, Mapping[HostName, _IndexEntry], _TimeSettingsMap]]:
+    return [
+        (
+            piggybacked_hostname,
+            sources,
+            _TimeSettingsMap(sources, piggybacked_hostname, time_settings),
         )
-    return piggybacked_hosts_settings
+        for piggybacked_hostname, sources in _get_piggybacked_hosts_sources().items()
+    ]
 
 
 def _cleanup_old_source_status_files(
-    piggybacked_hosts_settings: Iterable[tuple[Path, Iterable[Path], _TimeSettingsMap]]
+    piggybacked_hosts_settings: Iterable[tuple[HostName, Iterable[HostName], _TimeSettingsMap]]
 ) -> None:
     """Remove source status files which exceed configured maximum cache age.
     There may be several 'Piggybacked Host Files' rules where the max age is configured.
     We simply use the greatest one per source."""
 
     max_cache_age_by_sources: dict[str, int] = {}
-    for piggybacked_host_folder, source_hosts, time_settings in piggybacked_hosts_settings:
-        for source_host in source_hosts:
+    for piggybacked_hostname, source_hostnames, time_settings in piggybacked_hosts_settings:
+        for source_hostname in source_hostnames:
             max_cache_age = time_settings.max_cache_age(
-                HostName(source_host.name),
-                HostName(piggybacked_host_folder.name),
+                source_hostname,
+                piggybacked_hostname,
             )
 
-            max_cache_age_of_source = max_cache_age_by_sources.get(source_host.name)
+            max_cache_age_of_source = max_cache_age_by_sources.get(source_hostname)
             if max_cache_age_of_source is None:
-                max_cache_age_by_sources[source_host.name] = max_cache_age
+                max_cache_age_by_sources[source_hostname] = max_cache_age
 
             elif max_cache_age >= max_cache_age_of_source:
-                max_cache_age_by_sources[source_host.name] = max_cache_age
+                max_cache_age_by_sources[source_hostname] = max_cache_age
 
     for source_state_file in _get_source_state_files():
         try:
@@ -551,38 +739,67 @@ def _cleanup_old_source_status_files(
 
 
 def _cleanup_old_piggybacked_files(
-    piggybacked_hosts_settings: Iterable[tuple[Path, Iterable[Path], _TimeSettingsMap]]
+    piggybacked_hosts_settings: Iterable[
+        tuple[HostName, Mapping[HostName, _IndexEntry], _TimeSettingsMap]
+    ]
 ) -> None:
-    """Remove piggybacked data files which exceed configured maximum cache age."""
+    """Remove piggybacked data which exceeds configured maximum cache age."""
 
-    for piggybacked_host_folder, source_hosts, time_settings in piggybacked_hosts_settings:
-        for piggybacked_host_source in source_hosts:
+    removed_by_sources: dict[HostName, dict[HostName, _IndexEntry]] = {}
+    for piggybacked_hostname, sources, time_settings in piggybacked_hosts_settings:
+        for source_hostname, entry in sources.items():
             file_info = _get_piggyback_processed_file_info(
-                HostName(piggybacked_host_source.name),
-                HostName(piggybacked_host_folder.name),
-                piggybacked_host_source,
+                source_hostname,
+                piggybacked_hostname,
+                _get_container_path(source_hostname, entry.container),
+                entry.mtime,
                 time_settings,
             )
 
             if not file_info.successfully_processed:
                 logger.log(
                     VERBOSE,
-                    "Piggyback file '%s' is outdated (%s). Remove it.",
-                    piggybacked_host_source,
+                    "Piggyback data for '%s' in '%s' is outdated (%s). Remove it.",
+                    piggybacked_hostname,
+                    file_info.file_path,
                     file_info.message,
                 )
-                _remove_piggyback_file(piggybacked_host_source)
+                removed_by_sources.setdefault(source_hostname, {})[piggybacked_hostname] = entry
+
+    for source_hostname, removed in removed_by_sources.items():
+        with _locked_source_index(source_hostname) as index:
+            for piggybacked_hostname, entry in removed.items():
+                # Unless the source has stored new data in the meantime.
+                if index.get(piggybacked_hostname) == entry:
+                    del index[piggybacked_hostname]
 
-        # Remove empty backed host directory
+    for source_folder in _files_in(cmk.utils.paths.piggyback_dir):
+        _cleanup_unused_containers(HostName(source_folder.name))
+
+
+def _remove_unused_containers(source_hostname: HostName, used: Container[str]) -> None:
+    """Remove the containers of a source not in used, the caller holds the index lock"""
+    for container_path in _files_in(_get_source_folder_path(source_hostname)):
+        if container_path.name not in used:
+            logger.log(
+                VERBOSE, "Piggyback file '%s' is not used anymore. Remove it.", container_path
+            )
+            _remove_piggyback_file(container_path)
+
+
+def _cleanup_unused_containers(source_hostname: HostName) -> None:
+    """Remove the containers without data in the index, and the empty source folder"""
+    source_folder = _get_source_folder_path(source_hostname)
+    with _locked_source_index(source_hostname) as index:
+        used = {entry.container for entry in index.values()}
+        _remove_unused_containers(source_hostname, used)
+
+        if used:
+            return
         try:
-            piggybacked_host_folder.rmdir()
+            source_folder.rmdir()
         except OSError as e:
-            if e.errno == errno.ENOTEMPTY:
-                continue
+            if e.errno in (errno.ENOTEMPTY, errno.ENOENT):
+                return
             raise
-        else:
-            logger.log(
-                VERBOSE,
-                "Piggyback folder '%s' is empty. Removed it.",
-                piggybacked_host_folder,
-            )
+        logger.log(VERBOSE, "Piggyback folder '%s' is empty. Removed it.", source_folder)
@@ -4,10 +4,13 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """This module provides generic Check_MK ruleset processing functionality"""
 
-from collections.abc import Generator, Iterable
+import time
+from collections.abc import Generator, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
 from re import Pattern
 from typing import Any, cast, TypeVar
 
+from cmk.utils.caching import LRUCache
 from cmk.utils.exceptions import MKGeneralException
 from cmk.utils.labels import BuiltinHostLabelsStore, DiscoveredHostLabelsStore, LabelManager
 from cmk.utils.parameters import boil_down_parameters
@@ -45,9 +48,8 @@ T = TypeVar("T")
 
 LabelConditions = dict  # TODO: Optimize this
 PreprocessedHostRuleset = dict[HostName, list[T]]
-PreprocessedPattern = tuple[bool, Pattern[str]]
-PreprocessedServiceRuleset = list[
-    tuple[object, set[HostName], LabelConditions, tuple, PreprocessedPattern]
+PreprocessedServiceRuleset = tuple[
+    "ServiceDescriptionMatcher", list[tuple[object, bytes, LabelConditions, bool, int]]
 ]
 
 
@@ -113,6 +115,7 @@ class RulesetMatcher:
         all_configured_hosts: set[HostName],
         clusters_of: dict[HostName, list[HostName]],
         nodes_of: dict[HostName, list[HostName]],
+        cache_size: int | None = None,
     ) -> None:
         super().__init__()
 
@@ -126,13 +129,16 @@ class RulesetMatcher:
             all_configured_hosts,
             clusters_of,
             nodes_of,
+            cache_size,
         )
         self.labels_of_host = self.ruleset_optimizer.labels_of_host
         self.labels_of_service = self.ruleset_optimizer.labels_of_service
         self.label_sources_of_host = self.ruleset_optimizer.label_sources_of_host
         self.label_sources_of_service = self.ruleset_optimizer.label_sources_of_service
 
-        self._service_match_cache: dict = {}
+        self._service_match_cache: LRUCache[
+            tuple[ServiceDescriptionMatcher, ServiceName], int
+        ] = LRUCache("ruleset_matcher_service_match", cache_size)
 
     def is_matching_host_ruleset(
         self, match_object: RulesetMatchObject, ruleset: Ruleset[bool]
@@ -169,6 +175,14 @@ class RulesetMatcher:
     ) -> Generator:
         """Returns a generator of the values of the matched rules
         Replaces host_extra_conf"""
+        values: Generator[T, None, None] = self._get_host_ruleset_values(
+            match_object, ruleset, is_binary
+        )
+        return values if _profiler is None else _profiler.profile(ruleset, values)
+
+    def _get_host_ruleset_values(
+        self, match_object: RulesetMatchObject, ruleset: Ruleset[T], is_binary: bool
+    ) -> Generator[T, None, None]:
         self.tuple_transformer.transform_in_place(ruleset, is_service=False, is_binary=is_binary)
 
         # When the requested host is part of the local sites configuration,
@@ -177,7 +191,7 @@ class RulesetMatcher:
             match_object.host_name not in self.ruleset_optimizer.all_processed_hosts()
         )
 
-        optimized_ruleset = self.ruleset_optimizer.get_host_ruleset(
+        optimized_ruleset: PreprocessedHostRuleset[T] = self.ruleset_optimizer.get_host_ruleset(
             ruleset, with_foreign_hosts, is_binary=is_binary
         )
 
@@ -218,6 +232,14 @@ class RulesetMatcher:
     ) -> Generator:
         """Returns a generator of the values of the matched rules
         Replaces service_extra_conf"""
+        values: Generator[object, None, None] = self._get_service_ruleset_values(
+            match_object, ruleset, is_binary
+        )
+        return values if _profiler is None else _profiler.profile(ruleset, values)
+
+    def _get_service_ruleset_values(
+        self, match_object: RulesetMatchObject, ruleset: Ruleset[T], is_binary: bool
+    ) -> Generator[object, None, None]:
         self.tuple_transformer.transform_in_place(ruleset, is_service=True, is_binary=is_binary)
 
         with_foreign_hosts = (
@@ -227,67 +249,43 @@ class RulesetMatcher:
             ruleset, with_foreign_hosts, is_binary=is_binary
         )
 
-        for (
-            value,
-            hosts,
-            service_labels_condition,
-            service_labels_condition_cache_id,
-            service_description_condition,
-        ) in optimized_ruleset:
-            if match_object.service_description is None:
-                continue
-
-            if match_object.host_name not in hosts:
-                continue
+        host_bit = self.ruleset_optimizer.host_bit(match_object.host_name)
+        if host_bit is None or match_object.service_description is None:
+            return
 
-            service_cache_id = (
-                match_object.service_cache_id,
-                service_description_condition,
-                service_labels_condition_cache_id,
-            )
+        service_description_matcher, rules = optimized_ruleset
 
-            if service_cache_id in self._service_match_cache:
-                match = self._service_match_cache[service_cache_id]
-            else:
-                match = self._matches_service_conditions(
-                    service_description_condition, service_labels_condition, match_object
+        # The service description is matched against the patterns of all rules at once
+        service_cache_id = service_description_matcher, match_object.service_description
+        try:
+            matching_patterns = self._service_match_cache[service_cache_id]
+        except KeyError:
+            matching_patterns = self._service_match_cache[
+                service_cache_id
+            ] = service_description_matcher.match(match_object.service_description)
+            if _profiler is not None:
+                _profiler.statistics_of(
+                    ruleset
+                ).regex_matches += service_description_matcher.num_regex_matches(
+                    match_object.service_description
                 )
-                self._service_match_cache[service_cache_id] = match
 
-            if match:
-                yield value
+        if _profiler is not None:
+            _profiler.statistics_of(ruleset).rules_tested += len(rules)
 
-    def _matches_service_conditions(
-        self,
-        service_description_condition: tuple[bool, Pattern[str]],
-        service_labels_condition: dict[str, str],
-        match_object: RulesetMatchObject,
-    ) -> bool:
-        if not self._matches_service_description_condition(
-            service_description_condition, match_object
-        ):
-            return False
-
-        if service_labels_condition and not matches_labels(
-            match_object.service_labels, service_labels_condition
-        ):
-            return False
+        for value, hosts, service_labels_condition, negate, patterns in rules:
+            if not hosts[host_bit >> 3] & (1 << (host_bit & 7)):
+                continue
 
-        return True
+            if bool(matching_patterns & patterns) is negate:
+                continue
 
-    def _matches_service_description_condition(
-        self,
-        service_description_condition: tuple[bool, Pattern[str]],
-        match_object: RulesetMatchObject,
-    ) -> bool:
-        negate, pattern = service_description_condition
+            if service_labels_condition and not matches_labels(
+                match_object.service_labels, service_labels_condition
+            ):
+                continue
 
-        if (
-            match_object.service_description is not None
-            and pattern.match(match_object.service_description) is not None
-        ):
-            return not negate
-        return negate
+            yield value
 
     def get_values_for_generic_agent(
         self, ruleset: Ruleset[object], path_for_rule_matching: str
@@ -325,6 +323,93 @@ class RulesetMatcher:
         return entries
 
 
+class ServiceDescriptionMatcher:
+    """Matches a service description against all service patterns of a ruleset at once
+
+    The patterns are grouped by their literal prefix (the part of the regex before the first
+    special character). Only the regexes whose literal prefix is a prefix of the service
+    description have to be executed, and patterns without any special characters need no regex
+    match at all. For the usual rulesets this reduces the regex matches per service description
+    from one per rule to very few.
+    """
+
+    __slots__ = ["_prefix_lengths", "_by_prefix"]
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        by_prefix: dict[str, tuple[int, list[tuple[Pattern[str], int]]]] = {}
+        for index, pattern in enumerate(patterns):
+            prefix, is_literal = _literal_prefix(pattern)
+            literal_mask, regexes = by_prefix.get(prefix, (0, []))
+            if is_literal:
+                literal_mask |= 1 << index
+            else:
+                regexes.append((regex(pattern), 1 << index))
+            by_prefix[prefix] = literal_mask, regexes
+
+        self._prefix_lengths = sorted({len(prefix) for prefix in by_prefix})
+        self._by_prefix = {
+            prefix: (literal_mask, tuple(regexes))
+            for prefix, (literal_mask, regexes) in by_prefix.items()
+        }
+
+    def match(self, service_description: str) -> int:
+        """Returns the bitmask of the patterns matching the service description"""
+        matching = 0
+        for length in self._prefix_lengths:
+            if length > len(service_description):
+                break
+
+            try:
+                literal_mask, regexes = self._by_prefix[service_description[:length]]
+            except KeyError:
+                continue
+
+            matching |= literal_mask
+            for compiled, mask in regexes:
+                if compiled.match(service_description) is not None:
+                    matching |= mask
+
+        return matching
+
+    def num_regex_matches(self, service_description: str) -> int:
+        """Returns the number of regexes executed by match()"""
+        return sum(
+            len(self._by_prefix.get(service_description[:length], (0, ()))[1])
+            for length in self._prefix_lengths
+            if length <= len(service_description)
+        )
+
+
+# Characters of a regex that end its literal prefix
+_REGEX_SPECIAL_CHARS = frozenset(".^$*+?{}[]\\|()")
+
+
+def _literal_prefix(pattern: str) -> tuple[str, bool]:
+    """Returns the literal prefix of a regex and whether the whole regex is literal
+
+    The regexes are matched at the start of the service description, so a literal regex
+    matches exactly the service descriptions starting with it.
+
+    >>> _literal_prefix("CPU load")
+    ('CPU load', True)
+    >>> _literal_prefix("Interface 1$")
+    ('Interface 1', False)
+    >>> _literal_prefix("Filesystems?")
+    ('Filesystem', False)
+    >>> _literal_prefix("Disk|Memory")
+    ('', False)
+    """
+    if "|" in pattern:
+        return "", False
+
+    for index, char in enumerate(pattern):
+        if char in _REGEX_SPECIAL_CHARS:
+            # The preceding character may be optional
+            return pattern[: max(index - 1, 0) if char in "*?{" else index], False
+
+    return pattern, True
+
+
 class RulesetOptimizer:
     """Performs some precalculations on the configured rulesets to improve the
     processing performance"""
@@ -338,6 +423,7 @@ class RulesetOptimizer:
         all_configured_hosts: set[HostName],
         clusters_of: dict[HostName, list[HostName]],
         nodes_of: dict[HostName, list[HostName]],
+        cache_size: int | None = None,
     ) -> None:
         super().__init__()
         self._ruleset_matcher = ruleset_matcher
@@ -355,22 +441,29 @@ class RulesetOptimizer:
         # may contain a reduced set of hosts, since each process handles a subset
         self._all_processed_hosts = self._all_configured_hosts
 
-        # A factor which indicates how much hosts share the same host tag configuration (excluding folders).
-        # len(all_processed_hosts) / len(different tag combinations)
-        # It is used to determine the best rule evualation method
-        self._all_processed_hosts_similarity = 1.0
-
         self._service_ruleset_cache: dict = {}
         self._host_ruleset_cache: dict = {}
-        self._all_matching_hosts_match_cache: dict = {}
-
-        # Reference dirname -> hosts in this dir including subfolders
-        self._folder_host_lookup: dict[tuple[bool, str], set[HostName]] = {}
+        self._all_matching_hosts_match_cache: LRUCache[tuple, int] = LRUCache(
+            "ruleset_optimizer_all_matching_hosts", cache_size
+        )
 
-        # Provides a list of hosts with the same hosttags, excluding the folder
-        self._hosts_grouped_by_tags: dict[tuple[tuple[TaggroupID, TagID], ...], set[HostName]] = {}
-        # Reference hostname -> tag group reference
-        self._host_grouped_ref: dict[HostName, tuple[tuple[TaggroupID, TagID], ...]] = {}
+        # The configured hosts are numbered densely. Host sets are handled as bitmaps (python
+        # ints) over this numbering, which makes the set algebra of the condition evaluation
+        # cheap and keeps the cached host sets small.
+        self._hosts_by_bit: list[HostName] = []
+        self._bit_of_host: dict[HostName, int] = {}
+        self._all_configured_hosts_bitmap = 0
+        self._all_processed_hosts_bitmap = 0
+        # (taggroup id, tag id) -> all configured hosts having this tag
+        self._tag_bitmaps: dict[tuple[TaggroupID, TagID | None], int] = {}
+        # Host name regex -> all configured hosts matching this regex
+        self._host_name_regex_bitmaps: dict[str, int] = {}
+        # (label id, label value) -> all hosts having this label. Only the labels of the hosts
+        # in _hosts_with_indexed_labels have been added yet.
+        self._label_bitmaps: dict[tuple[str, str], int] = {}
+        self._hosts_with_indexed_labels = 0
+        # Reference dirname -> all configured hosts in this dir including subfolders
+        self._folder_host_lookup: dict[str, int] = {}
 
         # TODO: Clean this one up?
         self._initialize_host_lookup()
@@ -382,6 +475,8 @@ class RulesetOptimizer:
     def clear_caches(self) -> None:
         self._host_ruleset_cache.clear()
         self._all_matching_hosts_match_cache.clear()
+        self._label_bitmaps.clear()
+        self._hosts_with_indexed_labels = 0
 
     def all_processed_hosts(self) -> set[HostName]:
         """Returns a set of all processed hosts"""
@@ -400,29 +495,7 @@ class RulesetOptimizer:
 
         self._all_processed_hosts.update(nodes_and_clusters)
 
-        # The folder host lookup includes a list of all -processed- hosts within a given
-        # folder. Any update with set_all_processed hosts invalidates this cache, because
-        # the scope of relevant hosts has changed. This is -good-, since the values in this
-        # lookup are iterated one by one later on in all_matching_hosts
-        self._folder_host_lookup = {}
-
-        self._adjust_processed_hosts_similarity()
-
-    def _adjust_processed_hosts_similarity(self) -> None:
-        """This function computes the tag similarities between of the processed hosts
-        The result is a similarity factor, which helps finding the most perfomant operation
-        for the current hostset"""
-        used_groups = {
-            self._host_grouped_ref.get(hostname, ()) for hostname in self._all_processed_hosts
-        }
-
-        if not used_groups:
-            self._all_processed_hosts_similarity = 1.0
-            return
-
-        self._all_processed_hosts_similarity = (
-            1.0 * len(self._all_processed_hosts) / len(used_groups)
-        )
+        self._all_processed_hosts_bitmap = self._bitmap_of_hosts(self._all_processed_hosts)
 
     def get_host_ruleset(
         self, ruleset: Ruleset[T], with_foreign_hosts: bool, is_binary: bool
@@ -432,7 +505,9 @@ class RulesetOptimizer:
         if cache_id in self._host_ruleset_cache:
             return self._host_ruleset_cache[cache_id]
 
-        host_ruleset = self._convert_host_ruleset(ruleset, with_foreign_hosts, is_binary)
+        host_ruleset: PreprocessedHostRuleset[T] = self._convert_host_ruleset(
+            ruleset, with_foreign_hosts, is_binary
+        )
         self._host_ruleset_cache[cache_id] = host_ruleset
         return host_ruleset
 
@@ -444,13 +519,18 @@ class RulesetOptimizer:
         Instead of a ruleset like list structure with precomputed host lists we compute a
         direct map for hostname based lookups for the matching rule values
         """
+        if _profiler is not None:
+            _profiler.statistics_of(ruleset).rules_tested += len(ruleset)
+
         host_values: PreprocessedHostRuleset[T] = {}
         for rule in ruleset:
             if _is_disabled(rule):
                 continue
 
-            for hostname in self._all_matching_hosts(rule["condition"], with_foreign_hosts):
-                host_values.setdefault(hostname, []).append(rule["value"])
+            # mypy does not bind the T of the generic RuleSpec
+            value = cast(T, rule["value"])
+            for bit in _bits_of(self._matching_hosts_bitmap(rule["condition"], with_foreign_hosts)):
+                host_values.setdefault(self._hosts_by_bit[bit], []).append(value)
 
         return host_values
 
@@ -471,61 +551,67 @@ class RulesetOptimizer:
     def _convert_service_ruleset(
         self, ruleset: Ruleset[T], with_foreign_hosts: bool, is_binary: bool
     ) -> PreprocessedServiceRuleset:
-        new_rules: PreprocessedServiceRuleset = []
+        # All distinct service patterns of the ruleset, numbered in order of appearance. Each
+        # rule references its patterns by a bitmask over these numbers.
+        if _profiler is not None:
+            _profiler.statistics_of(ruleset).rules_tested += len(ruleset)
+
+        patterns: dict[str, int] = {}
+        new_rules: list[tuple[object, bytes, LabelConditions, bool, int]] = []
         for rule in ruleset:
             if _is_disabled(rule):
                 continue
 
-            # Directly compute set of all matching hosts here, this will avoid
-            # recomputation later
-            hosts = self._all_matching_hosts(rule["condition"], with_foreign_hosts)
+            # Directly compute the matching hosts here, this will avoid recomputation later.
+            # The bitmap is stored as bytes, which allows constant time lookups of single hosts
+            # (see host_bit).
+            hosts = self._matching_hosts_bitmap(rule["condition"], with_foreign_hosts).to_bytes(
+                (len(self._hosts_by_bit) + 7) // 8, "little"
+            )
 
-            # Prepare cache id
-            service_labels_condition = rule["condition"].get("service_labels", {})
-            service_labels_condition_cache_id = tuple(
-                (label_id, _tags_or_labels_cache_id(label_spec))
-                for label_id, label_spec in service_labels_condition.items()
+            negate, rule_patterns = self._convert_pattern_list(
+                rule["condition"].get("service_description")
             )
+            pattern_mask = 0
+            for pattern in rule_patterns:
+                pattern_mask |= 1 << patterns.setdefault(pattern, len(patterns))
 
-            # And now preprocess the configured patterns in the servlist
             new_rules.append(
                 (
                     rule["value"],
                     hosts,
-                    service_labels_condition,
-                    service_labels_condition_cache_id,
-                    self._convert_pattern_list(rule["condition"].get("service_description")),
+                    rule["condition"].get("service_labels", {}),
+                    negate,
+                    pattern_mask,
                 )
             )
-        return new_rules
+
+        return ServiceDescriptionMatcher(list(patterns)), new_rules
 
     def _convert_pattern_list(
         self, patterns: HostOrServiceConditions | None
-    ) -> PreprocessedPattern:
-        """Compiles a list of service match patterns to a to a single regex
+    ) -> tuple[bool, list[str]]:
+        """Returns the negation and the regexes of a list of service match patterns
 
-        Reducing the number of individual regex matches improves the performance dramatically.
         This function assumes either all or no pattern is negated (like WATO creates the rules).
         """
         if not patterns:
-            return False, regex("")  # Match everything
+            return False, [""]  # Match everything
 
         negate, parsed_patterns = parse_negated_condition_list(patterns)
+        return negate, [p["$regex"] if isinstance(p, dict) else p for p in parsed_patterns]
 
-        pattern_parts = []
-        for p in parsed_patterns:
-            if isinstance(p, dict):
-                pattern_parts.append(p["$regex"])
-            else:
-                pattern_parts.append(p)
-
-        return negate, regex("(?:%s)" % "|".join("(?:%s)" % p for p in pattern_parts))
-
-    def _all_matching_hosts(  # pylint: disable=too-many-branches
+    def _all_matching_hosts(
         self, condition: RuleConditionsSpec, with_foreign_hosts: bool
     ) -> set[HostName]:
         """Returns a set containing the names of hosts that match the given
         tags and hostlist conditions."""
+        return self._hosts_of_bitmap(self._matching_hosts_bitmap(condition, with_foreign_hosts))
+
+    def _matching_hosts_bitmap(
+        self, condition: RuleConditionsSpec, with_foreign_hosts: bool
+    ) -> int:
+        """Returns the bitmap of the hosts that match the given conditions"""
         hostlist = condition.get("host_name")
         tag_conditions: TaggroupIDToTagCondition = condition.get("host_tags", {})
         labels = condition.get("host_labels", {})
@@ -546,69 +632,120 @@ class RulesetOptimizer:
         except KeyError:
             pass
 
-        if with_foreign_hosts:
-            valid_hosts = self._all_configured_hosts
-        else:
-            valid_hosts = self._all_processed_hosts
-
-        # Thin out the valid hosts further. If the rule is located in a folder
-        # we only need the intersection of the folders hosts and the previously determined valid_hosts
-        valid_hosts = self.get_hosts_within_folder(rule_path, with_foreign_hosts).intersection(
-            valid_hosts
+        matching = (
+            self._all_configured_hosts_bitmap
+            if with_foreign_hosts
+            else self._all_processed_hosts_bitmap
         )
+        matching &= self._folder_bitmap(rule_path)
 
-        if tag_conditions and hostlist is None and not labels:
-            # TODO: Labels could also be optimized like the tags
-            matched_by_tags = self._match_hosts_by_tags(cache_id, valid_hosts, tag_conditions)
-            if matched_by_tags is not None:
-                return matched_by_tags
-
-        matching: set[HostName] = set()
-        only_specific_hosts = (
-            hostlist is not None
-            and not isinstance(hostlist, dict)
-            and all(not isinstance(x, dict) for x in hostlist)
-        )
+        if hostlist is not None:
+            matching &= self._host_name_bitmap(hostlist)
 
-        if hostlist == []:
-            pass  # Empty host list -> Nothing matches
+        if tag_conditions:
+            matching &= self._tag_conditions_bitmap(tag_conditions)
+
+        if labels and matching:
+            matching = self._label_conditions_bitmap(labels, matching)
 
-        elif not tag_conditions and not labels and not hostlist:
-            # If no tags are specified and the hostlist only include @all (all hosts)
-            matching = valid_hosts
+        self._all_matching_hosts_match_cache[cache_id] = matching
+        return matching
 
-        elif not tag_conditions and not labels and only_specific_hosts and hostlist is not None:
-            # If no tags are specified and there are only specific hosts we already have the matches
-            matching = valid_hosts.intersection(hostlist)
+    def _host_name_bitmap(self, hostlist: HostOrServiceConditions) -> int:
+        negate, host_entries = parse_negated_condition_list(hostlist)
 
-        else:
-            # If the rule has only exact host restrictions, we can thin out the list of hosts to check
-            if only_specific_hosts and hostlist is not None:
-                hosts_to_check = valid_hosts.intersection(hostlist)
-            else:
-                hosts_to_check = valid_hosts
-
-            for hostname in hosts_to_check:
-                # When no tag matching is requested, do not filter by tags. Accept all hosts
-                # and filter only by hostlist
-                if tag_conditions and not self.matches_host_tags(
-                    self._host_tags[hostname],
-                    tag_conditions,
-                ):
+        bitmap = 0
+        bits = []
+        for entry in host_entries:
+            if isinstance(entry, dict):
+                bitmap |= self._host_name_regex_bitmap(entry["$regex"])
+            elif (bit := self._bit_of_host.get(entry)) is not None:
+                bits.append(bit)
+        bitmap |= _bitmap_of(bits, len(self._hosts_by_bit))
+
+        return self._all_configured_hosts_bitmap & ~bitmap if negate else bitmap
+
+    def _host_name_regex_bitmap(self, pattern: str) -> int:
+        try:
+            return self._host_name_regex_bitmaps[pattern]
+        except KeyError:
+            pass
+
+        compiled = regex(pattern)
+        bitmap = self._host_name_regex_bitmaps[pattern] = _bitmap_of(
+            (
+                bit
+                for bit, hostname in enumerate(self._hosts_by_bit)
+                if compiled.match(hostname) is not None
+            ),
+            len(self._hosts_by_bit),
+        )
+        return bitmap
+
+    def _tag_conditions_bitmap(self, tag_conditions: TaggroupIDToTagCondition) -> int:
+        bitmap = self._all_configured_hosts_bitmap
+        for taggroup_id, tag_condition in tag_conditions.items():
+            if isinstance(tag_condition, dict):
+                if "$ne" in tag_condition:
+                    bitmap &= ~self._tag_bitmaps.get(
+                        (taggroup_id, cast(TagConditionNE, tag_condition)["$ne"]), 0
+                    )
                     continue
 
-                if labels:
-                    host_labels = self.labels_of_host(hostname)
-                    if not matches_labels(host_labels, labels):
-                        continue
+                if "$or" in tag_condition:
+                    bitmap &= self._any_tag_bitmap(
+                        taggroup_id, cast(TagConditionOR, tag_condition)["$or"]
+                    )
+                    continue
 
-                if not self.matches_host_name(hostlist, hostname):
+                if "$nor" in tag_condition:
+                    bitmap &= ~self._any_tag_bitmap(
+                        taggroup_id, cast(TagConditionNOR, tag_condition)["$nor"]
+                    )
                     continue
 
-                matching.add(hostname)
+                raise NotImplementedError()
+
+            bitmap &= self._tag_bitmaps.get((taggroup_id, tag_condition), 0)
 
-        self._all_matching_hosts_match_cache[cache_id] = matching
-        return matching
+        return bitmap
+
+    def _label_conditions_bitmap(self, labels: LabelConditions, candidates: int) -> int:
+        """Returns the bitmap of the candidates matching the label conditions
+
+        The labels of a host are only indexed once they are needed. This keeps e.g. the
+        checking of a single host from computing the labels of all configured hosts."""
+        self._index_labels_of_hosts(candidates & ~self._hosts_with_indexed_labels)
+
+        bitmap = candidates
+        for label_id, label_spec in labels.items():
+            if isinstance(label_spec, dict):
+                bitmap &= ~self._label_bitmaps.get((label_id, label_spec["$ne"]), 0)
+            else:
+                bitmap &= self._label_bitmaps.get((label_id, label_spec), 0)
+
+        return bitmap
+
+    def _index_labels_of_hosts(self, hosts: int) -> None:
+        if not hosts:
+            return
+
+        bits_of_label: dict[tuple[str, str], list[int]] = {}
+        for bit in _bits_of(hosts):
+            for label in self.labels_of_host(self._hosts_by_bit[bit]).items():
+                bits_of_label.setdefault(label, []).append(bit)
+
+        for label, bits in bits_of_label.items():
+            self._label_bitmaps[label] = self._label_bitmaps.get(label, 0) | _bitmap_of(
+                bits, len(self._hosts_by_bit)
+            )
+        self._hosts_with_indexed_labels |= hosts
+
+    def _any_tag_bitmap(self, taggroup_id: TaggroupID, tag_ids: Iterable[TagID | None]) -> int:
+        bitmap = 0
+        for tag_id in tag_ids:
+            bitmap |= self._tag_bitmaps.get((taggroup_id, tag_id), 0)
+        return bitmap
 
     def matches_host_name(
         self, host_entries: HostOrServiceConditions | None, hostname: HostName
@@ -676,101 +813,58 @@ class RulesetOptimizer:
             rule_path,
         )
 
-    # TODO: Generalize this optimization: Build some kind of key out of the tag conditions
-    # (positive, negative, ...). Make it work with the new tag group based "$or" handling.
-    def _match_hosts_by_tags(
-        self,
-        cache_id: tuple[
-            tuple[tuple[str, ...], tuple[tuple[str, Any], ...], tuple[tuple[Any, Any], ...], Any],
-            bool,
-        ],
-        valid_hosts: set[HostName],
-        tag_conditions: TaggroupIDToTagCondition,
-    ) -> set | None:
-        matching = set()
-        negative_match_tags = set()
-        positive_match_tags = set()
-        for taggroup_id, tag_condition in tag_conditions.items():
-            if isinstance(tag_condition, dict):
-                if "$ne" in tag_condition:
-                    negative_match_tags.add(
-                        (
-                            taggroup_id,
-                            cast(TagConditionNE, tag_condition)["$ne"],
-                        )
-                    )
-                    continue
-
-                if "$or" in tag_condition:
-                    return None  # Can not be optimized, makes _all_matching_hosts proceed
-
-                if "$nor" in tag_condition:
-                    return None  # Can not be optimized, makes _all_matching_hosts proceed
-
-                raise NotImplementedError()
-
-            positive_match_tags.add((taggroup_id, tag_condition))
-
-        # TODO:
-        # if has_specific_folder_tag or self._all_processed_hosts_similarity < 3.0:
-        if self._all_processed_hosts_similarity < 3.0:
-            # Without shared folders
-            for hostname in valid_hosts:
-                if positive_match_tags <= self._host_tags[
-                    hostname
-                ] and not negative_match_tags.intersection(self._host_tags[hostname]):
-                    matching.add(hostname)
-
-            self._all_matching_hosts_match_cache[cache_id] = matching
-            return matching
-
-        # With shared folders
-        checked_hosts: set[str] = set()
-        for hostname in valid_hosts:
-            if hostname in checked_hosts:
-                continue
-
-            hosts_with_same_tag = self._filter_hosts_with_same_tags_as_host(hostname, valid_hosts)
-            checked_hosts.update(hosts_with_same_tag)
-
-            if positive_match_tags <= self._host_tags[
-                hostname
-            ] and not negative_match_tags.intersection(self._host_tags[hostname]):
-                matching.update(hosts_with_same_tag)
-
-        self._all_matching_hosts_match_cache[cache_id] = matching
-        return matching
-
-    def _filter_hosts_with_same_tags_as_host(
-        self,
-        hostname: HostName,
-        hosts: set[HostName],
-    ) -> set[HostName]:
-        return self._hosts_grouped_by_tags[self._host_grouped_ref[hostname]].intersection(hosts)
-
     def get_hosts_within_folder(self, folder_path: str, with_foreign_hosts: bool) -> set[HostName]:
-        cache_id = with_foreign_hosts, folder_path
-        if cache_id not in self._folder_host_lookup:
-            hosts_in_folder = set()
-            relevant_hosts = (
-                self._all_configured_hosts if with_foreign_hosts else self._all_processed_hosts
+        return self._hosts_of_bitmap(
+            self._folder_bitmap(folder_path)
+            & (
+                self._all_configured_hosts_bitmap
+                if with_foreign_hosts
+                else self._all_processed_hosts_bitmap
             )
+        )
 
-            for hostname in relevant_hosts:
-                host_path = self._host_paths.get(hostname, "/")
-                if host_path.startswith(folder_path):
-                    hosts_in_folder.add(hostname)
+    def _folder_bitmap(self, folder_path: str) -> int:
+        try:
+            return self._folder_host_lookup[folder_path]
+        except KeyError:
+            pass
 
-            self._folder_host_lookup[cache_id] = hosts_in_folder
-            return hosts_in_folder
+        bitmap = self._folder_host_lookup[folder_path] = _bitmap_of(
+            (
+                bit
+                for bit, hostname in enumerate(self._hosts_by_bit)
+                if self._host_paths.get(hostname, "/").startswith(folder_path)
+            ),
+            len(self._hosts_by_bit),
+        )
+        return bitmap
+
+    def host_bit(self, hostname: HostName | None) -> int | None:
+        """Returns the number of a configured host in the host bitmaps"""
+        return self._bit_of_host.get(hostname) if hostname is not None else None
+
+    def _bitmap_of_hosts(self, hostnames: Iterable[HostName]) -> int:
+        return _bitmap_of(
+            (self._bit_of_host[hn] for hn in hostnames if hn in self._bit_of_host),
+            len(self._hosts_by_bit),
+        )
 
-        return self._folder_host_lookup[cache_id]
+    def _hosts_of_bitmap(self, bitmap: int) -> set[HostName]:
+        return {self._hosts_by_bit[bit] for bit in _bits_of(bitmap)}
 
     def _initialize_host_lookup(self) -> None:
-        for hostname in self._all_configured_hosts:
-            group_ref = tuple(sorted(self._host_tags[hostname]))
-            self._hosts_grouped_by_tags.setdefault(group_ref, set()).add(hostname)
-            self._host_grouped_ref[hostname] = group_ref
+        self._hosts_by_bit = sorted(self._all_configured_hosts)
+        self._bit_of_host = {hostname: bit for bit, hostname in enumerate(self._hosts_by_bit)}
+        self._all_configured_hosts_bitmap = (1 << len(self._hosts_by_bit)) - 1
+        self._all_processed_hosts_bitmap = self._all_configured_hosts_bitmap
+
+        bits_of_tag: dict[tuple[TaggroupID, TagID | None], list[int]] = {}
+        for bit, hostname in enumerate(self._hosts_by_bit):
+            for tag in self._host_tags.get(hostname, ()):
+                bits_of_tag.setdefault(tag, []).append(bit)
+        self._tag_bitmaps = {
+            tag: _bitmap_of(bits, len(self._hosts_by_bit)) for tag, bits in bits_of_tag.items()
+        }
 
     def labels_of_host(self, hostname: HostName) -> Labels:
         """Returns the effective set of host labels from all available sources
@@ -861,6 +955,110 @@ class RulesetOptimizer:
         )
 
 
+@dataclass
+class RulesetStatistics:
+    evaluations: int = 0
+    rules_tested: int = 0
+    regex_matches: int = 0
+    time: float = 0.0
+
+
+class RulesetProfiler:
+    """Records the costs of the ruleset evaluations per ruleset
+
+    Counted are the evaluations of a ruleset for a host or service, the rules tested (while
+    preprocessing the ruleset and while matching a service), the service description regexes
+    executed and the cumulative time spent in the evaluations.
+    """
+
+    def __init__(self) -> None:
+        # The rulesets are kept referenced to keep their ids unique
+        self._statistics: dict[int, tuple[Ruleset, RulesetStatistics]] = {}
+
+    def statistics_of(self, ruleset: Ruleset) -> RulesetStatistics:
+        try:
+            return self._statistics[id(ruleset)][1]
+        except KeyError:
+            statistics = RulesetStatistics()
+            self._statistics[id(ruleset)] = ruleset, statistics
+            return statistics
+
+    def profile(self, ruleset: Ruleset, values: Iterator[T]) -> Generator[T, None, None]:
+        statistics = self.statistics_of(ruleset)
+        statistics.evaluations += 1
+        while True:
+            start = time.perf_counter()
+            try:
+                value = next(values)
+            except StopIteration:
+                statistics.time += time.perf_counter() - start
+                return
+            statistics.time += time.perf_counter() - start
+            yield value
+
+    def report(self, names: Mapping[int, str]) -> str:
+        """Returns the statistics of all evaluated rulesets, the most expensive first
+
+        The rulesets are named by the given names of their ids."""
+        lines = [
+            "%-50s %12s %12s %14s %10s"
+            % ("Ruleset", "Evaluations", "Rules tested", "Regex matches", "Time [s]")
+        ]
+        for ruleset_id, (ruleset, statistics) in sorted(
+            self._statistics.items(), key=lambda item: item[1][1].time, reverse=True
+        ):
+            lines.append(
+                "%-50s %12d %12d %14d %10.3f"
+                % (
+                    names.get(ruleset_id, "<unknown ruleset with %d rules>" % len(ruleset)),
+                    statistics.evaluations,
+                    statistics.rules_tested,
+                    statistics.regex_matches,
+                    statistics.time,
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+
+_profiler: RulesetProfiler | None = None
+
+
+def enable_profiling() -> None:
+    global _profiler
+    _profiler = RulesetProfiler()
+
+
+def disable_profiling() -> None:
+    global _profiler
+    _profiler = None
+
+
+def profiler() -> RulesetProfiler | None:
+    return _profiler
+
+
+# The positions of the set bits of all byte values
+_BITS_OF_BYTE = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+def _bitmap_of(bits: Iterable[int], size: int) -> int:
+    """Builds a host bitmap from the given host numbers
+
+    Setting the bits in a bytearray avoids creating an intermediate int per host."""
+    data = bytearray((size + 7) // 8)
+    for bit in bits:
+        data[bit >> 3] |= 1 << (bit & 7)
+    return int.from_bytes(data, "little")
+
+
+def _bits_of(bitmap: int) -> Iterator[int]:
+    """Yields the host numbers of all set bits in ascending order"""
+    for index, byte in enumerate(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")):
+        if byte:
+            for bit in _BITS_OF_BYTE[byte]:
+                yield (index << 3) | bit
+
+
 def _tags_or_labels_cache_id(tag_or_label_spec):
     if isinstance(tag_or_label_spec, dict):
         if "$ne" in tag_or_label_spec:
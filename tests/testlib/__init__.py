@@ -160,6 +160,9 @@ def fake_version_and_paths() -> None:
     monkeypatch.setattr(
         "cmk.utils.paths.piggyback_source_dir", Path(tmp_dir) / "var/check_mk/piggyback_sources"
     )
+    monkeypatch.setattr(
+        "cmk.utils.paths.piggyback_index_dir", Path(tmp_dir) / "var/check_mk/piggyback_index"
+    )
     monkeypatch.setattr("cmk.utils.paths.htpasswd_file", os.path.join(tmp_dir, "etc/htpasswd"))
 
     monkeypatch.setattr("cmk.utils.paths.local_share_dir", Path(tmp_dir, "local/share/check_mk"))
@@ -13,9 +13,12 @@ from _pytest.monkeypatch import MonkeyPatch
 from tests.testlib.base import Scenario
 
 from cmk.utils.check_utils import ServiceCheckResult
+from cmk.utils.cpu_tracking import Snapshot
 from cmk.utils.parameters import TimespecificParameters, TimespecificParameterSet
 from cmk.utils.type_defs import HostKey, HostName, LegacyCheckParameters, SourceType
 
+from cmk.core_helpers.timing import PhaseTimes
+
 import cmk.base.agent_based.checking._checking as checking
 import cmk.base.config as config
 from cmk.base.api.agent_based.checking_classes import Metric, Result, State
@@ -326,3 +329,24 @@ def test_config_cache_get_clustered_service_node_keys_clustered(monkeypatch: Mon
         SourceType.HOST,
         "Test Unclustered",
     )
+
+
+def test_timing_results_phase_times(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "check_mk_perfdata_with_times", True)
+    phase_times = PhaseTimes(HostName("heute"))
+    phase_times.add("agent", "receive", 0.5, 1024)
+    phase_times.add("agent", "parse", 0.25, 0)
+    phase_times.add("piggyback", "parse", 0.25, 0)
+
+    result = checking._timing_results(Snapshot.null(), (), phase_times=phase_times)
+    assert result.metrics[-3:] == [
+        "cmk_time_parse=0.500",
+        "cmk_time_receive=0.500",
+        "cmk_bytes_receive=1024",
+    ]
+
+
+def test_timing_results_without_phase_times(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "check_mk_perfdata_with_times", True)
+    result = checking._timing_results(Snapshot.null(), ())
+    assert not any(p.startswith(("cmk_time_", "cmk_bytes_")) for p in result.metrics)
@@ -3,7 +3,8 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-from typing import Callable
+from pathlib import Path
+from typing import Callable, List
 
 import pytest
 
@@ -14,7 +15,7 @@ from cmk.core_helpers.agent import AgentRawDataSection
 from cmk.core_helpers.host_sections import HostSections
 
 from cmk.base import crash_reporting
-from cmk.base.agent_based.data_provider import SectionsParser
+from cmk.base.agent_based.data_provider import ParseResultCache, SectionsParser
 from cmk.base.api.agent_based.register.section_plugins import (
     AgentSectionPlugin,
     trivial_section_factory,
@@ -99,3 +100,79 @@ class TestSectionsParser:
         section = _section("one", lambda x: None)
 
         assert sections_parser.parse(section) is None
+
+
+class TestParseResultCache:
+    @staticmethod
+    def _parser(path: Path, content: List[List[str]], cache_info: bool = True) -> SectionsParser:
+        return SectionsParser(
+            host_sections=HostSections[AgentRawDataSection](
+                sections={SectionName("one"): content, SectionName("two"): content},
+                cache_info={SectionName("one"): (23, 42)} if cache_info else {},
+            ),
+            host_name=HostName("testhost"),
+            parse_cache=ParseResultCache(path),
+        )
+
+    @staticmethod
+    def _parse_and_save(parser: SectionsParser, section: AgentSectionPlugin) -> object:
+        parsing_result = parser.parse(section)
+        parser.save_parse_results()
+        return None if parsing_result is None else parsing_result.data
+
+    def test_unchanged_raw_data(self, tmp_path: Path) -> None:
+        calls = []
+
+        def parse_function(string_table: List[List[str]]) -> object:
+            calls.append(string_table)
+            return {"parsed": string_table}
+
+        section = _section("one", parse_function)
+
+        for _cycle in range(3):
+            parsed = self._parse_and_save(self._parser(tmp_path / "host", [["a"]]), section)
+            assert parsed == {"parsed": [["a"]]}
+        assert calls == [[["a"]]]
+
+        self._parse_and_save(self._parser(tmp_path / "host", [["b"]]), section)
+        assert calls == [[["a"]], [["b"]]]
+
+    def test_fresh_sections_are_not_cached(self, tmp_path: Path) -> None:
+        calls = []
+
+        def parse_function(string_table: List[List[str]]) -> object:
+            calls.append(string_table)
+            return 42
+
+        section = _section("two", parse_function)
+
+        for _cycle in range(2):
+            self._parse_and_save(self._parser(tmp_path / "host", [["a"]]), section)
+        assert len(calls) == 2
+        assert not (tmp_path / "host").exists()
+
+    def test_unused_entries_are_evicted(self, tmp_path: Path) -> None:
+        section = _section("one", lambda x: 42)
+        self._parse_and_save(self._parser(tmp_path / "host", [["a"]]), section)
+        assert (tmp_path / "host").exists()
+
+        # The section is no longer delivered from the cache.
+        self._parse_and_save(self._parser(tmp_path / "host", [["a"]], cache_info=False), section)
+        assert not (tmp_path / "host").exists()
+
+    def test_parsed_section_is_copied(self, tmp_path: Path) -> None:
+        section = _section("one", lambda x: {"items": list(x)})
+        parsed = self._parse_and_save(self._parser(tmp_path / "host", [["a"]]), section)
+        assert isinstance(parsed, dict)
+        parsed["items"].clear()
+
+        assert self._parse_and_save(self._parser(tmp_path / "host", [["a"]]), section) == {
+            "items": [["a"]]
+        }
+
+    def test_corrupt_cache_file(self, tmp_path: Path) -> None:
+        cmk.utils.debug.disable()
+        (tmp_path / "host").write_bytes(b"garbage")
+        section = _section("one", lambda x: 42)
+
+        assert self._parse_and_save(self._parser(tmp_path / "host", [["a"]]), section) == 42
@@ -3,14 +3,15 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-from ast import literal_eval
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Tuple
 
 # pylint: disable=protected-access
 import pytest
+from pytest_mock import MockerFixture
 
 from cmk.utils import store
+from cmk.utils.exceptions import MKGeneralException
 from cmk.utils.type_defs import CheckPluginName
 
 from cmk.base.api.agent_based.value_store._utils import (
@@ -78,72 +79,87 @@ class Test_DynamicDiskSyncedMapping:
 
 
 class Test_StaticDiskSyncedMapping:
-    def _mock_load(self, mocker):
-        stored_item_states = (
-            '{("check1", None, "stored-user-key-1"): 23,'
-            ' ("check2", "item", "stored-user-key-2"): 42}'
-        )
-
-        mocker.patch.object(
-            store,
-            "load_text_from_file",
-            side_effect=lambda *a, **kw: stored_item_states,
-        )
-
-    def _mock_store(self, mocker):
-        mocker.patch.object(
-            store,
-            "save_text_to_file",
-            autospec=True,
-        )
-
     @staticmethod
-    def _get_sdsm(
-        tmp_path: Path,
-    ) -> _StaticDiskSyncedMapping[Tuple[str, Optional[str], str], object]:
-        return _StaticDiskSyncedMapping(
-            path=tmp_path / "test-host",
-            log_debug=lambda msg: None,
-            serializer=repr,
-            deserializer=literal_eval,
-        )
+    def _get_sdsm(tmp_path: Path) -> _StaticDiskSyncedMapping:
+        return _StaticDiskSyncedMapping(path=tmp_path / "test-host", log_debug=lambda msg: None)
 
-    def test_mapping_features(self, mocker, tmp_path: Path) -> None:  # type:ignore[no-untyped-def]
+    def test_mapping_features(self, tmp_path: Path) -> None:
+        sdsm = self._get_sdsm(tmp_path)
+        sdsm.disksync(
+            changes={
+                ("host", "check1", None): ((), [("stored-user-key-1", 23)]),
+                ("host", "check2", "item"): ((), [("stored-user-key-2", 42)]),
+            }
+        )
 
-        self._mock_load(mocker)
         sdsm = self._get_sdsm(tmp_path)
-        assert sdsm.get(("check_no", None, "moo")) is None
+        assert sdsm.get(("host", "check_no", None)) is None
         with pytest.raises(KeyError):
-            _ = sdsm[("check_no", None, "moo")]
+            _ = sdsm[("host", "check_no", None)]
         assert len(sdsm) == 2
 
-        assert sdsm.get(("check1", None, "stored-user-key-1")) == 23
-        assert sdsm[("check2", "item", "stored-user-key-2")] == 42
-        assert list(sdsm) == [
-            ("check1", None, "stored-user-key-1"),
-            ("check2", "item", "stored-user-key-2"),
-        ]
-        assert len(sdsm) == 2
-
-    def test_store(self, mocker, tmp_path: Path) -> None:  # type:ignore[no-untyped-def]
-
-        self._mock_load(mocker)
-        self._mock_store(mocker)
-
+        assert sdsm[("host", "check1", None)] == {"stored-user-key-1": 23}
+        assert sdsm[("host", "check2", "item")] == {"stored-user-key-2": 42}
+        assert list(sdsm) == [("host", "check1", None), ("host", "check2", "item")]
+
+    def test_store(self, tmp_path: Path) -> None:
+        (tmp_path / "test-host").write_text(
+            repr(
+                {
+                    ("host", "check1", None, "stored-user-key-1"): 23,
+                    ("host", "check2", "item", "stored-user-key-2"): 42,
+                    ("host", "check2", "item", "stored-user-key-3"): float("inf"),
+                }
+            ).replace("inf", "1e309")
+        )
         sdsm = self._get_sdsm(tmp_path)
 
         sdsm.disksync(
-            removed={("check2", "item", "stored-user-key-2")},
-            updated=[(("check3", "el Barto", "Ay caramba"), "ASDF")],
+            changes={
+                ("host", "check2", "item"): ({"stored-user-key-2"}, []),
+                ("host", "check3", "el Barto"): ((), [("Ay caramba", "ASDF")]),
+            }
         )
 
         expected_values = {
-            ("check1", None, "stored-user-key-1"): 23,
-            ("check3", "el Barto", "Ay caramba"): "ASDF",
+            ("host", "check1", None): {"stored-user-key-1": 23},
+            ("host", "check2", "item"): {"stored-user-key-3": float("inf")},
+            ("host", "check3", "el Barto"): {"Ay caramba": "ASDF"},
         }
-        written = store.save_text_to_file.call_args.args[1]  # type: ignore[attr-defined]
-        assert written == repr(expected_values)
-        assert list(sdsm.items()) == list(expected_values.items())
+        assert dict(sdsm) == expected_values
+        assert (tmp_path / "test-host").read_bytes().startswith(b"CMKVAL01")
+        assert dict(self._get_sdsm(tmp_path)) == expected_values
+
+    def test_values_are_loaded_lazily(self, tmp_path: Path) -> None:
+        sdsm = self._get_sdsm(tmp_path)
+        sdsm.disksync(
+            changes={
+                ("host", "check1", None): ((), [("key", 1)]),
+                ("host", "check2", None): ((), [("key", 2)]),
+            }
+        )
+
+        sdsm = self._get_sdsm(tmp_path)
+        assert sdsm[("host", "check1", None)] == {"key": 1}
+        assert list(sdsm._data) == [("host", "check1", None)]
+
+    def test_unchanged_values_are_not_written(self, mocker: MockerFixture, tmp_path: Path) -> None:
+        sdsm = self._get_sdsm(tmp_path)
+        sdsm.disksync(changes={("host", "check1", None): ((), [("key", 1)])})
+
+        save_bytes_to_file = mocker.spy(store, "save_bytes_to_file")
+        sdsm.disksync(changes={("host", "check1", None): ((), [("key", 1)])})
+        sdsm.disksync(changes={("host", "check2", None): ({"key"}, [])})
+        save_bytes_to_file.assert_not_called()
+
+        sdsm.disksync(changes={("host", "check1", None): ({"key"}, [])})
+        save_bytes_to_file.assert_called_once()
+        assert not self._get_sdsm(tmp_path)
+
+    def test_unserializable_value(self, tmp_path: Path) -> None:
+        sdsm = self._get_sdsm(tmp_path)
+        with pytest.raises(MKGeneralException):
+            sdsm.disksync(changes={("host", "check1", None): ((), [("key", object())])})
 
 
 class Test_DiskSyncedMapping:
@@ -217,19 +233,14 @@ class Test_DiskSyncedMapping:
 class Test_ValueStore:
     @staticmethod
     def _get_store() -> _ValueStore:
-        return _ValueStore(
-            data={
-                ("moritz", "check1", "item", "key1"): 42,
-                ("moritz", "check2", "item", "key2"): 23,
-            },
-            service_id=(CheckPluginName("check1"), "item"),
-            host_name="moritz",
-        )
+        return _ValueStore(data={"key1": 42})
 
-    def test_separation(self) -> None:
+    def test_mapping(self) -> None:
         s_store = self._get_store()
         assert "key1" in s_store
         assert "key2" not in s_store
+        s_store["key2"] = 23
+        assert dict(s_store) == {"key1": 42, "key2": 23}
 
     def test_invalid_key(self) -> None:
         s_store = self._get_store()
@@ -258,3 +269,31 @@ class TestValueStoreManager:
             assert vsm.active_service_interface["key"] == "outer"
 
         assert vsm.active_service_interface is None
+
+    @staticmethod
+    def test_save() -> None:
+        vsm = ValueStoreManager("test-host")
+        service_1 = ServiceID(CheckPluginName("unit_test"), "1")
+        service_2 = ServiceID(CheckPluginName("unit_test"), "2")
+        with vsm.namespace(service_1):
+            assert vsm.active_service_interface is not None
+            vsm.active_service_interface["key"] = "one"
+        with vsm.namespace(service_2, host_name="node"):
+            assert vsm.active_service_interface is not None
+            vsm.active_service_interface["key"] = "two"
+        vsm.save()
+
+        vsm = ValueStoreManager("test-host")
+        with vsm.namespace(service_1):
+            assert dict(vsm.active_service_interface or {}) == {"key": "one"}
+            assert vsm.active_service_interface is not None
+            del vsm.active_service_interface["key"]
+        with vsm.namespace(service_2):
+            assert not vsm.active_service_interface
+        with vsm.namespace(service_2, host_name="node"):
+            assert dict(vsm.active_service_interface or {}) == {"key": "two"}
+        vsm.save()
+
+        vsm = ValueStoreManager("test-host")
+        with vsm.namespace(service_1):
+            assert not vsm.active_service_interface
@@ -3,15 +3,19 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+from pathlib import Path
+
 import pytest
 
 from tests.testlib.base import Scenario
 
+import cmk.utils.paths
+
 import cmk.core_helpers.cache as file_cache
 from cmk.core_helpers import PiggybackFetcher, ProgramFetcher, SNMPFetcher, TCPFetcher
 
 from cmk.base.config import HostConfig
-from cmk.base.sources import make_non_cluster_sources
+from cmk.base.sources import file_cache_usage, FileCacheUsage, make_non_cluster_sources
 
 
 def make_scenario(hostname, tags):
@@ -107,3 +111,28 @@ def test_host_config_creates_passing_source_sources(
             file_cache_max_age=file_cache.MaxAge.none(),
         )
     ] == sources
+
+
+def test_file_cache_usage(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    tcp_cache_dir = tmp_path / "cache"
+    data_source_cache_dir = tmp_path / "data_source_cache"
+    monkeypatch.setattr(cmk.utils.paths, "tcp_cache_dir", str(tcp_cache_dir))
+    monkeypatch.setattr(cmk.utils.paths, "data_source_cache_dir", str(data_source_cache_dir))
+
+    for path, size in (
+        (tcp_cache_dir / "host1", 10),
+        (tcp_cache_dir / "host2", 20),
+        (data_source_cache_dir / "snmp" / "checking" / "host1", 3),
+        (data_source_cache_dir / "snmp" / "discovery" / "host1", 4),
+        (data_source_cache_dir / "special_jolokia" / "host1", 5),
+    ):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(size * b"x")
+    (data_source_cache_dir / "mgmt_ipmi").mkdir()
+
+    assert file_cache_usage() == {
+        "agent": FileCacheUsage(2, 30),
+        "mgmt_ipmi": FileCacheUsage(0, 0),
+        "snmp": FileCacheUsage(2, 7),
+        "special_jolokia": FileCacheUsage(1, 5),
+    }
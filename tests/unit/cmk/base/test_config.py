@@ -3,6 +3,7 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import os
 import re
 import shutil
 from collections.abc import Iterator
@@ -14,6 +15,7 @@ from _pytest.monkeypatch import MonkeyPatch
 
 from tests.testlib.base import Scenario
 
+import cmk.utils.debug
 import cmk.utils.paths
 import cmk.utils.piggyback as piggyback
 import cmk.utils.version as cmk_version
@@ -2737,6 +2739,36 @@ def test_load_packed_config(config_path: VersionedConfigPath) -> None:
     del config.__dict__["abc"]
 
 
+@pytest.mark.usefixtures("fix_register")
+def test_packed_config_precomputed_check_parameters(
+    monkeypatch: MonkeyPatch, config_path: VersionedConfigPath
+) -> None:
+    hostname = HostName("bla1")
+    ts = Scenario()
+    ts.add_host(hostname)
+    ts.set_autochecks(hostname, [AutocheckEntry(CheckPluginName("uptime"), None, {}, {})])
+    ts.set_option(
+        "checkgroup_parameters",
+        {"uptime": [{"condition": {}, "value": {"min": (60, 120)}}]},
+    )
+    config_cache = ts.apply(monkeypatch)
+    configured = TimespecificParameters((TimespecificParameterSet({"min": (60, 120)}, ()),))
+    parameters = config.compute_check_parameters(hostname, CheckPluginName("uptime"), None, {})
+
+    config.save_packed_config(config_path, config_cache)
+    precomputed = config.PackedConfigStore.from_serial(config_path).read()[
+        "_precomputed_check_parameters"
+    ]
+    assert precomputed == {hostname: {(CheckPluginName("uptime"), None): configured}}
+
+    # The check helpers do not evaluate the rules anymore.
+    monkeypatch.setattr(config, "_precomputed_check_parameters", precomputed)
+    monkeypatch.setattr(config, "_get_configured_parameters", lambda *args: 1 / 0)
+    assert (
+        config.compute_check_parameters(hostname, CheckPluginName("uptime"), None, {}) == parameters
+    )
+
+
 class TestPackedConfigStore:
     @pytest.fixture()
     def store(self, config_path: VersionedConfigPath) -> config.PackedConfigStore:
@@ -2755,6 +2787,89 @@ class TestPackedConfigStore:
         assert precompiled_check_config.exists()
         assert store.read() == {"abc": 1}
 
+    def test_host_shards(self, store: config.PackedConfigStore) -> None:
+        helper_config = {
+            "abc": 1,
+            "ipaddresses": {HostName("heute"): "127.0.0.1", HostName("morgen"): "127.0.0.2"},
+            "host_attributes": {HostName("heute"): {"alias": "today"}},
+        }
+        store.write(helper_config)
+
+        read = store.read()
+        assert read == helper_config
+        ipaddresses = read["ipaddresses"]
+        assert ipaddresses.get(HostName("heute")) == "127.0.0.1"
+        assert ipaddresses.get(HostName("gestern")) is None
+        assert read["host_attributes"].get(HostName("morgen"), {}) == {}
+        assert sorted(read["host_attributes"]) == ["heute"]
+
+    def test_host_shards_are_loaded_lazily(self, store: config.PackedConfigStore) -> None:
+        store.write({"ipaddresses": {HostName(f"host{n}"): f"10.0.0.{n}" for n in range(10)}})
+
+        ipaddresses = store.read()["ipaddresses"]
+        assert ipaddresses[HostName("host3")] == "10.0.0.3"
+        assert list(ipaddresses._shards._loaded) == ["host3"]
+
+    def test_read_without_shards(self, store: config.PackedConfigStore) -> None:
+        store.write({"ipaddresses": {HostName("heute"): "127.0.0.1"}})
+        store.shards_path.unlink()
+        assert "ipaddresses" not in store.read()
+
+
+class TestPluginIndexStore:
+    @pytest.fixture()
+    def store(self, config_path: VersionedConfigPath) -> config.PluginIndexStore:
+        return config.PluginIndexStore.from_serial(config_path)
+
+    def test_roundtrip(self, store: config.PluginIndexStore) -> None:
+        index = {HostName("heute"): config.NeededPlugins(("cpu", "uptime"), ("/x/checks/df",))}
+        store.write(index)
+        assert store.read() == index
+
+    def test_read_invalid_file(self, store: config.PluginIndexStore) -> None:
+        store.path.parent.mkdir(parents=True, exist_ok=True)
+        store.path.write_bytes(b"{}")
+        with pytest.raises(ValueError):
+            store.read()
+
+    def test_is_current(self, store: config.PluginIndexStore) -> None:
+        assert not store.is_current()
+        store.write({})
+        assert store.is_current()
+
+        # New services have been discovered since.
+        autochecks_dir = Path(cmk.utils.paths.autochecks_dir)
+        autochecks_dir.mkdir(parents=True, exist_ok=True)
+        mtime = store.path.stat().st_mtime + 1
+        os.utime(autochecks_dir, (mtime, mtime))
+        assert not store.is_current()
+
+
+class TestLoadAgentBasedPluginsOf:
+    @pytest.fixture(autouse=True)
+    def index(self, monkeypatch: MonkeyPatch, config_path: VersionedConfigPath) -> None:
+        store = config.PluginIndexStore.from_serial(config_path)
+        store.write({HostName("heute"): config.NeededPlugins(("uptime",), ())})
+        monkeypatch.setattr(config.PluginIndexStore, "from_serial", lambda _path: store)
+
+    def test_known_host(self, monkeypatch: MonkeyPatch) -> None:
+        loaded: List[str] = []
+
+        def load_selected_plugins(modules: List[str]) -> List[str]:
+            loaded.extend(modules)
+            return []
+
+        monkeypatch.setattr(agent_based_register, "load_selected_plugins", load_selected_plugins)
+        monkeypatch.setattr(config, "load_checks", lambda _context, _files: [])
+        monkeypatch.setattr(config, "_initialize_data_structures", lambda: None)
+
+        assert config.load_agent_based_plugins_of([HostName("heute")], lambda: {}) == []
+        assert loaded == ["uptime"]
+
+    def test_unknown_host(self) -> None:
+        cmk.utils.debug.disable()
+        assert config.load_agent_based_plugins_of([HostName("morgen")], lambda: {}) is None
+
 
 def test__extract_check_plugins(monkeypatch: MonkeyPatch) -> None:
     duplicate_plugin = {
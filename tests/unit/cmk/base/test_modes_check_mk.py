@@ -3,15 +3,21 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import io
+
 import pytest
 
 from tests.testlib.base import Scenario
 
+import cmk.utils.debug
+from cmk.utils.exceptions import MKGeneralException
 from cmk.utils.type_defs import result
 
 from cmk.core_helpers import PiggybackFetcher
 from cmk.core_helpers.cache import FileCacheGlobals
 
+import cmk.base.agent_based.checking.commandline as commandline
+import cmk.base.item_state as item_state
 import cmk.base.modes.check_mk as check_mk
 
 
@@ -53,3 +59,33 @@ class TestModeDumpAgent:
 
         check_mk.mode_dump_agent({}, hostname)
         assert capsys.readouterr().out == raw_data.decode()
+
+
+class TestModeCheckBatch:
+    @pytest.fixture(autouse=True)
+    def patch_checking(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        def commandline_checking(host_name, ipaddress, *, active_check_handler, **_kwargs):
+            if host_name == "unknown":
+                raise MKGeneralException("Unknown host")
+            active_check_handler(host_name, f"OK - {host_name}\ndetails\n")
+            return 0
+
+        monkeypatch.setattr(commandline, "commandline_checking", commandline_checking)
+        monkeypatch.setattr(cmk.utils.debug, "enabled", lambda: False)
+        monkeypatch.setattr(item_state, "g_suppress_on_wrap", item_state.g_suppress_on_wrap)
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_stdin(
+        self, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], workers: int
+    ) -> None:
+        monkeypatch.setattr("sys.stdin", io.StringIO("host1\n\n# comment\nunknown\nhost2\n"))
+
+        check_mk.mode_check_batch(
+            check_mk.get_submitter, {"no-submit": True, "workers": workers}, []
+        )
+
+        assert sorted(capsys.readouterr().out.splitlines()) == [
+            "host1\t0\tOK - host1\\ndetails",
+            "host2\t0\tOK - host2\\ndetails",
+            "unknown\t3\tUnknown host",
+        ]
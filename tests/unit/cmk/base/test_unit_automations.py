@@ -2,10 +2,14 @@
 # Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
+from pathlib import Path
 from typing import Dict
 
+import pytest
+
 from tests.testlib.base import Scenario
 
+import cmk.utils.paths
 import cmk.utils.version as cmk_version
 from cmk.utils.type_defs import Ruleset
 
@@ -106,3 +110,62 @@ def test_service_labels(monkeypatch):
             "CPU temp": {"label1": "val1"},
         }
     )
+
+
+def test_delete_hosts_removes_section_store_locks(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(automations, "var_dir", str(tmp_path))
+    locks = [
+        tmp_path / "persisted" / ".test-host.lock",
+        tmp_path / "persisted_sections" / "snmp" / ".test-host.lock",
+    ]
+    other_lock = tmp_path / "persisted_sections" / "snmp" / ".other-host.lock"
+    for path in (*locks, other_lock):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+    automations.AutomationDeleteHosts().execute(["test-host"])
+
+    assert not any(path.exists() for path in locks)
+    assert other_lock.exists()
+
+
+def test_rename_hosts_removes_section_store_locks(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(automations, "var_dir", str(tmp_path))
+    monkeypatch.setattr(automations.AutomationRenameHosts, "_omd_rename_host", lambda *_: [])
+    lock = tmp_path / "persisted_sections" / "snmp" / ".old-host.lock"
+    lock.parent.mkdir(parents=True)
+    lock.touch()
+
+    automations.AutomationRenameHosts()._rename_host_files("old-host", "new-host")
+
+    assert not lock.exists()
+
+
+@pytest.fixture(name="parse_result_caches")
+def fixture_parse_result_caches(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> list[Path]:
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path))
+    caches = [
+        tmp_path / "parsed_sections" / "host" / "test-host",
+        tmp_path / "parsed_sections" / "management" / "test-host",
+    ]
+    for path in caches:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    return caches
+
+
+def test_delete_hosts_removes_parse_result_caches(parse_result_caches: list[Path]) -> None:
+    automations.AutomationDeleteHosts().execute(["test-host"])
+    assert not any(path.exists() for path in parse_result_caches)
+
+
+def test_rename_hosts_removes_parse_result_caches(
+    monkeypatch: pytest.MonkeyPatch, parse_result_caches: list[Path]
+) -> None:
+    monkeypatch.setattr(automations.AutomationRenameHosts, "_omd_rename_host", lambda *_: [])
+    automations.AutomationRenameHosts()._rename_host_files("test-host", "new-host")
+    assert not any(path.exists() for path in parse_result_caches)
@@ -6,8 +6,11 @@
 import copy
 import json
 import logging
+from pathlib import Path
 from typing import Sequence
 
+import pytest
+
 from cmk.utils.type_defs import SectionName
 
 from cmk.core_helpers.cache import MaxAge, PersistedSections, SectionStore
@@ -59,6 +62,93 @@ class TestSectionStore:
             str,
         )
 
+    @pytest.fixture
+    def section_store(self, tmp_path: Path) -> SectionStore[AgentRawDataSection]:
+        return SectionStore[AgentRawDataSection](
+            tmp_path / "persisted", logger=logging.getLogger("test")
+        )
+
+    def test_store_load(self, section_store: SectionStore[AgentRawDataSection]) -> None:
+        sections = PersistedSections[AgentRawDataSection](
+            {SectionName("section"): (1000, 2000, [["a", "b"], ["c"]])}
+        )
+        section_store.store(sections)
+        assert section_store.path.read_bytes().startswith(b"CMKSEC01")
+        assert section_store.load() == sections
+
+    def test_load_legacy(self, section_store: SectionStore[AgentRawDataSection]) -> None:
+        section_store.path.write_text("{'section': (1000, 2000, [['a', 'b']])}\n")
+        assert section_store.load() == {  # type: ignore[comparison-overlap]
+            SectionName("section"): (1000, 2000, [["a", "b"]])
+        }
+
+    def test_load_missing(self, section_store: SectionStore[AgentRawDataSection]) -> None:
+        assert not section_store.load()
+
+    def test_update_keeps_unchanged_entries(
+        self,
+        section_store: SectionStore[AgentRawDataSection],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        content: Sequence[AgentRawDataSection] = [["a", "b"]]
+        section_store.update(
+            {SectionName("section"): content},
+            {},
+            lambda section_name: (1000, 2000),
+            now=1000,
+            keep_outdated=False,
+        )
+
+        stored = []
+        monkeypatch.setattr(section_store, "store", lambda sections: stored.append(dict(sections)))
+        section_store.update(
+            {SectionName("section"): content},
+            {},
+            lambda section_name: (1100, 2000),
+            now=1100,
+            keep_outdated=False,
+        )
+        assert not stored
+        assert section_store.load() == {  # type: ignore[comparison-overlap]
+            SectionName("section"): (1000, 2000, content)
+        }
+
+        section_store.update(
+            {SectionName("section"): [["new"]]},
+            {},
+            lambda section_name: (1200, 2000),
+            now=1200,
+            keep_outdated=False,
+        )
+        assert stored == [{SectionName("section"): (1200, 2000, [["new"]])}]
+
+    def test_update_uses_hidden_lock_file(
+        self, section_store: SectionStore[AgentRawDataSection]
+    ) -> None:
+        section_store.update(
+            {SectionName("section"): [["a", "b"]]},
+            {},
+            lambda section_name: (1000, 2000),
+            now=1000,
+            keep_outdated=False,
+        )
+        assert sorted(p.name for p in section_store.path.parent.iterdir()) == [
+            ".persisted.lock",
+            "persisted",
+        ]
+        assert SectionStore.lock_path_of(section_store.path).exists()
+
+    def test_update_removes_outdated_entries(
+        self, section_store: SectionStore[AgentRawDataSection]
+    ) -> None:
+        section_store.store(
+            PersistedSections[AgentRawDataSection](
+                {SectionName("section"): (1000, 2000, [["a", "b"]])}
+            )
+        )
+        section_store.update({}, {}, lambda section_name: None, now=3000, keep_outdated=False)
+        assert not section_store.path.exists()
+
 
 class TestMaxAge:
     def test_repr(self) -> None:
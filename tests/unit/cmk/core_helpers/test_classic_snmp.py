@@ -3,11 +3,15 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-from typing import NamedTuple, Optional
+import io
+import subprocess
+import threading
+import time
+from typing import Any, NamedTuple, Optional
 
 import pytest
 
-from cmk.utils.exceptions import MKGeneralException
+from cmk.utils.exceptions import MKGeneralException, MKSNMPError
 from cmk.utils.log import logger
 from cmk.utils.type_defs import HostName
 
@@ -335,3 +339,123 @@ def test_priv_proto(proto, result) -> None:  # type:ignore[no-untyped-def]
 def test_priv_proto_unknown(proto) -> None:  # type:ignore[no-untyped-def]
     with pytest.raises(MKGeneralException):
         classic_snmp._priv_proto_for(proto)
+
+
+class _FakePopen:
+    commands: list[list[str]] = []
+    snmpv1 = False
+    reachable = True
+
+    def __init__(self, command: list[str], **_kwargs: object) -> None:
+        self.commands.append(command)
+        oids = command[command.index("127.0.0.1") + 1 :]
+        missing = [oid for oid in oids if oid.endswith(".2")]
+        stdout = []
+        stderr = []
+        for oid in oids:
+            if oid not in missing:
+                stdout.append(f'{oid} = "value of {oid}"\n')
+            elif self.snmpv1:
+                # snmpget drops the failed OID and repeats the request
+                stderr.append(
+                    "Error in packet\nReason: (noSuchName) There is no such variable name"
+                    f" in this MIB.\nFailed object: {oid}\n\n"
+                )
+            else:
+                stdout.append(f"{oid} = No Such Object available on this agent at this OID\n")
+        if not self.reachable:
+            stdout = []
+            stderr = ["Timeout: No Response from 127.0.0.1.\n"]
+        self.stdout = io.StringIO("".join(stdout))
+        self.stderr = io.StringIO("".join(stderr))
+        self.returncode = 0 if not stderr else 2 if self.reachable else 1
+
+    def __enter__(self) -> "_FakePopen":
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        pass
+
+
+def _make_snmp_config(*, snmpv1: bool = False) -> SNMPHostConfig:
+    return SNMPHostConfig(
+        is_ipv6_primary=False,
+        hostname=HostName("localhost"),
+        ipaddress="127.0.0.1",
+        credentials="public",
+        port=161,
+        is_bulkwalk_host=False,
+        is_snmpv2or3_without_bulkwalk_host=not snmpv1,
+        bulk_walk_size_of=2,
+        timing={},
+        oid_range_limits={},
+        snmpv3_contexts=[],
+        character_encoding=None,
+        is_usewalk_host=False,
+        snmp_backend=SNMPBackendEnum.CLASSIC,
+    )
+
+
+@pytest.fixture(name="fake_popen")
+def fixture_fake_popen(monkeypatch: pytest.MonkeyPatch) -> type[_FakePopen]:
+    monkeypatch.setattr(_FakePopen, "commands", [])
+    monkeypatch.setattr(classic_snmp.subprocess, "Popen", _FakePopen)
+    return _FakePopen
+
+
+def test_get_many_chunks_by_bulk_size(fake_popen: type[_FakePopen]) -> None:
+    oids = [".1.3.6.1", ".1.3.6.2", ".1.3.6.3"]
+    assert ClassicSNMPBackend(_make_snmp_config(), logger).get_many(oids) == {
+        ".1.3.6.1": b"value of .1.3.6.1",
+        ".1.3.6.2": None,
+        ".1.3.6.3": b"value of .1.3.6.3",
+    }
+    assert [c[0] for c in fake_popen.commands] == ["snmpget", "snmpget"]
+    assert [c[-2:] for c in fake_popen.commands] == [oids[:2], ["127.0.0.1", oids[2]]]
+    assert "-Cf" not in fake_popen.commands[0]
+
+
+def test_get_many_snmpv1_missing_oid(
+    monkeypatch: pytest.MonkeyPatch, fake_popen: type[_FakePopen]
+) -> None:
+    monkeypatch.setattr(fake_popen, "snmpv1", True)
+    backend = ClassicSNMPBackend(_make_snmp_config(snmpv1=True), logger)
+    assert backend.get_many([".1.3.6.1", ".1.3.6.2", ".1.3.6.3.2"]) == {
+        ".1.3.6.1": b"value of .1.3.6.1",
+        ".1.3.6.2": None,
+        ".1.3.6.3.2": None,
+    }
+
+
+def test_get_many_error(monkeypatch: pytest.MonkeyPatch, fake_popen: type[_FakePopen]) -> None:
+    monkeypatch.setattr(fake_popen, "reachable", False)
+    with pytest.raises(MKSNMPError, match="Timeout"):
+        ClassicSNMPBackend(_make_snmp_config(), logger).get_many([".1.3.6.1"])
+
+
+def test_abort_walks(monkeypatch: pytest.MonkeyPatch) -> None:
+    popen = subprocess.Popen
+
+    def sleep(_command: list[str], **kwargs: Any) -> subprocess.Popen[str]:
+        return popen(["sleep", "10"], **kwargs)
+
+    monkeypatch.setattr(classic_snmp.subprocess, "Popen", sleep)
+    backend = ClassicSNMPBackend(_make_snmp_config(), logger)
+    errors = []
+
+    def walk() -> None:
+        try:
+            backend.walk(".1.3.6")
+        except MKSNMPError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=walk)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not backend._running_walks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    backend.abort_walks()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert len(errors) == 1
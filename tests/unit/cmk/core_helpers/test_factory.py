@@ -4,6 +4,8 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import logging
+import subprocess
+import sys
 
 import pytest
 
@@ -13,6 +15,7 @@ from cmk.snmplib.type_defs import SNMPBackendEnum, SNMPHostConfig
 
 import cmk.core_helpers.factory as factory
 from cmk.core_helpers.snmp_backend import ClassicSNMPBackend
+from cmk.core_helpers.snmp_backend.pysnmp_backend import PySNMPBackend
 
 try:
     from cmk.core_helpers.cee.snmp_backend.inline import InlineSNMPBackend  # type: ignore[import]
@@ -60,3 +63,20 @@ def test_factory_snmp_backend_unknown_backend(snmp_config: SNMPHostConfig) -> No
                 factory.backend(snmp_config, logging.getLogger()),
                 ClassicSNMPBackend,
             )
+
+
+def test_factory_snmp_backend_pysnmp(snmp_config: SNMPHostConfig) -> None:
+    snmp_config = snmp_config._replace(snmp_backend=SNMPBackendEnum.PYSNMP)
+    assert isinstance(factory.backend(snmp_config, logging.getLogger()), PySNMPBackend)
+
+
+def test_factory_does_not_import_pysnmp() -> None:
+    # Importing pysnmp is expensive, only the PySNMP backend may pull it in.
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, cmk.core_helpers.factory; assert 'pysnmp' not in sys.modules",
+        ],
+        check=True,
+    )
@@ -6,16 +6,24 @@
 import json
 import os
 import socket
+import ssl
+import threading
+from collections.abc import Iterator
 from itertools import product as cartesian_product
 from pathlib import Path
 from typing import Any, List, NamedTuple, Optional, Sequence, Union
+from uuid import UUID
 from zlib import compress
 
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
+from Cryptodome.Cipher import AES
 from pyghmi.exceptions import IpmiException  # type: ignore[import]
 
+import cmk.utils.encryption as encryption
 import cmk.utils.version as cmk_version
+from cmk.utils.agent_registration import UUIDLinkManager
+from cmk.utils.certs import RootCA
 from cmk.utils.encryption import TransportProtocol
 from cmk.utils.exceptions import MKFetcherError, OnError
 from cmk.utils.type_defs import AgentRawData, HostAddress, HostName, result, SectionName
@@ -31,9 +39,9 @@ from cmk.snmplib.type_defs import (
     SNMPTable,
 )
 
-from cmk.core_helpers import get_raw_data, snmp
+from cmk.core_helpers import get_raw_data, snmp, tcp
 from cmk.core_helpers.agent import AgentFileCache
-from cmk.core_helpers.cache import FileCache, FileCacheMode, MaxAge, TRawData
+from cmk.core_helpers.cache import FileCache, FileCacheMode, MaxAge, read_cache_file, TRawData
 from cmk.core_helpers.ipmi import IPMIFetcher
 from cmk.core_helpers.piggyback import PiggybackFetcher
 from cmk.core_helpers.program import ProgramFetcher
@@ -44,7 +52,7 @@ from cmk.core_helpers.snmp import (
     SNMPPluginStore,
     SNMPPluginStoreItem,
 )
-from cmk.core_helpers.tcp import TCPFetcher
+from cmk.core_helpers.tcp import fetch_concurrently, TCPFetcher
 from cmk.core_helpers.tcp_agent_ctl import CompressionType, HeaderV1, Version
 from cmk.core_helpers.type_defs import Mode
 
@@ -165,6 +173,34 @@ class TestAgentFileCache_and_SNMPFileCache:
         assert path.exists()
         assert file_cache.read(mode) is None
 
+    def test_read_write_compressed(  # type:ignore[no-untyped-def]
+        self, file_cache, path, raw_data
+    ) -> None:
+        mode = Mode.DISCOVERY
+        file_cache.file_cache_mode = FileCacheMode.READ_WRITE | FileCacheMode.COMPRESSED
+
+        file_cache.write(raw_data, mode)
+
+        assert path.read_bytes().startswith(b"\x1f\x8b")
+        assert read_cache_file(path) == file_cache._to_cache_file(raw_data)
+        assert file_cache.read(mode) == raw_data
+
+        # Compressed files are read without the flag, too.
+        clone = clone_file_cache(file_cache)
+        clone.file_cache_mode = FileCacheMode.READ
+        assert clone.read(mode) == raw_data
+
+    def test_read_truncated(  # type:ignore[no-untyped-def]
+        self, file_cache, path, raw_data
+    ) -> None:
+        mode = Mode.DISCOVERY
+        file_cache.file_cache_mode = FileCacheMode.READ_WRITE | FileCacheMode.COMPRESSED
+
+        file_cache.write(raw_data, mode)
+        path.write_bytes(path.read_bytes()[:-4])
+
+        assert file_cache.read(mode) is None
+
 
 class StubFileCache(FileCache[TRawData]):
     """Holds the data to be cached in-memory for testing"""
@@ -298,6 +334,7 @@ class TestProgramFetcher:
             cmdline="/bin/true",
             stdin=None,
             is_cmc=False,
+            use_forkserver=True,
         )
 
     def test_repr(self, fetcher: ProgramFetcher) -> None:
@@ -309,6 +346,7 @@ class TestProgramFetcher:
         assert other.cmdline == fetcher.cmdline
         assert other.stdin == fetcher.stdin
         assert other.is_cmc == fetcher.is_cmc
+        assert other.use_forkserver == fetcher.use_forkserver
 
 
 class TestSNMPPluginStore:
@@ -444,6 +482,14 @@ class TestSNMPFetcherDeserialization:
         assert other.missing_sys_description == fetcher.missing_sys_description
         assert other.snmp_config == fetcher.snmp_config
         assert other.snmp_config.snmp_backend == SNMPBackendEnum.CLASSIC
+        assert other.max_parallel_walks == fetcher.max_parallel_walks
+
+    def test_fetcher_deserialization_without_max_parallel_walks(self, fetcher: SNMPFetcher) -> None:
+        serialized = {
+            k: v for k, v in json_identity(fetcher.to_json()).items() if k != "max_parallel_walks"
+        }
+        other = type(fetcher).from_json(serialized)
+        assert other.max_parallel_walks == 1
 
     def test_fetcher_deserialization_snmpv3_credentials(self, fetcher: SNMPFetcher) -> None:
         # snmp_config is Final, but for testing...
@@ -635,6 +681,57 @@ class TestSNMPFetcherFetch:
             {SectionName("pam"): [[]]}
         )
 
+    @pytest.mark.parametrize("supports_concurrent_walks", [True, False])
+    def test_fetch_from_io_parallel_walks(
+        self, fetcher: SNMPFetcher, monkeypatch: MonkeyPatch, supports_concurrent_walks: bool
+    ) -> None:
+        section_names = [SectionName("pam"), SectionName("pum")]
+        monkeypatch.setattr(fetcher, "max_parallel_walks", 4)
+        monkeypatch.setattr(
+            fetcher._backend, "supports_concurrent_walks", supports_concurrent_walks
+        )
+        monkeypatch.setattr(
+            fetcher,
+            "sections",
+            {
+                section_name: SectionMeta(
+                    checking=True,
+                    disabled=False,
+                    redetect=False,
+                    fetch_interval=None,
+                )
+                for section_name in section_names
+            },
+        )
+        prefetched = []
+        monkeypatch.setattr(
+            snmp_table,
+            "prefetch_snmpwalks",
+            lambda *, trees, executor, **__: prefetched.append((trees, executor)),
+        )
+        monkeypatch.setattr(snmp_table, "get_snmp_table", lambda *_, **__: [])
+        file_cache = SNMPFileCache(
+            HostName("hostname"),
+            path_template=os.devnull,
+            max_age=MaxAge.none(),
+            use_outdated=True,
+            simulation=False,
+            use_only_cache=False,
+            file_cache_mode=FileCacheMode.DISABLED,
+        )
+        assert get_raw_data(file_cache, fetcher, Mode.CHECKING) == result.OK(
+            {SectionName("pam"): [[]], SectionName("pum"): [[], []]}
+        )
+        if not supports_concurrent_walks:
+            assert not prefetched
+            return
+
+        assert [trees for trees, _executor in prefetched] == [
+            fetcher.plugin_store[section_name].trees for section_name in section_names
+        ]
+        # All sections share the walks of one executor.
+        assert len({id(executor) for _trees, executor in prefetched}) == 1
+
     @pytest.fixture(name="set_sections")
     def _set_sections(self, monkeypatch: MonkeyPatch) -> List[List[str]]:
         table = [["1"]]
@@ -801,6 +898,18 @@ class TestSNMPSectionMeta:
         assert SectionMeta.deserialize(meta.serialize()) == meta
 
 
+def _encrypt_pbkdf2(password: str, data: bytes) -> bytes:
+    # Like `openssl enc -aes-256-cbc -md sha256 -pbkdf2 -iter 10000` on the agent.
+    salt = b"saltsalt"
+    key, iv = encryption._derive_pbkdf2_key_and_iv(password, salt)
+    fill = AES.block_size - len(data) % AES.block_size
+    return (
+        encryption.OPENSSL_SALTED_MARKER.encode()
+        + salt
+        + AES.new(key, AES.MODE_CBC, iv).encrypt(data + bytes([fill]) * fill)
+    )
+
+
 class _MockSock:
     def __init__(self, data: bytes) -> None:
         self.data = data
@@ -811,6 +920,11 @@ class _MockSock:
         self._used += len(use)
         return use
 
+    def recv_into(self, buffer: memoryview, count: int = 0, *_flags: int) -> int:
+        use = self.recv(min(count or len(buffer), 1000))
+        buffer[: len(use)] = use
+        return len(use)
+
     def __enter__(self, *_args) -> "_MockSock":  # type:ignore[no-untyped-def]
         return self
 
@@ -917,7 +1031,9 @@ class TestTCPFetcher:
             timeout=0.0,
             encryption_settings=settings,
         )
-        assert fetcher._decrypt(TransportProtocol(output[:2]), AgentRawData(output[2:])) == output
+        agent_output = fetcher._agent_output(TransportProtocol(output[:2]))
+        agent_output.feed(output[2:])
+        assert agent_output.result() == output
 
     def test_validate_protocol_plaintext_with_enforce_raises(self) -> None:
         settings = {"use_regular": "enforce"}
@@ -1003,9 +1119,7 @@ class TestTCPFetcher:
         mock_sock = _MockSock(b"<<<section:sep(0)>>>\nbody\n")
         monkeypatch.setattr(fetcher, "_opt_socket", mock_sock)
 
-        agent_data, protocol = fetcher._get_agent_data()
-        assert agent_data == mock_sock.data[2:]
-        assert protocol == TransportProtocol.PLAIN
+        assert fetcher._get_agent_data() == mock_sock.data
 
     def test_get_agent_data_with_tls(self, monkeypatch: MonkeyPatch, fetcher: TCPFetcher) -> None:
         mock_data = b"<<<section:sep(0)>>>\nbody\n"
@@ -1020,9 +1134,77 @@ class TestTCPFetcher:
         monkeypatch.setattr(fetcher, "_opt_socket", mock_sock)
         monkeypatch.setattr(fetcher, "_wrap_tls", lambda _uuid: mock_sock)
 
-        agent_data, protocol = fetcher._get_agent_data()
-        assert agent_data == mock_data[2:]
-        assert protocol == TransportProtocol.PLAIN
+        assert fetcher._get_agent_data() == mock_data
+
+    def test_get_agent_data_encrypted(self, monkeypatch: MonkeyPatch) -> None:
+        mock_data = b"<<<section:sep(0)>>>\nbody\n" * 10000
+        mock_sock = _MockSock(b"03%b" % _encrypt_pbkdf2("secret", mock_data))
+        fetcher = TCPFetcher(
+            family=socket.AF_INET,
+            address=("1.2.3.4", 6556),
+            host_name=HostName("irrelevant_for_this_test"),
+            timeout=0.1,
+            encryption_settings={"use_regular": "allow", "passphrase": "secret"},
+        )
+        monkeypatch.setattr(fetcher, "_opt_socket", mock_sock)
+
+        assert fetcher._get_agent_data() == mock_data
+
+    def test_get_agent_data_encrypted_truncated(self, monkeypatch: MonkeyPatch) -> None:
+        mock_sock = _MockSock(b"03%b" % _encrypt_pbkdf2("secret", b"<<<section>>>\n")[:-1])
+        fetcher = TCPFetcher(
+            family=socket.AF_INET,
+            address=("1.2.3.4", 6556),
+            host_name=HostName("irrelevant_for_this_test"),
+            timeout=0.1,
+            encryption_settings={"use_regular": "allow", "passphrase": "secret"},
+        )
+        monkeypatch.setattr(fetcher, "_opt_socket", mock_sock)
+
+        with pytest.raises(MKFetcherError, match="Failed to decrypt"):
+            fetcher._get_agent_data()
+
+    def test_get_agent_data_with_tls_uncompressed(
+        self, monkeypatch: MonkeyPatch, fetcher: TCPFetcher
+    ) -> None:
+        mock_data = b"<<<section:sep(0)>>>\nbody\n" * 10000
+        mock_sock = _MockSock(
+            b"16%b%b%b"
+            % (bytes(Version.V1), bytes(HeaderV1(CompressionType.UNCOMPRESSED)), mock_data)
+        )
+        monkeypatch.setattr(fetcher, "_opt_socket", mock_sock)
+        monkeypatch.setattr(fetcher, "_wrap_tls", lambda _uuid: mock_sock)
+
+        assert fetcher._get_agent_data() == mock_data
+
+    def test_get_agent_data_with_tls_truncated(
+        self, monkeypatch: MonkeyPatch, fetcher: TCPFetcher
+    ) -> None:
+        mock_sock = _MockSock(
+            b"16%b%b%b"
+            % (
+                bytes(Version.V1),
+                bytes(HeaderV1(CompressionType.ZLIB)),
+                compress(b"<<<section:sep(0)>>>\nbody\n")[:-1],
+            )
+        )
+        monkeypatch.setattr(fetcher, "_opt_socket", mock_sock)
+        monkeypatch.setattr(fetcher, "_wrap_tls", lambda _uuid: mock_sock)
+
+        with pytest.raises(MKFetcherError, match="Failed to deserialize"):
+            fetcher._get_agent_data()
+
+    def test_get_agent_data_with_tls_empty_payload(
+        self, monkeypatch: MonkeyPatch, fetcher: TCPFetcher
+    ) -> None:
+        mock_sock = _MockSock(
+            b"16%b%b%b" % (bytes(Version.V1), bytes(HeaderV1(CompressionType.ZLIB)), compress(b""))
+        )
+        monkeypatch.setattr(fetcher, "_opt_socket", mock_sock)
+        monkeypatch.setattr(fetcher, "_wrap_tls", lambda _uuid: mock_sock)
+
+        with pytest.raises(MKFetcherError, match="Empty payload"):
+            fetcher._get_agent_data()
 
     def test_detect_transport_protocol(self, fetcher: TCPFetcher) -> None:
         assert fetcher._detect_transport_protocol(b"02", "Unused") == TransportProtocol.SHA256
@@ -1036,6 +1218,178 @@ class TestTCPFetcher:
             fetcher._detect_transport_protocol(b"", "Passed error message")
 
 
+class _AgentServer:
+    """Serve canned agent output on localhost, one connection at a time per thread."""
+
+    def __init__(
+        self, output: bytes, *, hang: bool = False, tls_context: ssl.SSLContext | None = None
+    ) -> None:
+        self.output = output
+        self.hang = hang
+        self.tls_context = tls_context
+        self.max_clients = 0
+        self._clients = 0
+        self._lock = threading.Lock()
+        self._release = threading.Event()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(64)
+        self.port: int = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def __enter__(self) -> "_AgentServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        self._release.set()
+        self._sock.close()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _addr = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn: socket.socket) -> None:
+        with self._lock:
+            self._clients += 1
+            self.max_clients = max(self.max_clients, self._clients)
+        try:
+            with conn:
+                if self.hang:
+                    self._release.wait(5)
+                    return
+                # Give the other clients a chance to connect.
+                self._release.wait(0.05)
+                if self.tls_context is None:
+                    conn.sendall(self.output)
+                    return
+                conn.sendall(b"16")
+                with self.tls_context.wrap_socket(conn, server_side=True) as tls_conn:
+                    tls_conn.sendall(self.output)
+                    tls_conn.unwrap()
+        finally:
+            with self._lock:
+                self._clients -= 1
+
+
+class TestFetchConcurrently:
+    @pytest.fixture
+    def agent_output(self) -> bytes:
+        return b"<<<check_mk>>>\nVersion: 2.2.0\n<<<uptime>>>\n1234.5 6789.0\n"
+
+    @pytest.fixture
+    def server(self, agent_output: bytes) -> Iterator[_AgentServer]:
+        with _AgentServer(agent_output) as server:
+            yield server
+
+    @staticmethod
+    def _make_fetcher(port: int, idx: int = 0) -> TCPFetcher:
+        return TCPFetcher(
+            family=socket.AF_INET,
+            address=(HostAddress("127.0.0.1"), port),
+            host_name=HostName(f"host{idx}"),
+            timeout=1.0,
+            encryption_settings={"use_regular": "allow"},
+        )
+
+    def test_plaintext(self, server: _AgentServer, agent_output: bytes) -> None:
+        fetchers = [self._make_fetcher(server.port, idx) for idx in range(10)]
+        assert fetch_concurrently(fetchers, Mode.CHECKING, max_concurrency=10) == [
+            result.OK(agent_output)
+        ] * len(fetchers)
+
+    def test_encrypted(self, agent_output: bytes) -> None:
+        with _AgentServer(b"03%b" % _encrypt_pbkdf2("secret", agent_output * 10000)) as server:
+            fetcher = TCPFetcher(
+                family=socket.AF_INET,
+                address=(HostAddress("127.0.0.1"), server.port),
+                host_name=HostName("host"),
+                timeout=1.0,
+                encryption_settings={"use_regular": "allow", "passphrase": "secret"},
+            )
+            with fetcher:
+                expected = fetcher.fetch(Mode.CHECKING)
+            assert expected == result.OK(agent_output * 10000)
+            assert fetch_concurrently([fetcher], Mode.CHECKING, max_concurrency=1) == [expected]
+
+    def test_tls(self, tmp_path: Path, monkeypatch: MonkeyPatch, agent_output: bytes) -> None:
+        controller_uuid = UUID("1c9f0e0e-6c2f-4f3c-9d0b-6a1d9bd0b8ba")
+        ca = RootCA.load_or_create(tmp_path / "ca.pem", "Site 'unit' local CA")
+        ca.save_new_signed_cert(tmp_path / "site.pem", "unit")
+        ca.save_new_signed_cert(tmp_path / "agent.pem", str(controller_uuid))
+        monkeypatch.setattr(tcp.paths, "root_cert_file", tmp_path / "ca.pem")
+        monkeypatch.setattr(tcp.paths, "site_cert_file", tmp_path / "site.pem")
+
+        uuid_link_manager = UUIDLinkManager(
+            received_outputs_dir=tmp_path / "received_outputs",
+            data_source_dir=tmp_path / "data_source_cache",
+        )
+        uuid_link_manager.create_link(HostName("host0"), controller_uuid, create_target_dir=False)
+        monkeypatch.setattr(tcp, "get_uuid_link_manager", lambda: uuid_link_manager)
+
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(tmp_path / "agent.pem")
+        with _AgentServer(
+            b"%b%b%b"
+            % (bytes(Version.V1), bytes(HeaderV1(CompressionType.ZLIB)), compress(agent_output)),
+            tls_context=server_context,
+        ) as server:
+            assert fetch_concurrently(
+                [self._make_fetcher(server.port)], Mode.CHECKING, max_concurrency=1
+            ) == [result.OK(agent_output)]
+
+    def test_same_result_as_sync_fetch(self, server: _AgentServer) -> None:
+        fetcher = self._make_fetcher(server.port)
+        with fetcher:
+            expected = fetcher.fetch(Mode.CHECKING)
+        assert fetch_concurrently([fetcher], Mode.CHECKING, max_concurrency=1) == [expected]
+
+    def test_concurrency_is_bounded(self, server: _AgentServer) -> None:
+        fetchers = [self._make_fetcher(server.port, idx) for idx in range(12)]
+        results = fetch_concurrently(fetchers, Mode.CHECKING, max_concurrency=3)
+        assert all(r.is_ok() for r in results)
+        assert 1 <= server.max_clients <= 3
+
+    def test_refuses_non_checking_mode(self, server: _AgentServer) -> None:
+        for mode in Mode:
+            if mode is Mode.CHECKING:
+                continue
+            (res,) = fetch_concurrently([self._make_fetcher(server.port)], mode, max_concurrency=1)
+            assert isinstance(res.error, MKFetcherError)
+
+    def test_per_host_timeout(self, agent_output: bytes) -> None:
+        with _AgentServer(agent_output, hang=True) as server:
+            (res,) = fetch_concurrently(
+                [self._make_fetcher(server.port)], Mode.CHECKING, max_concurrency=1, timeout=0.1
+            )
+        assert isinstance(res.error, MKFetcherError)
+        assert "timeout" in str(res.error)
+
+    def test_errors_do_not_affect_other_hosts(
+        self, server: _AgentServer, agent_output: bytes
+    ) -> None:
+        broken = TCPFetcher(
+            family=socket.AF_INET,
+            address=(HostAddress("0.0.0.0"), server.port),
+            host_name=HostName("broken"),
+            timeout=1.0,
+            encryption_settings={"use_regular": "allow"},
+        )
+        results = fetch_concurrently(
+            [broken, self._make_fetcher(server.port)], Mode.CHECKING, max_concurrency=2
+        )
+        assert results[0].is_error()
+        assert results[1] == result.OK(agent_output)
+
+    def test_invalid_concurrency(self) -> None:
+        with pytest.raises(ValueError):
+            fetch_concurrently([], Mode.CHECKING, max_concurrency=0)
+
+
 class TestFetcherCaching:
     @pytest.fixture
     def fetcher(self, monkeypatch: MonkeyPatch) -> TCPFetcher:
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import json
+import os
+import signal
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from cmk.core_helpers._forkserver import ForkServer, special_agent_argv
+
+_WRAPPER = """#!/usr/bin/env python3
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+
+import sys
+
+from cmk.special_agents.agent_foo import main
+
+if __name__ == "__main__":
+    sys.exit(main())
+"""
+
+
+@pytest.fixture(name="server")
+def fixture_server() -> Iterator[ForkServer]:
+    server = ForkServer()
+    yield server
+    server.stop()
+
+
+class TestSpecialAgentArgv:
+    @pytest.fixture
+    def agent(self, tmp_path: Path) -> Path:
+        path = tmp_path / "agent_foo"
+        path.write_text(_WRAPPER)
+        return path
+
+    def test_wrapper(self, agent: Path) -> None:
+        assert special_agent_argv(f"{agent} --arg 'quoted value' host") == (
+            "cmk.special_agents.agent_foo",
+            [str(agent), "--arg", "quoted value", "host"],
+        )
+
+    @pytest.mark.parametrize("args", ["| grep x", "$HOME", "'unbalanced", "> out", "a;b"])
+    def test_needs_shell(self, agent: Path, args: str) -> None:
+        assert special_agent_argv(f"{agent} {args}") is None
+
+    def test_no_wrapper(self, agent: Path) -> None:
+        agent.write_text(_WRAPPER + "print('something else')\n")
+        assert special_agent_argv(str(agent)) is None
+
+    def test_missing(self, tmp_path: Path) -> None:
+        assert special_agent_argv(str(tmp_path / "agent_missing")) is None
+
+
+class TestForkServer:
+    def test_run(self, server: ForkServer) -> None:
+        process = server.spawn("json.tool", ["json.tool", "--compact"], with_stdin=True)
+        stdout, stderr = process.communicate(b'{"a": [1, 2]}')
+        assert (stdout, stderr, process.returncode) == (b'{"a":[1,2]}\n', b"", 0)
+
+    def test_large_input_and_output(self, server: ForkServer) -> None:
+        data = {f"key{n}": n for n in range(100000)}
+        process = server.spawn("json.tool", ["json.tool", "--compact"], with_stdin=True)
+        stdout, _stderr = process.communicate(json.dumps(data).encode())
+        assert json.loads(stdout) == data
+
+    def test_exit_code(self, server: ForkServer) -> None:
+        process = server.spawn("json.tool", ["json.tool"], with_stdin=True)
+        stdout, stderr = process.communicate(b"no json")
+        assert process.returncode == 1
+        assert not stdout
+        assert b"Expecting value" in stderr
+
+    def test_kill(self, server: ForkServer) -> None:
+        # Waits for its input forever.
+        process = server.spawn("json.tool", ["json.tool"], with_stdin=True)
+        os.killpg(process.pid, signal.SIGTERM)
+        assert process.wait() == -signal.SIGTERM
+
+    def test_server_is_reused(self, server: ForkServer) -> None:
+        pids = set()
+        for _n in range(3):
+            process = server.spawn("json.tool", ["json.tool"], with_stdin=False)
+            process.communicate()
+            pids.add(process.pid)
+        assert len(pids) == 3
+
+    def test_import_error(self, server: ForkServer) -> None:
+        with pytest.raises(OSError):
+            server.spawn("cmk.special_agents.agent_does_not_exist", ["x"], with_stdin=False)
+        # The server is still usable.
+        process = server.spawn("json.tool", ["json.tool"], with_stdin=True)
+        assert process.communicate(b"1")[0] == b"1\n"
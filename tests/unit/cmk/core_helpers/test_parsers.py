@@ -533,6 +533,49 @@ class TestAgentParser:
             }
         )
 
+    def test_section_filtering_skips_deselected_content(  # type:ignore[no-untyped-def]
+        self, parser
+    ) -> None:
+        raw_data = AgentRawData(
+            b"\n".join(
+                (
+                    b"<<<deselected>>>",
+                    b"1st line",
+                    b"<<<not a marker",
+                    b"<<<selected>>>",
+                    b"2nd line",
+                    b"<<<not a marker",
+                    b"<<<<piggyback_header>>>>",
+                    b"<<<deselected>>>",
+                    b"3rd line",
+                    b"<<<selected>>>",
+                    b"4th line",
+                    b"<<<<>>>>",
+                    b"<<<deselected>>>",
+                    b"5th line",
+                )
+            )
+        )
+
+        sections, piggyback_sections = parser._parse_host_section(
+            raw_data, {SectionName("selected")}
+        )
+
+        assert [(header.name, content) for header, content in sections] == [
+            (SectionName("deselected"), [b"<<<not a marker"]),
+            (SectionName("selected"), [b"2nd line", b"<<<not a marker"]),
+            (SectionName("deselected"), []),
+        ]
+        assert {
+            host: [(header.name, content) for header, content in host_sections]
+            for host, host_sections in piggyback_sections.items()
+        } == {
+            PiggybackMarker(HostName("piggyback_header")): [
+                (SectionName("deselected"), []),
+                (SectionName("selected"), [b"4th line"]),
+            ],
+        }
+
     def test_section_filtering_and_merging_piggyback(  # type:ignore[no-untyped-def]
         self, parser, store, monkeypatch
     ) -> None:
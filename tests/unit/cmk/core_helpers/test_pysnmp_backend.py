@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import threading
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+import pysnmp.hlapi as hlapi  # type: ignore[import]
+import pytest
+from pysnmp.proto import rfc1902, rfc1905  # type: ignore[import]
+
+from cmk.utils.exceptions import MKGeneralException, MKSNMPError
+from cmk.utils.log import logger
+from cmk.utils.type_defs import HostName
+
+from cmk.snmplib.type_defs import SNMPBackendEnum, SNMPCredentials, SNMPHostConfig
+
+import cmk.core_helpers.snmp_backend.pysnmp_backend as pysnmp_backend
+from cmk.core_helpers.snmp_backend.pysnmp_backend import PySNMPBackend
+
+
+def _make_config(
+    credentials: SNMPCredentials = "public",
+    *,
+    is_bulkwalk_host: bool = False,
+    is_snmpv2or3_without_bulkwalk_host: bool = True,
+) -> SNMPHostConfig:
+    return SNMPHostConfig(
+        is_ipv6_primary=False,
+        hostname=HostName("localhost"),
+        ipaddress="127.0.0.1",
+        credentials=credentials,
+        port=161,
+        is_bulkwalk_host=is_bulkwalk_host,
+        is_snmpv2or3_without_bulkwalk_host=is_snmpv2or3_without_bulkwalk_host,
+        bulk_walk_size_of=2,
+        timing={"timeout": 2, "retries": 1},
+        oid_range_limits={},
+        snmpv3_contexts=[],
+        character_encoding=None,
+        is_usewalk_host=False,
+        snmp_backend=SNMPBackendEnum.PYSNMP,
+    )
+
+
+_AGENT = {
+    "1.3.6.1.2.1.1.1.0": rfc1902.OctetString(b"Linux \xe4"),
+    "1.3.6.1.2.1.1.2.0": rfc1902.ObjectIdentifier("1.3.6.1.4.1.8072.3.2.10"),
+    "1.3.6.1.2.1.1.3.0": rfc1902.TimeTicks(1234),
+    "1.3.6.1.2.1.4.20.1.1.10.0.0.1": rfc1902.IpAddress("10.0.0.1"),
+    "1.3.6.1.2.1.4.20.1.1.127.0.0.1": rfc1902.IpAddress("127.0.0.1"),
+}
+
+
+class _FakeCommands:
+    """Answer the hlapi commands from `_AGENT`"""
+
+    def __init__(self) -> None:
+        self.requests: list[tuple[str, Sequence[str]]] = []
+        self.engines: set[int] = set()
+        self.snmpv1 = False
+
+    def _oids(self, var_binds: Sequence[Any]) -> Sequence[str]:
+        # The ObjectTypes are only resolved within the SNMP engine.
+        # pylint: disable=protected-access
+        return [str(vb._ObjectType__args[0]._ObjectIdentity__args[0]) for vb in var_binds]
+
+    def get(self, engine: Any, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        self.engines.add(id(engine))
+        oids = self._oids(args[3:])
+        self.requests.append(("get", oids))
+        if self.snmpv1 and (missing := [oid for oid in oids if oid not in _AGENT]):
+            yield None, rfc1902.Integer(2), oids.index(missing[0]) + 1, []
+            return
+        yield None, 0, 0, [
+            (rfc1902.ObjectName(oid), _AGENT.get(oid, rfc1905.noSuchObject)) for oid in oids
+        ]
+
+    def _walk(self, name: str, engine: Any, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        self.engines.add(id(engine))
+        oids = self._oids([a for a in args[3:] if isinstance(a, hlapi.ObjectType)])
+        self.requests.append((name, oids))
+        (prefix,) = oids
+        for oid, value in sorted(_AGENT.items()):
+            if kwargs.get("lexicographicMode", True) or oid.startswith(prefix + "."):
+                if oid > prefix:
+                    yield None, 0, 0, [(rfc1902.ObjectName(oid), value)]
+
+    def next(self, engine: Any, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        return self._walk("next", engine, *args, **kwargs)
+
+    def bulk(self, engine: Any, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        return self._walk("bulk", engine, *args, **kwargs)
+
+
+@pytest.fixture(name="commands")
+def fixture_commands(monkeypatch: pytest.MonkeyPatch) -> _FakeCommands:
+    commands = _FakeCommands()
+    monkeypatch.setattr(pysnmp_backend.hlapi, "getCmd", commands.get)
+    monkeypatch.setattr(pysnmp_backend.hlapi, "nextCmd", commands.next)
+    monkeypatch.setattr(pysnmp_backend.hlapi, "bulkCmd", commands.bulk)
+    monkeypatch.setattr(pysnmp_backend, "_snmp_engines", pysnmp_backend._SNMPEngines())
+    return commands
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (rfc1902.OctetString(b"\x00\xff"), b"\x00\xff"),
+        (rfc1902.IpAddress("1.2.3.4"), b"1.2.3.4"),
+        (rfc1902.ObjectIdentifier("1.3.6"), b".1.3.6"),
+        (rfc1902.Integer(-5), b"-5"),
+        (rfc1902.Counter64(2**40), b"1099511627776"),
+        (rfc1902.TimeTicks(42), b"42"),
+        (rfc1905.noSuchObject, None),
+        (rfc1905.noSuchInstance, None),
+        (rfc1905.endOfMibView, None),
+    ],
+)
+def test_to_raw_value(value: object, expected: bytes | None) -> None:
+    assert pysnmp_backend._to_raw_value(value) == expected
+
+
+def test_get(commands: _FakeCommands) -> None:
+    backend = PySNMPBackend(_make_config(), logger)
+    assert backend.get(".1.3.6.1.2.1.1.1.0") == b"Linux \xe4"
+    assert backend.get(".1.3.6.1.2.1.1.9.0") is None
+
+
+def test_getnext(commands: _FakeCommands) -> None:
+    backend = PySNMPBackend(_make_config(), logger)
+    assert backend.get(".1.3.6.1.2.1.1.2.*") == b".1.3.6.1.4.1.8072.3.2.10"
+    assert backend.get(".1.3.6.1.2.1.1.3.0.*") is None
+
+
+def test_get_many_chunks_by_bulk_size(commands: _FakeCommands) -> None:
+    backend = PySNMPBackend(_make_config(), logger)
+    assert backend.get_many(
+        [".1.3.6.1.2.1.1.1.0", ".1.3.6.1.2.1.1.2.0", ".1.3.6.1.2.1.1.3.0", ".1.3.6.1.2.1.1.9.0"]
+    ) == {
+        ".1.3.6.1.2.1.1.1.0": b"Linux \xe4",
+        ".1.3.6.1.2.1.1.2.0": b".1.3.6.1.4.1.8072.3.2.10",
+        ".1.3.6.1.2.1.1.3.0": b"1234",
+        ".1.3.6.1.2.1.1.9.0": None,
+    }
+    assert [len(oids) for _name, oids in commands.requests] == [2, 2]
+
+
+def test_get_many_snmpv1_missing_oid(commands: _FakeCommands) -> None:
+    commands.snmpv1 = True
+    backend = PySNMPBackend(_make_config(is_snmpv2or3_without_bulkwalk_host=False), logger)
+    assert backend.get_many([".1.3.6.1.2.1.1.1.0", ".1.3.6.1.2.1.1.9.0"]) == {
+        ".1.3.6.1.2.1.1.1.0": b"Linux \xe4",
+        ".1.3.6.1.2.1.1.9.0": None,
+    }
+    assert [len(oids) for _name, oids in commands.requests] == [2, 1, 1]
+
+
+def test_get_many_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    def timeout(*_args: object, **_kwargs: object) -> Iterator[Any]:
+        yield "No SNMP response received before timeout", 0, 0, []
+
+    monkeypatch.setattr(pysnmp_backend.hlapi, "getCmd", timeout)
+    backend = PySNMPBackend(_make_config(), logger)
+    with pytest.raises(MKSNMPError, match="timeout"):
+        backend.get_many([".1.3.6.1.2.1.1.1.0"])
+    assert backend.get(".1.3.6.1.2.1.1.1.0") is None
+
+
+@pytest.mark.parametrize("is_bulkwalk_host, command", [(True, "bulk"), (False, "next")])
+def test_walk(commands: _FakeCommands, is_bulkwalk_host: bool, command: str) -> None:
+    backend = PySNMPBackend(_make_config(is_bulkwalk_host=is_bulkwalk_host), logger)
+    assert backend.walk(".1.3.6.1.2.1.4.20.1.1") == [
+        (".1.3.6.1.2.1.4.20.1.1.10.0.0.1", b"10.0.0.1"),
+        (".1.3.6.1.2.1.4.20.1.1.127.0.0.1", b"127.0.0.1"),
+    ]
+    assert commands.requests == [(command, ["1.3.6.1.2.1.4.20.1.1"])]
+
+
+def test_walk_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    def timeout(*_args: object, **_kwargs: object) -> Iterator[Any]:
+        yield "No SNMP response received before timeout", 0, 0, []
+
+    monkeypatch.setattr(pysnmp_backend.hlapi, "nextCmd", timeout)
+    with pytest.raises(MKSNMPError, match="timeout"):
+        PySNMPBackend(_make_config(), logger).walk(".1.3.6")
+
+
+def test_session_is_reused(commands: _FakeCommands) -> None:
+    for _ in range(2):
+        backend = PySNMPBackend(_make_config(), logger)
+        backend.get(".1.3.6.1.2.1.1.1.0")
+        backend.walk(".1.3.6.1.2.1.4.20.1.1")
+    assert len(commands.engines) == 1
+
+    PySNMPBackend(_make_config("private"), logger).get(".1.3.6.1.2.1.1.1.0")
+    assert len(commands.engines) == 2
+
+
+def test_engines_are_per_thread(commands: _FakeCommands) -> None:
+    backend = PySNMPBackend(_make_config(), logger)
+    backend.get(".1.3.6.1.2.1.1.1.0")
+    thread = threading.Thread(target=backend.get, args=(".1.3.6.1.2.1.1.1.0",))
+    thread.start()
+    thread.join()
+    assert len(commands.engines) == 2
+
+
+@pytest.mark.parametrize("is_snmpv2or3_without_bulkwalk_host, mp_model", [(False, 0), (True, 1)])
+def test_auth_data_community(is_snmpv2or3_without_bulkwalk_host: bool, mp_model: int) -> None:
+    auth_data = PySNMPBackend(
+        _make_config(is_snmpv2or3_without_bulkwalk_host=is_snmpv2or3_without_bulkwalk_host),
+        logger,
+    )._auth_data()
+    assert isinstance(auth_data, hlapi.CommunityData)
+    assert auth_data.mpModel == mp_model
+
+
+def test_auth_data_v3() -> None:
+    auth_data = PySNMPBackend(
+        _make_config(("authPriv", "SHA-256", "user", "authpass", "AES", "privpass")), logger
+    )._auth_data()
+    assert isinstance(auth_data, hlapi.UsmUserData)
+    assert auth_data.userName == "user"
+    assert auth_data.authProtocol == hlapi.usmHMAC192SHA256AuthProtocol
+    assert auth_data.privProtocol == hlapi.usmAesCfb128Protocol
+
+
+def test_auth_data_v3_invalid_proto() -> None:
+    with pytest.raises(MKGeneralException):
+        PySNMPBackend(_make_config(("authNoPriv", "md4", "user", "pass")), logger)._auth_data()
@@ -3,8 +3,18 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import os
+from pathlib import Path
+
 import pytest
 
+import cmk.utils.paths
+from cmk.utils.exceptions import MKSNMPError
+from cmk.utils.log import logger
+from cmk.utils.type_defs import HostName
+
+from cmk.snmplib.type_defs import SNMPBackendEnum, SNMPHostConfig
+
 import cmk.core_helpers.snmp_backend._utils as utils
 from cmk.core_helpers.snmp_backend import StoredWalkSNMPBackend
 
@@ -50,6 +60,84 @@ class TestStoredWalkSNMPBackend:
         ]
 
 
+class TestStoredWalkSNMPBackendWalk:
+    @pytest.fixture
+    def backend(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> StoredWalkSNMPBackend:
+        monkeypatch.setattr(cmk.utils.paths, "snmpwalks_dir", str(tmp_path))
+        (tmp_path / "walkhost").write_text(
+            ".1.2.3.1 foo\n"
+            ".1.2.3.2 bar\n"
+            "foobar\n"
+            ".1.2.3.10 10\n"
+            ".1.2.30.1 baz\n"
+            '.1.3.1 "41 42 "\n'
+        )
+        return StoredWalkSNMPBackend(
+            SNMPHostConfig(
+                is_ipv6_primary=False,
+                hostname=HostName("walkhost"),
+                ipaddress="1.2.3.4",
+                credentials="public",
+                port=161,
+                is_bulkwalk_host=False,
+                is_snmpv2or3_without_bulkwalk_host=False,
+                bulk_walk_size_of=0,
+                timing={},
+                oid_range_limits={},
+                snmpv3_contexts=[],
+                character_encoding=None,
+                is_usewalk_host=True,
+                snmp_backend=SNMPBackendEnum.CLASSIC,
+            ),
+            logger,
+        )
+
+    @pytest.mark.parametrize(
+        "oid, expected",
+        [
+            (
+                ".1.2.3",
+                [
+                    (".1.2.3.1", b"foo"),
+                    (".1.2.3.2", b"bar\nfoobar"),
+                    (".1.2.3.10", b"10"),
+                ],
+            ),
+            ("1.2.30", [(".1.2.30.1", b"baz")]),
+            (".1.2.3.10", [(".1.2.3.10", b"10")]),
+            (".1.2.3.*", [(".1.2.3.1", b"foo")]),
+            (".1.2.3.10.*", []),
+            (".1.3", [(".1.3.1", b"AB")]),
+            (".1.2.4", []),
+            (".1.4", []),
+            (".0", []),
+        ],
+    )
+    def test_walk(self, backend: StoredWalkSNMPBackend, oid: str, expected: object) -> None:
+        assert backend.walk(oid) == expected
+
+    def test_get(self, backend: StoredWalkSNMPBackend) -> None:
+        assert backend.get(".1.2.3.10") == b"10"
+        assert backend.get(".1.2.3") is None
+
+    def test_index_is_rebuilt_on_change(
+        self, backend: StoredWalkSNMPBackend, tmp_path: Path
+    ) -> None:
+        assert backend.walk(".1.2.30") == [(".1.2.30.1", b"baz")]
+        index_path = Path(cmk.utils.paths.tmp_dir, "snmpwalk_index", "walkhost")
+        assert index_path.exists()
+
+        walk_path = tmp_path / "walkhost"
+        walk_path.write_text(".1.2.30.1 new\n.1.2.30.2 value\n")
+        os.utime(walk_path, ns=(0, 0))
+        assert backend.walk(".1.2.30") == [(".1.2.30.1", b"new"), (".1.2.30.2", b"value")]
+
+    def test_missing_walk(self, backend: StoredWalkSNMPBackend, tmp_path: Path) -> None:
+        (tmp_path / "walkhost").unlink()
+        with pytest.raises(MKSNMPError):
+            backend.walk(".1.2.3")
+
+
 @pytest.fixture
 def create_files(tmpdir):
     tmpdir.mkdir("walkdata")
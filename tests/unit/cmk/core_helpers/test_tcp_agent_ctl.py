@@ -9,6 +9,7 @@ import pytest
 
 from cmk.core_helpers.tcp_agent_ctl import (
     AgentCtlMessage,
+    AgentCtlMessageDecoder,
     CompressionType,
     HeaderV1,
     MessageV1,
@@ -158,3 +159,42 @@ class TestMessageV1:
             HeaderV1(CompressionType.ZLIB),
             zlib_compressed_data,
         )
+
+
+class TestAgentCtlMessageDecoder:
+    @staticmethod
+    def _decode(message: bytes, chunk_size: int) -> bytes:
+        decoder = AgentCtlMessageDecoder()
+        payload = b"".join(
+            bytes(decoder.decode(message[start : start + chunk_size]))
+            for start in range(0, len(message), chunk_size)
+        )
+        return payload + decoder.finish()
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 5, 1000])
+    @pytest.mark.parametrize("compression_type", list(CompressionType))
+    def test_decode(self, chunk_size: int, compression_type: CompressionType) -> None:
+        data = b"<<<check_mk>>>\nVersion: 2.2.0\n" * 100
+        message = b"%b%b%b" % (
+            bytes(Version.V1),
+            bytes(HeaderV1(compression_type)),
+            compress(data) if compression_type is CompressionType.ZLIB else data,
+        )
+        assert (
+            self._decode(message, chunk_size) == AgentCtlMessage.from_bytes(message).payload == data
+        )
+
+    @pytest.mark.parametrize("message", [b"", b"\x00", b"\x00\x00"])
+    def test_incomplete_header(self, message: bytes) -> None:
+        assert self._decode(message, 1) == AgentCtlMessage.from_bytes(message).payload
+
+    def test_truncated(self, zlib_compressed_data: bytes) -> None:
+        message = b"%b%b%b" % (
+            bytes(Version.V1),
+            bytes(HeaderV1(CompressionType.ZLIB)),
+            zlib_compressed_data[:-1],
+        )
+        with pytest.raises(ValueError):
+            AgentCtlMessage.from_bytes(message)
+        with pytest.raises(ValueError):
+            self._decode(message, 1)
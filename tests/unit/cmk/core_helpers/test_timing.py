@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Copyright (C) 2022 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+from pathlib import Path
+
+import pytest
+
+import cmk.utils.store as store
+from cmk.utils.type_defs import HostName
+
+from cmk.core_helpers import timing
+
+
+@pytest.fixture(name="histograms", autouse=True)
+def fixture_histograms(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> timing._Histograms:
+    monkeypatch.setattr("cmk.utils.paths.tmp_dir", str(tmp_path))
+    histograms = timing._Histograms()
+    monkeypatch.setattr(timing, "_histograms", histograms)
+    return histograms
+
+
+def test_phase_without_record(histograms: timing._Histograms) -> None:
+    with timing.phase("receive") as sample:
+        sample.nbytes = 42
+    assert not histograms._pending
+    assert not timing.histograms_path().exists()
+
+
+def test_record() -> None:
+    with timing.record(HostName("heute")) as phase_times:
+        with timing.source("agent"):
+            with timing.phase("receive") as sample:
+                sample.nbytes = 1000
+            with timing.phase("parse"):
+                pass
+            with timing.phase("receive") as sample:
+                sample.nbytes = 24
+        with timing.source("piggyback"):
+            with timing.phase("parse") as sample:
+                sample.nbytes = 5
+
+    assert sorted(phase_times.phases) == [
+        ("agent", "parse"),
+        ("agent", "receive"),
+        ("piggyback", "parse"),
+    ]
+    assert phase_times.phases[("agent", "receive")].nbytes == 1024
+    by_phase = phase_times.by_phase()
+    assert sorted(by_phase) == ["parse", "receive"]
+    assert by_phase["parse"].nbytes == 5
+    assert by_phase["parse"].seconds == (
+        phase_times.phases[("agent", "parse")].seconds
+        + phase_times.phases[("piggyback", "parse")].seconds
+    )
+    assert timing.histograms_path().exists()
+
+
+def test_histograms_flush(histograms: timing._Histograms) -> None:
+    for host_name, seconds in (("fast", 0.0001), ("slow", 10.0), ("slower", 11.0)):
+        phase_times = timing.PhaseTimes(HostName(host_name))
+        phase_times.add("agent", "receive", seconds, 100)
+        histograms.add(phase_times)
+    # The first sample is flushed right away, the others are pending.
+    assert histograms._pending
+    histograms.flush()
+    assert not histograms._pending
+
+    dump = store.load_object_from_file(timing.histograms_path(), default={})
+    assert dump["bounds"] == timing.BOUNDS
+    histogram = dump["histograms"]["agent"]["receive"]
+    assert histogram["count"] == 3
+    assert histogram["bytes"] == 300
+    assert histogram["buckets"][0] == 1
+    assert histogram["exemplars"][0] == "fast"
+    assert histogram["buckets"][14] == 2
+    assert histogram["exemplars"][14] == "slower"
+    assert sum(histogram["buckets"]) == 3
+
+    # Merged with what is on disk.
+    phase_times = timing.PhaseTimes(HostName("again"))
+    phase_times.add("agent", "receive", 0.0001, 1)
+    histograms.add(phase_times)
+    histograms.flush()
+
+    histogram = store.load_object_from_file(timing.histograms_path(), default={})["histograms"][
+        "agent"
+    ]["receive"]
+    assert histogram["count"] == 4
+    assert histogram["buckets"][0] == 2
+    assert histogram["exemplars"][0] == "again"
@@ -3,6 +3,14 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import pytest
+
+from cmk.snmplib.type_defs import SNMPBackendEnum
+
+from cmk.gui.plugins.wato.check_mk_configuration import (
+    transform_snmp_backend_from_valuespec,
+    transform_snmp_backend_hosts_to_valuespec,
+)
 from cmk.gui.plugins.wato.utils import ConfigVariableGroupUserInterface
 from cmk.gui.plugins.watolib.utils import config_variable_registry
 from cmk.gui.utils.theme import theme_choices
@@ -27,3 +35,30 @@ def test_ui_theme_default_value(request_context) -> None:  # type:ignore[no-unty
     assert default_setting == "modern-dark"
 
     assert var.valuespec().value_to_html(default_setting) == "Dark"
+
+
+@pytest.mark.parametrize(
+    "backend, expected",
+    [
+        (False, SNMPBackendEnum.INLINE),
+        ("inline", SNMPBackendEnum.INLINE),
+        ("inline_legacy", SNMPBackendEnum.INLINE),
+        (True, SNMPBackendEnum.CLASSIC),
+        ("classic", SNMPBackendEnum.CLASSIC),
+        # pysnmp of the 2.1 beta, replaced by the classic backend
+        ("pysnmp", SNMPBackendEnum.CLASSIC),
+        ("pysnmp_backend", SNMPBackendEnum.PYSNMP),
+    ],
+)
+def test_transform_snmp_backend_hosts_to_valuespec(
+    backend: object, expected: SNMPBackendEnum
+) -> None:
+    assert transform_snmp_backend_hosts_to_valuespec(backend) is expected
+
+
+@pytest.mark.parametrize("backend", list(SNMPBackendEnum))
+def test_transform_snmp_backend_roundtrip(backend: SNMPBackendEnum) -> None:
+    assert (
+        transform_snmp_backend_hosts_to_valuespec(transform_snmp_backend_from_valuespec(backend))
+        is backend
+    )
@@ -81,6 +81,7 @@ def test_registered_configvars() -> None:
     expected_vars = [
         "actions",
         "adhoc_downtime",
+        "agent_file_cache_compression",
         "agent_simulator",
         "apache_process_tuning",
         "archive_orphans",
@@ -105,6 +106,7 @@ def test_registered_configvars() -> None:
         "event_limit",
         "eventsocket_queue_len",
         "failed_notification_horizon",
+        "fetch_phase_statistics",
         "hard_query_limit",
         "history_lifetime",
         "history_rotation",
@@ -136,6 +138,7 @@ def test_registered_configvars() -> None:
         "notification_plugin_timeout",
         "page_heading",
         "pagetitle_date_format",
+        "parse_result_cache",
         "password_policy",
         "piggyback_max_cachefile_age",
         "profile",
@@ -148,6 +151,7 @@ def test_registered_configvars() -> None:
         "retention_interval",
         "rrdcached_tuning",
         "rule_optimizer",
+        "ruleset_matching_cache_size",
         "selection_livetime",
         "service_view_grouping",
         "show_livestatus_errors",
@@ -175,6 +179,7 @@ def test_registered_configvars() -> None:
         "use_dns_cache",
         "snmp_backend_default",
         "use_inline_snmp",
+        "use_special_agent_forkserver",
         "use_new_descriptions_for",
         "user_downtime_timeranges",
         "user_icons_and_actions",
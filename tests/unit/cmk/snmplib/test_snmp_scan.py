@@ -5,7 +5,7 @@
 
 # pylint: disable=protected-access, redefined-outer-name
 
-from collections.abc import Iterator
+from collections.abc import Iterator, Sequence
 from pathlib import Path
 
 import pytest
@@ -15,7 +15,7 @@ from tests.testlib.base import Scenario
 
 from tests.unit.conftest import FixPluginLegacy
 
-from cmk.utils.exceptions import OnError
+from cmk.utils.exceptions import MKSNMPError, OnError
 from cmk.utils.log import logger
 from cmk.utils.type_defs import HostName, SectionName
 
@@ -26,6 +26,7 @@ from cmk.snmplib.type_defs import (
     SNMPBackend,
     SNMPBackendEnum,
     SNMPDecodedString,
+    SNMPDetectSpec,
     SNMPHostConfig,
 )
 from cmk.snmplib.utils import evaluate_snmp_detection
@@ -274,3 +275,56 @@ def test_gather_available_raw_section_names_defaults(
         SectionName("snmp_info"),
         SectionName("snmp_uptime"),
     }
+
+
+class SNMPRecordingBackend(SNMPTestBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.get_many_calls: list[Sequence[OID]] = []
+
+    def get(self, oid, context_name=None):
+        raise AssertionError("single GET during scan")
+
+    def get_many(self, oids, context_name=None):
+        self.get_many_calls.append(oids)
+        return {oid: b"value" if oid.endswith(".1") else None for oid in oids}
+
+
+class SNMPFailingBackend(SNMPTestBackend):
+    def get_many(self, oids, context_name=None):
+        raise MKSNMPError("No response")
+
+
+@pytest.mark.usefixtures("cache_oids")
+def test_snmp_scan_prefetch_detect_oids(backend: SNMPBackend) -> None:
+    recording_backend = SNMPRecordingBackend(backend.config, logger)
+    sections = [
+        (
+            SectionName("one"),
+            SNMPDetectSpec([[(".1.2.1", ".*", True), (".1.2.2", ".*", True)]]),
+        ),
+        (
+            SectionName("two"),
+            SNMPDetectSpec([[(".1.2.1", "val.*", True)], [(".1.2.3.*", ".*", True)]]),
+        ),
+    ]
+
+    snmp_scan._prefetch_detect_oids(sections, backend=recording_backend)
+
+    assert recording_backend.get_many_calls == [[".1.2.1", ".1.2.2"]]
+    assert snmp_cache.single_oid_cache()[".1.2.1"] == "value"
+    assert snmp_cache.single_oid_cache()[".1.2.2"] is None
+    assert ".1.2.3.*" not in snmp_cache.single_oid_cache()
+
+    assert snmp_scan._find_sections(
+        sections, on_error=OnError.RAISE, backend=recording_backend
+    ) == {SectionName("two")}
+
+
+@pytest.mark.usefixtures("cache_oids", "disable_debug")
+def test_snmp_scan_prefetch_detect_oids_failure(backend: SNMPBackend) -> None:
+    sections = [(SectionName("one"), SNMPDetectSpec([[(".1.2.9", ".*", True)]]))]
+
+    snmp_scan._prefetch_detect_oids(sections, backend=SNMPFailingBackend(backend.config, logger))
+
+    assert ".1.2.9" not in snmp_cache.single_oid_cache()
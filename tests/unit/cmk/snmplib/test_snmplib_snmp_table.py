@@ -3,10 +3,16 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from tests.testlib.base import Scenario
 
+from cmk.utils.exceptions import MKTimeout
 from cmk.utils.log import logger
 from cmk.utils.type_defs import HostName, SectionName
 
@@ -92,6 +98,169 @@ def test_get_snmp_table(  # type:ignore[no-untyped-def]
     assert get_all_snmp_tables(snmp_info) == expected_values
 
 
+class SNMPConcurrentTestBackend(SNMPTestBackend):
+    supports_concurrent_walks = True
+
+    def __init__(self, *args, parties, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Every walk blocks until `parties` walks run at the same time.
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.walked = []
+
+    def walk(self, oid, section_name=None, table_base_oid=None, context_name=None):
+        self.walked.append(oid)
+        self.barrier.wait()
+        return super().walk(oid, section_name, table_base_oid, context_name)
+
+
+def test_get_snmp_table_parallel_walks() -> None:
+    tree = BackendSNMPTree(
+        base=".1.3.6.1.2.1.2.2.1",
+        oids=[
+            BackendOIDSpec(SpecialColumn.END, "string", False),
+            BackendOIDSpec("2", "string", False),
+            BackendOIDSpec("10", "binary", False),
+        ],
+    )
+    expected = snmp_table.get_snmp_table(
+        section_name=SectionName("unit_test"),
+        tree=tree,
+        walk_cache={},
+        backend=SNMPTestBackend(SNMPConfig, logger),
+    )
+
+    backend = SNMPConcurrentTestBackend(SNMPConfig, logger, parties=2)
+    assert (
+        snmp_table.get_snmp_table(
+            section_name=SectionName("unit_test"),
+            tree=tree,
+            walk_cache={},
+            backend=backend,
+            max_parallel_walks=2,
+        )
+        == expected
+    )
+    assert sorted(backend.walked) == [".1.3.6.1.2.1.2.2.1.10", ".1.3.6.1.2.1.2.2.1.2"]
+
+
+def test_prefetch_snmpwalks_honours_walk_cache() -> None:
+    cached_rows = [(".1.2.1.1", b"cached")]
+    walk_cache = {".1.2.1": (False, cached_rows)}
+    backend = SNMPConcurrentTestBackend(SNMPConfig, logger, parties=2)
+
+    with snmp_table.parallel_walks_executor(backend, 4) as executor:
+        assert executor is not None
+        snmp_table.prefetch_snmpwalks(
+            section_name=SectionName("unit_test"),
+            trees=[
+                BackendSNMPTree(
+                    base=".1.2",
+                    oids=[
+                        BackendOIDSpec("1", "string", False),
+                        BackendOIDSpec("2", "string", True),
+                    ],
+                ),
+                BackendSNMPTree(
+                    base=".1",
+                    oids=[
+                        BackendOIDSpec("2.2", "string", False),
+                        BackendOIDSpec("3", "string", False),
+                    ],
+                ),
+            ],
+            walk_cache=walk_cache,
+            backend=backend,
+            executor=executor,
+        )
+
+    assert sorted(backend.walked) == [".1.2.2", ".1.3"]
+    assert walk_cache[".1.2.1"] == (False, cached_rows)
+    assert walk_cache[".1.2.2"][0] is True
+    assert walk_cache[".1.3"][0] is False
+
+
+def test_prefetch_snmpwalks_error() -> None:
+    class FailingBackend(SNMPTestBackend):
+        def walk(self, oid, section_name=None, table_base_oid=None, context_name=None):
+            if oid.endswith(".2"):
+                raise RuntimeError(oid)
+            return super().walk(oid, section_name, table_base_oid, context_name)
+
+    with ThreadPoolExecutor(max_workers=2) as executor, pytest.raises(
+        RuntimeError, match=r"\.1\.2"
+    ):
+        snmp_table.prefetch_snmpwalks(
+            section_name=SectionName("unit_test"),
+            trees=[
+                BackendSNMPTree(
+                    base=".1",
+                    oids=[
+                        BackendOIDSpec("1", "string", False),
+                        BackendOIDSpec("2", "string", False),
+                    ],
+                ),
+            ],
+            walk_cache={},
+            backend=FailingBackend(SNMPConfig, logger),
+            executor=executor,
+        )
+
+
+class SNMPHangingTestBackend(SNMPTestBackend):
+    supports_concurrent_walks = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aborted = threading.Event()
+
+    def abort_walks(self):
+        self.aborted.set()
+
+    def walk(self, oid, section_name=None, table_base_oid=None, context_name=None):
+        self.aborted.wait(10)
+        return super().walk(oid, section_name, table_base_oid, context_name)
+
+
+def test_parallel_walks_timeout() -> None:
+    def raise_timeout(_signum: int, _frame: object) -> None:
+        raise MKTimeout("Timed out")
+
+    backend = SNMPHangingTestBackend(SNMPConfig, logger)
+    previous_handler = signal.signal(signal.SIGALRM, raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, 0.1)
+    start = time.monotonic()
+    try:
+        with pytest.raises(MKTimeout):
+            snmp_table.get_snmp_table(
+                section_name=SectionName("unit_test"),
+                tree=BackendSNMPTree(
+                    base=".1",
+                    oids=[BackendOIDSpec(str(column), "string", False) for column in range(4)],
+                ),
+                walk_cache={},
+                backend=backend,
+                max_parallel_walks=2,
+            )
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+    assert backend.aborted.is_set()
+    assert time.monotonic() - start < 5
+
+
+@pytest.mark.parametrize(
+    "backend, max_parallel_walks",
+    [
+        (SNMPTestBackend(SNMPConfig, logger), 4),
+        (SNMPConcurrentTestBackend(SNMPConfig, logger, parties=2), 1),
+    ],
+)
+def test_parallel_walks_executor_serial(backend: SNMPBackend, max_parallel_walks: int) -> None:
+    with snmp_table.parallel_walks_executor(backend, max_parallel_walks) as executor:
+        assert executor is None
+
+
 @pytest.mark.parametrize(
     "encoding,columns,expected",
     [
@@ -182,3 +351,33 @@ def test_is_classic_at_snmp_v1_host(monkeypatch) -> None:  # type:ignore[no-unty
         config_cache.get_host_config("not_included").snmp_config("").snmp_backend
         == SNMPBackendEnum.INLINE
     )
+
+
+def test_pysnmp_backend_selection(monkeypatch) -> None:  # type:ignore[no-untyped-def]
+    ts = Scenario()
+    ts.set_ruleset(
+        "snmp_backend_hosts",
+        [
+            {"condition": {"host_name": ["pysnmp_h"]}, "value": "pysnmp_backend"},
+            {"condition": {"host_name": ["legacy_h"]}, "value": "pysnmp"},
+        ],
+    )
+    ts.add_host("pysnmp_h")
+    ts.add_host("legacy_h")
+    ts.add_host("v1_h")
+    ts.set_option("snmp_backend_default", "pysnmp_backend")
+    config_cache = ts.apply(monkeypatch)
+
+    assert (
+        config_cache.get_host_config("pysnmp_h").snmp_config("").snmp_backend
+        == SNMPBackendEnum.PYSNMP
+    )
+    # The pysnmp backend of the 2.1 beta has been replaced by the classic one.
+    assert (
+        config_cache.get_host_config("legacy_h").snmp_config("").snmp_backend
+        == SNMPBackendEnum.CLASSIC
+    )
+    # No Net-SNMP memory leak to work around for SNMPv1.
+    assert (
+        config_cache.get_host_config("v1_h").snmp_config("").snmp_backend == SNMPBackendEnum.PYSNMP
+    )
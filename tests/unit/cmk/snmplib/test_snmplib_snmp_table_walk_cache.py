@@ -4,54 +4,91 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 from pathlib import Path
-from typing import Iterable, MutableMapping
+
+import pytest
 
 from cmk.utils.type_defs import HostName
 
-from cmk.snmplib.snmp_table import WalkCache
+from cmk.snmplib.snmp_table import _WalkCacheFile, WalkCache
 from cmk.snmplib.type_defs import BackendOIDSpec, BackendSNMPTree, SNMPRowInfo
 
 
-class MockWalkCache(WalkCache):
-    def __init__(self, mockdata: MutableMapping[str, SNMPRowInfo]) -> None:
-        super().__init__(HostName("testhost"))
-        self.mock_stored_on_fs = mockdata
+def _tree(*columns: tuple[str, bool]) -> BackendSNMPTree:
+    return BackendSNMPTree(
+        base=".1.2",
+        oids=[BackendOIDSpec(column, "string", save_to_cache) for column, save_to_cache in columns],
+    )
 
-    def _read_row(self, path: Path) -> SNMPRowInfo:
-        return self.mock_stored_on_fs[str(path.name)]
 
-    def _write_row(self, path: Path, rowinfo: SNMPRowInfo) -> None:
-        self.mock_stored_on_fs[str(path.name)] = rowinfo
+class TestWalkCacheFile:
+    def test_roundtrip(self, tmp_path: Path) -> None:
+        walks: dict[str, SNMPRowInfo] = {
+            ".1.2.3": [(".1.2.3.1", b"\x00\xff"), (".1.2.3.2", b"")],
+            ".1.2.4": [],
+            ".1.2.5": [(".1.2.5.1", b"five")],
+        }
+        walk_file = _WalkCacheFile(tmp_path / "walks")
+        walk_file.update(walks)
+        assert walk_file.read(walks) == walks
+        assert walk_file.read({".1.2.5", ".9.9"}) == {".1.2.5": walks[".1.2.5"]}
 
-    def _iterfiles(self) -> Iterable[Path]:
-        return (Path(k) for k in self.mock_stored_on_fs)
+    def test_update_keeps_other_walks(self, tmp_path: Path) -> None:
+        walk_file = _WalkCacheFile(tmp_path / "walks")
+        walk_file.update({".1.2.3": [(".1.2.3.1", b"old")], ".1.2.4": [(".1.2.4.1", b"4")]})
+        walk_file.update({".1.2.3": [(".1.2.3.1", b"new")]})
+        assert walk_file.read({".1.2.3", ".1.2.4"}) == {
+            ".1.2.3": [(".1.2.3.1", b"new")],
+            ".1.2.4": [(".1.2.4.1", b"4")],
+        }
 
+    def test_read_missing_file(self, tmp_path: Path) -> None:
+        assert not _WalkCacheFile(tmp_path / "walks").read({".1.2.3"})
 
-class TestWalkCache:
-    def test_oid2name_roundtrip(self) -> None:
-        fetchoid = ".3.1.4.1.5.9.2.6.5.3.5"
-        assert fetchoid == WalkCache._name2oid(WalkCache._oid2name(fetchoid))
+    def test_read_invalid_file(self, tmp_path: Path) -> None:
+        (tmp_path / "walks").write_bytes(b"[('.1.2.3.1', b'43')]\n")
+        with pytest.raises(ValueError):
+            _WalkCacheFile(tmp_path / "walks").read({".1.2.3"})
 
-    def test_cache_keeps_stored_data(self) -> None:
 
+class TestWalkCache:
+    def test_cache_keeps_stored_data(self) -> None:
         fetchoid = ".1.2.3"
-        path = f"OID{fetchoid}"
-        cache = MockWalkCache({path: [("23", b"43")]})
+        cache = WalkCache(HostName("testhost"))
+        cache[fetchoid] = (True, [(".1.2.3.23", b"43")])
+        cache.save()
 
+        cache = WalkCache(HostName("testhost"))
         assert not cache
 
-        cache.load(
-            trees=[
-                BackendSNMPTree(
-                    base=".1.2",
-                    oids=[BackendOIDSpec("3", "string", True)],
-                ),
-            ],
-        )
+        cache.load(trees=[_tree(("3", True))])
+
+        assert cache[fetchoid] == (False, [(".1.2.3.23", b"43")])
+
+    def test_cache_loads_needed_oids_only(self) -> None:
+        cache = WalkCache(HostName("testhost"))
+        cache[".1.2.3"] = (True, [(".1.2.3.1", b"3")])
+        cache[".1.2.4"] = (True, [(".1.2.4.1", b"4")])
+        cache.save()
+
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[_tree(("4", True))])
+        assert list(cache) == [".1.2.4"]
 
-        assert fetchoid in cache
+        # Walks that have not been loaded are not lost when saving.
+        cache[".1.2.5"] = (True, [(".1.2.5.1", b"5")])
         cache.save()
-        assert path in cache.mock_stored_on_fs
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[_tree(("3", True), ("4", True), ("5", True))])
+        assert sorted(cache) == [".1.2.3", ".1.2.4", ".1.2.5"]
+
+    def test_cache_does_not_save_loaded_or_live_data(self) -> None:
+        cache = WalkCache(HostName("testhost"))
+        cache[".1.2.3"] = (False, [(".1.2.3.1", b"3")])
+        cache.save()
+
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[_tree(("3", True))])
+        assert not cache
 
     def test_cache_ignores_non_save_oids(self) -> None:
         """
@@ -60,22 +97,23 @@ class TestWalkCache:
         """
 
         fetchoid = ".1.2.3"
-        path = f"OID{fetchoid}"
-        cache = MockWalkCache({path: [("23", b"42")]})
+        cache = WalkCache(HostName("testhost"))
+        cache[fetchoid] = (True, [(".1.2.3.23", b"42")])
+        cache.save()
 
+        cache = WalkCache(HostName("testhost"))
         assert not cache
 
-        cache.load(
-            trees=[
-                BackendSNMPTree(
-                    base=".1.2",
-                    oids=[BackendOIDSpec("3", "string", False)],
-                ),
-                BackendSNMPTree(
-                    base=".1.2",
-                    oids=[BackendOIDSpec("3", "string", True)],
-                ),
-            ]
-        )
+        cache.load(trees=[_tree(("3", False)), _tree(("3", True))])
 
         assert fetchoid not in cache
+
+    def test_clear(self) -> None:
+        cache = WalkCache(HostName("testhost"))
+        cache[".1.2.3"] = (True, [(".1.2.3.1", b"3")])
+        cache.save()
+        cache.clear()
+
+        cache = WalkCache(HostName("testhost"))
+        cache.load(trees=[_tree(("3", True))])
+        assert not cache
@@ -12,11 +12,19 @@ from _pytest.monkeypatch import MonkeyPatch
 from tests.testlib.base import Scenario
 
 import cmk.utils.paths
-from cmk.utils.rulesets.ruleset_matcher import matches_tag_condition, RulesetMatchObject
+from cmk.utils.rulesets.ruleset_matcher import (
+    disable_profiling,
+    enable_profiling,
+    matches_tag_condition,
+    profiler,
+    RulesetMatchObject,
+    ServiceDescriptionMatcher,
+)
 from cmk.utils.tags import TagConfig
 from cmk.utils.type_defs import (
     CheckPluginName,
     HostName,
+    Labels,
     RuleConditionsSpec,
     Ruleset,
     RuleSpec,
@@ -819,6 +827,73 @@ def test_ruleset_matcher_get_service_ruleset_values_labels(
     )
 
 
+@pytest.mark.parametrize(
+    "service_description, expected_result",
+    [
+        ("CPU load", 0b1000011),
+        ("CPU utilization", 0b1000001),
+        ("Filesystem /", 0b1000100),
+        ("Filesystems", 0b1000100),
+        ("Interface 1", 0b1001000),
+        ("Interface 10", 0b1000000),
+        ("Memory", 0b1010000),
+        ("Disk IO SUMMARY", 0b1110000),
+        ("Uptime", 0b1000000),
+        ("", 0b1000000),
+    ],
+)
+def test_service_description_matcher(service_description: str, expected_result: int) -> None:
+    matcher = ServiceDescriptionMatcher(
+        [
+            "CPU",
+            "CPU load$",
+            "Filesystems?",
+            "Interface 1$",
+            "Disk|Memory",
+            "Disk IO",
+            "",
+        ]
+    )
+    assert matcher.match(service_description) == expected_result
+
+
+def test_ruleset_matcher_get_service_ruleset_values_negated(monkeypatch: MonkeyPatch) -> None:
+    ts = Scenario()
+    ts.add_host(HostName("host1"))
+    matcher = ts.apply(monkeypatch).ruleset_matcher
+
+    service_ruleset: Ruleset[str] = [
+        {
+            "id": "1",
+            "value": "not CPU",
+            "condition": {"service_description": {"$nor": ["CPU", {"$regex": "Mem.*"}]}},
+        },
+        {
+            "id": "2",
+            "value": "CPU",
+            "condition": {"service_description": ["CPU"]},
+        },
+        {
+            "id": "3",
+            "value": "all",
+            "condition": {},
+        },
+    ]
+
+    def values(service_description: str) -> list[str]:
+        return list(
+            matcher.get_service_ruleset_values(
+                RulesetMatchObject(HostName("host1"), ServiceName(service_description)),
+                ruleset=service_ruleset,
+                is_binary=False,
+            )
+        )
+
+    assert values("CPU load") == ["CPU", "all"]
+    assert values("Memory") == ["all"]
+    assert values("Uptime") == ["not CPU", "all"]
+
+
 def test_ruleset_optimizer_clear_ruleset_caches(monkeypatch: MonkeyPatch) -> None:
     config_cache = Scenario().apply(monkeypatch)
     ruleset_optimizer = config_cache.ruleset_matcher.ruleset_optimizer
@@ -831,6 +906,152 @@ def test_ruleset_optimizer_clear_ruleset_caches(monkeypatch: MonkeyPatch) -> Non
     assert not ruleset_optimizer._service_ruleset_cache
 
 
+@pytest.mark.parametrize(
+    "condition, expected_result",
+    [
+        pytest.param({}, {"host1", "host2", "host3", "host4"}, id="no conditions"),
+        pytest.param({"host_tags": {"criticality": "prod"}}, {"host1", "host3"}, id="tag"),
+        pytest.param(
+            {"host_tags": {"criticality": {"$ne": "prod"}}}, {"host2", "host4"}, id="negated tag"
+        ),
+        pytest.param(
+            {"host_tags": {"criticality": {"$or": ["test", "offline"]}}},
+            {"host2", "host4"},
+            id="or condition",
+        ),
+        pytest.param(
+            {"host_tags": {"criticality": {"$nor": ["test", "offline"]}}},
+            {"host1", "host3"},
+            id="nor condition",
+        ),
+        pytest.param(
+            {"host_tags": {"criticality": "prod", "networking": "wan"}},
+            {"host3"},
+            id="multiple tag groups",
+        ),
+        pytest.param({"host_tags": {"criticality": "unknown"}}, set(), id="unknown tag"),
+        pytest.param({"host_folder": "/wato/sub/"}, {"host3", "host4"}, id="folder"),
+        pytest.param(
+            {"host_folder": "/wato/sub/", "host_tags": {"criticality": {"$ne": "prod"}}},
+            {"host4"},
+            id="folder and negated tag",
+        ),
+        pytest.param(
+            {"host_name": ["host1", "unknown"]},
+            {"host1"},
+            id="explicit hosts",
+        ),
+        pytest.param(
+            {"host_name": {"$nor": ["host1", {"$regex": ".*4$"}]}},
+            {"host2", "host3"},
+            id="negated host list",
+        ),
+        pytest.param(
+            {"host_name": [{"$regex": "host[12]"}], "host_tags": {"networking": "lan"}},
+            {"host1", "host2"},
+            id="regex and tag",
+        ),
+        pytest.param({"host_labels": {"os": "linux"}}, {"host1", "host3"}, id="label"),
+        pytest.param(
+            {"host_labels": {"os": {"$ne": "linux"}}}, {"host2", "host4"}, id="negated label"
+        ),
+        pytest.param(
+            {"host_labels": {"os": "linux", "env": {"$ne": "prod"}}},
+            {"host3"},
+            id="label and negated label",
+        ),
+        pytest.param(
+            {"host_labels": {"os": "linux"}, "host_tags": {"networking": "wan"}},
+            {"host3"},
+            id="label and tag",
+        ),
+    ],
+)
+def test_ruleset_optimizer_all_matching_hosts(
+    monkeypatch: MonkeyPatch,
+    condition: RuleConditionsSpec,
+    expected_result: set[HostName],
+) -> None:
+    ts = Scenario()
+    ts.add_host(
+        HostName("host1"),
+        tags={"criticality": "prod", "networking": "lan"},
+        labels={"os": "linux", "env": "prod"},
+    )
+    ts.add_host(
+        HostName("host2"),
+        tags={"criticality": "test", "networking": "lan"},
+        labels={"os": "windows"},
+    )
+    ts.add_host(
+        HostName("host3"),
+        tags={"criticality": "prod", "networking": "wan"},
+        host_path="/wato/sub/hosts.mk",
+        labels={"os": "linux"},
+    )
+    ts.add_host(
+        HostName("host4"),
+        tags={"criticality": "offline", "networking": "wan"},
+        host_path="/wato/sub/hosts.mk",
+    )
+    ruleset_optimizer = ts.apply(monkeypatch).ruleset_matcher.ruleset_optimizer
+
+    assert ruleset_optimizer._all_matching_hosts(condition, with_foreign_hosts=True) == {
+        HostName(h) for h in expected_result
+    }
+
+
+def test_ruleset_optimizer_labels_are_indexed_on_demand(monkeypatch: MonkeyPatch) -> None:
+    ts = Scenario()
+    ts.add_host(HostName("host1"), labels={"os": "linux"})
+    ts.add_host(HostName("host2"), labels={"os": "linux"})
+    ts.add_host(HostName("host3"), labels={"os": "windows"})
+    ruleset_optimizer = ts.apply(monkeypatch).ruleset_matcher.ruleset_optimizer
+    ruleset_optimizer.set_all_processed_hosts([HostName("host1")])
+
+    labels_of_host = ruleset_optimizer.labels_of_host
+    computed: list[HostName] = []
+
+    def counting_labels_of_host(hostname: HostName) -> Labels:
+        computed.append(hostname)
+        return labels_of_host(hostname)
+
+    monkeypatch.setattr(ruleset_optimizer, "labels_of_host", counting_labels_of_host)
+
+    condition: RuleConditionsSpec = {"host_labels": {"os": "linux"}}
+    assert ruleset_optimizer._all_matching_hosts(condition, with_foreign_hosts=False) == {
+        HostName("host1")
+    }
+    assert computed == [HostName("host1")]
+
+    negated_condition: RuleConditionsSpec = {"host_labels": {"os": {"$ne": "linux"}}}
+    assert ruleset_optimizer._all_matching_hosts(negated_condition, with_foreign_hosts=True) == {
+        HostName("host3")
+    }
+    assert computed == [HostName("host1"), HostName("host2"), HostName("host3")]
+
+    ruleset_optimizer._all_matching_hosts(condition, with_foreign_hosts=True)
+    assert len(computed) == 3
+
+
+def test_ruleset_optimizer_all_matching_hosts_processed_hosts(monkeypatch: MonkeyPatch) -> None:
+    ts = Scenario()
+    ts.add_host(HostName("host1"))
+    ts.add_host(HostName("host2"), host_path="/wato/sub/hosts.mk")
+    ts.add_host(HostName("host3"), host_path="/wato/sub/hosts.mk")
+    ruleset_optimizer = ts.apply(monkeypatch).ruleset_matcher.ruleset_optimizer
+    ruleset_optimizer.set_all_processed_hosts([HostName("host1"), HostName("host2")])
+
+    condition: RuleConditionsSpec = {"host_folder": "/wato/sub/"}
+    assert ruleset_optimizer._all_matching_hosts(condition, with_foreign_hosts=False) == {
+        HostName("host2")
+    }
+    assert ruleset_optimizer._all_matching_hosts(condition, with_foreign_hosts=True) == {
+        HostName("host2"),
+        HostName("host3"),
+    }
+
+
 @pytest.mark.parametrize(
     "taggroud_id, tag_condition, expected_result",
     [
@@ -926,3 +1147,61 @@ def test_matches_tag_condition(
         )
         is expected_result
     )
+
+
+def test_ruleset_profiler(monkeypatch: MonkeyPatch) -> None:
+    ts = Scenario()
+    ts.add_host(HostName("host1"))
+    matcher = ts.apply(monkeypatch).ruleset_matcher
+
+    service_ruleset: Ruleset[str] = [
+        {"id": "1", "value": "CPU", "condition": {"service_description": [{"$regex": "CPU.*"}]}},
+        {"id": "2", "value": "Memory", "condition": {"service_description": ["Memory"]}},
+    ]
+
+    enable_profiling()
+    try:
+        for service_description in ["CPU load", "CPU utilization", "Memory"]:
+            list(
+                matcher.get_service_ruleset_values(
+                    RulesetMatchObject(HostName("host1"), ServiceName(service_description)),
+                    ruleset=service_ruleset,
+                    is_binary=False,
+                )
+            )
+        list(
+            matcher.get_host_ruleset_values(
+                RulesetMatchObject(HostName("host1"), None), ruleset=ruleset, is_binary=False
+            )
+        )
+
+        ruleset_profiler = profiler()
+        assert ruleset_profiler is not None
+    finally:
+        disable_profiling()
+
+    service_statistics = ruleset_profiler.statistics_of(service_ruleset)
+    assert service_statistics.evaluations == 3
+    # 2 rules preprocessed, 2 rules tested per service
+    assert service_statistics.rules_tested == 8
+    assert service_statistics.regex_matches == 2
+    assert service_statistics.time > 0
+
+    host_statistics = ruleset_profiler.statistics_of(ruleset)
+    assert host_statistics.evaluations == 1
+    assert host_statistics.rules_tested == len(ruleset)
+
+    report = ruleset_profiler.report({id(service_ruleset): "service_ruleset"}).splitlines()
+    assert len(report) == 3
+    assert report[0].split() == [
+        "Ruleset",
+        "Evaluations",
+        "Rules",
+        "tested",
+        "Regex",
+        "matches",
+        "Time",
+        "[s]",
+    ]
+    assert any(line.split()[:4] == ["service_ruleset", "3", "8", "2"] for line in report)
+    assert any(line.startswith("<unknown ruleset with 6 rules>") for line in report)
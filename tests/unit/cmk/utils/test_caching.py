@@ -3,6 +3,8 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import pytest
+
 import cmk.utils.caching
 
 
@@ -45,3 +47,53 @@ def test_populated() -> None:
     assert cache.is_populated()
     cache.clear()
     assert not cache.is_populated()
+
+
+def test_lru_cache_eviction() -> None:
+    cache: cmk.utils.caching.LRUCache[str, int] = cmk.utils.caching.LRUCache("test_lru", 2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache["a"] == 1
+
+    cache["c"] = 3
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert len(cache) == 2
+
+
+def test_lru_cache_unbounded() -> None:
+    cache: cmk.utils.caching.LRUCache[int, int] = cmk.utils.caching.LRUCache("test_lru")
+    for i in range(1000):
+        cache[i] = i
+    assert len(cache) == 1000
+    assert cache.info().evictions == 0
+
+
+def test_lru_cache_info() -> None:
+    cache: cmk.utils.caching.LRUCache[str, int] = cmk.utils.caching.LRUCache("test_lru", 1)
+    cache["a"] = 1
+    assert cache["a"] == 1
+    with pytest.raises(KeyError):
+        _ = cache["b"]
+    cache["b"] = 2
+
+    assert cache.info() == cmk.utils.caching.CacheInfo(
+        hits=1, misses=1, evictions=1, size=1, maxsize=1
+    )
+
+    cache.clear()
+    assert not cache
+    assert cache.info().size == 0
+
+
+def test_lru_cache_statistics() -> None:
+    cache: cmk.utils.caching.LRUCache[str, int] = cmk.utils.caching.LRUCache("test_stats", 10)
+    cache["a"] = 1
+    assert cmk.utils.caching.lru_cache_statistics()["test_stats"].size == 1
+
+    replacement: cmk.utils.caching.LRUCache[str, int] = cmk.utils.caching.LRUCache("test_stats")
+    assert cmk.utils.caching.lru_cache_statistics()["test_stats"].size == 0
+
+    del cache, replacement
+    assert "test_stats" not in cmk.utils.caching.lru_cache_statistics()
@@ -6,9 +6,11 @@
 import hashlib
 
 import pytest
+from Cryptodome.Cipher import AES
 
+import cmk.utils.encryption as encryption
 import cmk.utils.paths
-from cmk.utils.encryption import Encrypter
+from cmk.utils.encryption import Encrypter, TransportProtocol
 
 
 @pytest.fixture()
@@ -25,3 +27,46 @@ def fixture_auth_secret():
 @pytest.mark.usefixtures("fixture_auth_secret")
 def test_value_encrypter_transparent() -> None:
     assert Encrypter.decrypt(Encrypter.encrypt(data := "abc")) == data
+
+
+def _encrypt_pbkdf2(password: str, data: bytes) -> bytes:
+    # Like `openssl enc -aes-256-cbc -md sha256 -pbkdf2 -iter 10000` on the agent.
+    salt = b"saltsalt"
+    key, iv = encryption._derive_pbkdf2_key_and_iv(password, salt)
+    fill = AES.block_size - len(data) % AES.block_size
+    return (
+        encryption.OPENSSL_SALTED_MARKER.encode()
+        + salt
+        + AES.new(key, AES.MODE_CBC, iv).encrypt(data + bytes([fill]) * fill)
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 16, 1000])
+def test_agent_decryptor(chunk_size: int) -> None:
+    data = b"<<<check_mk>>>\nVersion: 2.2.0\n" * 100
+    encrypted = _encrypt_pbkdf2("secret", data)
+    assert (
+        encryption.decrypt_by_agent_protocol("secret", TransportProtocol.PBKDF2, encrypted) == data
+    )
+
+    decryptor = encryption.AgentDecryptor("secret", TransportProtocol.PBKDF2)
+    for start in range(0, len(encrypted), chunk_size):
+        decryptor.update(encrypted[start : start + chunk_size])
+    assert decryptor.finalize() == data
+
+
+@pytest.mark.parametrize("protocol", [TransportProtocol.MD5, TransportProtocol.SHA256])
+def test_agent_decryptor_like_decrypt_by_agent_protocol(protocol: TransportProtocol) -> None:
+    # Wrong passphrases result in nonsensical fill bytes.
+    garbage = bytes(range(256)) * 4
+    decryptor = encryption.AgentDecryptor("secret", protocol)
+    decryptor.update(memoryview(garbage))
+    assert decryptor.finalize() == encryption.decrypt_by_agent_protocol("secret", protocol, garbage)
+
+
+@pytest.mark.parametrize("encrypted", [b"", b"Salted__salt", b"Salted__saltsalt" + b"x" * 17])
+def test_agent_decryptor_incomplete(encrypted: bytes) -> None:
+    decryptor = encryption.AgentDecryptor("secret", TransportProtocol.PBKDF2)
+    decryptor.update(encrypted)
+    with pytest.raises(ValueError):
+        decryptor.finalize()
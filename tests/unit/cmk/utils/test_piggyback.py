@@ -4,7 +4,7 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import os
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
 from datetime import datetime
 from pathlib import Path
 
@@ -31,21 +31,24 @@ _FREEZE_DATETIME = datetime.utcfromtimestamp(_REF_TIME + 10.0)
 def fixture_setup_files(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
     monkeypatch.setattr("cmk.utils.paths.piggyback_dir", tmp_path / "piggyback")
     monkeypatch.setattr("cmk.utils.paths.piggyback_source_dir", tmp_path / "piggyback_source")
+    monkeypatch.setattr("cmk.utils.paths.piggyback_index_dir", tmp_path / "piggyback_index")
 
-    host_dir = cmk.utils.paths.piggyback_dir / str(_TEST_HOST_NAME)
-    host_dir.mkdir(parents=True, exist_ok=False)
+    with freeze_time(datetime.utcfromtimestamp(_REF_TIME)):
+        piggyback.store_piggyback_raw_data(
+            HostName("source1"), {_TEST_HOST_NAME: [b"<<<check_mk>>>", b"lala"]}
+        )
 
-    source_file = host_dir / "source1"
-    with source_file.open(mode="wb") as f2:
-        f2.write(_PAYLOAD)
 
-    cmk.utils.paths.piggyback_source_dir.mkdir(parents=True, exist_ok=False)
-    source_status_file = cmk.utils.paths.piggyback_source_dir / "source1"
-    with source_status_file.open("wb") as f3:
-        f3.write(b"")
-
-    os.utime(str(source_file), (_REF_TIME, _REF_TIME))
-    os.utime(str(source_status_file), (_REF_TIME, _REF_TIME))
+def _fake_age_test_host_piggyback_file() -> None:
+    """source1 has sent data for test-host 10 seconds ago, but not anymore"""
+    with freeze_time(datetime.utcfromtimestamp(_REF_TIME - 10)):
+        piggyback.store_piggyback_raw_data(
+            HostName("source1"), {_TEST_HOST_NAME: [b"<<<check_mk>>>", b"lala"]}
+        )
+    with freeze_time(datetime.utcfromtimestamp(_REF_TIME)):
+        piggyback.store_piggyback_raw_data(
+            HostName("source1"), {HostName("another-host"): [b"<<<check_mk>>>", b"lulu"]}
+        )
 
 
 def test_piggyback_default_time_settings() -> None:
@@ -153,7 +156,7 @@ def test_get_piggyback_raw_data_successful(time_settings: piggyback.PiggybackTim
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is True
     assert raw_data.info.message == "Successfully processed from source 'source1'"
     assert raw_data.info.status == 0
@@ -166,16 +169,12 @@ def test_get_piggyback_raw_data_not_updated() -> None:
         (None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)
     ]
 
-    # Fake age the test-host piggyback file
-    os.utime(
-        str(cmk.utils.paths.piggyback_dir / str(_TEST_HOST_NAME) / "source1"),
-        (_REF_TIME - 10, _REF_TIME - 10),
-    )
+    _fake_age_test_host_piggyback_file()
 
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message == "Piggyback file not updated by source 'source1'"
     assert raw_data.info.status == 0
@@ -195,7 +194,7 @@ def test_get_piggyback_raw_data_not_sending() -> None:
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message == "Source 'source1' not sending piggyback data"
     assert raw_data.info.status == 0
@@ -209,7 +208,7 @@ def test_get_piggyback_raw_data_too_old_global() -> None:
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message.startswith("Piggyback file too old:")
     assert raw_data.info.status == 0
@@ -226,7 +225,7 @@ def test_get_piggyback_raw_data_too_old_source() -> None:
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message.startswith("Piggyback file too old:")
     assert raw_data.info.status == 0
@@ -244,7 +243,7 @@ def test_get_piggyback_raw_data_too_old_piggybacked_host() -> None:
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is False
     assert raw_data.info.message.startswith("Piggyback file too old:")
     assert raw_data.info.status == 0
@@ -294,7 +293,7 @@ def test_store_piggyback_raw_data_new_host() -> None:
     raw_data = _get_only_raw_data_element(HostName("pig"), time_settings)
 
     assert raw_data.info.source_hostname == "source2"
-    assert raw_data.info.file_path.parts[-2:] == ("pig", "source2")
+    assert raw_data.info.file_path.parent.name == "source2"
     assert raw_data.info.successfully_processed is True
     assert raw_data.info.message.startswith("Successfully processed from source 'source2'")
     assert raw_data.info.status == 0
@@ -326,13 +325,13 @@ def test_store_piggyback_raw_data_second_source() -> None:
 
     raw_data1, raw_data2 = raw_data_map["source1"], raw_data_map["source2"]
 
-    assert raw_data1.info.file_path.parts[-2:] == (str(_TEST_HOST_NAME), "source1")
+    assert raw_data1.info.file_path.parent.name == "source1"
     assert raw_data1.info.successfully_processed is True
     assert raw_data1.info.message.startswith("Successfully processed from source 'source1'")
     assert raw_data1.info.status == 0
     assert raw_data1.raw_data == _PAYLOAD
 
-    assert raw_data2.info.file_path.parts[-2:] == (str(_TEST_HOST_NAME), "source2")
+    assert raw_data2.info.file_path.parent.name == "source2"
     assert raw_data2.info.successfully_processed is True
     assert raw_data2.info.message.startswith("Successfully processed from source 'source2'")
     assert raw_data2.info.status == 0
@@ -358,12 +357,6 @@ def test_get_source_and_piggyback_hosts() -> None:
         },
     )
 
-    # Fake age the test-host piggyback file
-    os.utime(
-        str(cmk.utils.paths.piggyback_dir / "test-host" / "source1"),
-        (_REF_TIME - 10, _REF_TIME - 10),
-    )
-
     piggyback.store_piggyback_raw_data(
         HostName("source1"),
         {
@@ -397,6 +390,106 @@ def test_get_source_and_piggyback_hosts() -> None:
     )
 
 
+@pytest.mark.usefixtures("setup_files")
+def test_lookup_does_not_scan_piggyback_dirs(monkeypatch: MonkeyPatch) -> None:
+    scanned = []
+    files_in = piggyback._files_in
+
+    def _files_in(path: Path) -> Sequence[Path]:
+        scanned.append(path)
+        return files_in(path)
+
+    monkeypatch.setattr(piggyback, "_files_in", _files_in)
+
+    assert piggyback.get_source_hostnames(_TEST_HOST_NAME) == ["source1"]
+    assert piggyback.get_source_hostnames() == ["source1"]
+    assert _get_only_raw_data_element(
+        _TEST_HOST_NAME, [(None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)]
+    ).info.successfully_processed
+    assert scanned == [cmk.utils.paths.piggyback_index_dir] * 3
+
+
+@pytest.mark.usefixtures("setup_files")
+def test_cleanup_piggyback_files_updates_index() -> None:
+    _fake_age_test_host_piggyback_file()
+    with freeze_time(_FREEZE_DATETIME):
+        piggyback.cleanup_piggyback_files([(None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)])
+
+    assert piggyback.get_source_hostnames(_TEST_HOST_NAME) == []
+    assert piggyback.get_source_hostnames(HostName("another-host")) == ["source1"]
+    # Only the container with the data for another-host is left.
+    assert len(list((cmk.utils.paths.piggyback_dir / "source1").iterdir())) == 1
+
+
+def test_store_piggyback_raw_data_writes_one_container() -> None:
+    time_settings: piggyback.PiggybackTimeSettings = [
+        (None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE),
+    ]
+    piggybacked_raw_data = {
+        HostName(f"pig{n}"): [b"<<<check_mk>>>", b"pig%d" % n, b""] for n in range(1000)
+    }
+    piggyback.store_piggyback_raw_data(HostName("source1"), piggybacked_raw_data)
+
+    assert len(list((cmk.utils.paths.piggyback_dir / "source1").iterdir())) == 1
+    for piggybacked_hostname, lines in piggybacked_raw_data.items():
+        (raw_data,) = piggyback.get_piggyback_raw_data(piggybacked_hostname, time_settings)
+        assert raw_data.raw_data == b"\n".join(lines) + b"\n"
+
+
+def test_store_piggyback_raw_data_keeps_container_of_readers() -> None:
+    time_settings: piggyback.PiggybackTimeSettings = [
+        (None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE),
+    ]
+    piggyback.store_piggyback_raw_data(HostName("source1"), {HostName("pig"): [b"old"]})
+    sources = piggyback._get_sources_of(HostName("pig"))
+
+    piggyback.store_piggyback_raw_data(HostName("source1"), {HostName("pig"): [b"new data"]})
+
+    # A reader that has seen the old index still gets the old data.
+    (file_info,) = piggyback._get_piggyback_processed_file_infos(
+        HostName("pig"), time_settings, sources
+    )
+    assert piggyback._read_piggyback_data(file_info.file_path, sources["source1"]) == b"old\n"
+    assert _get_only_raw_data_element(HostName("pig"), time_settings).raw_data == b"new data\n"
+
+
+def test_store_piggyback_raw_data_removes_replaced_containers() -> None:
+    source_folder = cmk.utils.paths.piggyback_dir / "source1"
+    used: list[set[str]] = []
+    for n in range(5):
+        piggyback.store_piggyback_raw_data(HostName("source1"), {HostName("pig"): [b"%d" % n]})
+        used.append(
+            {entry.container for entry in piggyback._get_sources_of(HostName("pig")).values()}
+        )
+
+    # Only the containers of the current and the previous index are left.
+    assert {p.name for p in source_folder.iterdir()} == used[-1] | used[-2]
+
+
+def test_store_piggyback_raw_data_keeps_containers_of_other_hosts() -> None:
+    source_folder = cmk.utils.paths.piggyback_dir / "source1"
+    piggyback.store_piggyback_raw_data(HostName("source1"), {HostName("pig1"): [b"pig1"]})
+    for n in range(3):
+        piggyback.store_piggyback_raw_data(HostName("source1"), {HostName("pig2"): [b"%d" % n]})
+
+    assert len(list(source_folder.iterdir())) == 3
+    assert (
+        _get_only_raw_data_element(
+            HostName("pig1"), [(None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)]
+        ).raw_data
+        == b"pig1\n"
+    )
+
+
+def test_invalid_index_is_ignored() -> None:
+    cmk.utils.paths.piggyback_index_dir.mkdir(parents=True, exist_ok=True)
+    (cmk.utils.paths.piggyback_index_dir / "source1").write_bytes(b"{'test-host': 0}\n")
+    assert piggyback.get_source_hostnames() == []
+
+    piggyback.store_piggyback_raw_data(HostName("source1"), {_TEST_HOST_NAME: [b"lala"]})
+    assert piggyback.get_source_hostnames(_TEST_HOST_NAME) == ["source1"]
+
+
 @pytest.mark.parametrize(
     "time_settings, successfully_processed, reason, reason_status",
     [
@@ -435,7 +528,7 @@ def test_get_piggyback_raw_data_source_validity(
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is successfully_processed
     assert raw_data.info.message.startswith(reason)
     assert raw_data.info.status == reason_status
@@ -470,7 +563,7 @@ def test_get_piggyback_raw_data_source_validity2(
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is successfully_processed
     assert raw_data.info.message == reason
     assert raw_data.info.status == reason_status
@@ -511,16 +604,12 @@ def test_get_piggyback_raw_data_piggybacked_host_validity(
     reason: str,
     reason_status: int,
 ) -> None:
-    # Fake age the test-host piggyback file
-    os.utime(
-        str(cmk.utils.paths.piggyback_dir / "test-host" / "source1"),
-        (_REF_TIME - 10, _REF_TIME - 10),
-    )
+    _fake_age_test_host_piggyback_file()
 
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is successfully_processed
     assert raw_data.info.message.startswith(reason)
     assert raw_data.info.status == reason_status
@@ -551,16 +640,12 @@ def test_get_piggyback_raw_data_piggybacked_host_validity2(
     reason: str,
     reason_status: int,
 ) -> None:
-    # Fake age the test-host piggyback file
-    os.utime(
-        str(cmk.utils.paths.piggyback_dir / "test-host" / "source1"),
-        (_REF_TIME - 10, _REF_TIME - 10),
-    )
+    _fake_age_test_host_piggyback_file()
 
     raw_data = _get_only_raw_data_element(_TEST_HOST_NAME, time_settings)
 
     assert raw_data.info.source_hostname == "source1"
-    assert raw_data.info.file_path.parts[-2:] == ("test-host", "source1")
+    assert raw_data.info.file_path.parent.name == "source1"
     assert raw_data.info.successfully_processed is successfully_processed
     assert raw_data.info.message.startswith(reason)
     assert raw_data.info.status == reason_status
@@ -589,3 +674,44 @@ def test_get_piggyback_matching_time_settings(
             [HostName("source-host")], HostName("piggybacked-host"), time_settings
         )._expanded_settings.keys()
     ) == sorted(expected_time_setting_keys)
+
+
+def test_remove_piggybacked_host_data() -> None:
+    piggyback.store_piggyback_raw_data(HostName("source1"), {HostName("pig"): [b"lala"]})
+    piggyback.store_piggyback_raw_data(
+        HostName("source2"), {HostName("pig"): [b"lala"], HostName("pig2"): [b"lulu"]}
+    )
+
+    piggyback.remove_piggybacked_host_data(HostName("pig"))
+
+    assert piggyback.get_source_hostnames() == ["source2"]
+    assert not (cmk.utils.paths.piggyback_dir / "source1").exists()
+    assert len(list((cmk.utils.paths.piggyback_dir / "source2").iterdir())) == 1
+
+
+def test_rename_piggybacked_host() -> None:
+    time_settings: piggyback.PiggybackTimeSettings = [
+        (None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE),
+    ]
+    piggyback.store_piggyback_raw_data(HostName("source1"), {HostName("old"): [b"lala"]})
+
+    assert piggyback.rename_piggybacked_host(HostName("old"), HostName("new"))
+    assert not piggyback.rename_piggybacked_host(HostName("old"), HostName("new"))
+
+    assert not piggyback.get_piggyback_raw_data(HostName("old"), time_settings)
+    (raw_data,) = piggyback.get_piggyback_raw_data(HostName("new"), time_settings)
+    assert raw_data.raw_data == b"lala\n"
+
+
+def test_rename_source_host() -> None:
+    piggyback.store_piggyback_raw_data(HostName("old"), {HostName("pig"): [b"old"]})
+    piggyback.store_piggyback_raw_data(HostName("new"), {HostName("pig2"): [b"new"]})
+
+    assert piggyback.rename_source_host(HostName("old"), HostName("new"))
+    assert not piggyback.rename_source_host(HostName("old"), HostName("new"))
+
+    assert piggyback.get_source_hostnames() == ["new"]
+    (raw_data,) = piggyback.get_piggyback_raw_data(
+        HostName("pig"), [(None, "max_cache_age", _PIGGYBACK_MAX_CACHEFILE_AGE)]
+    )
+    assert raw_data.raw_data == b"old\n"
@@ -100,6 +100,13 @@ def _prepare_tmpfs(site_context):
     assert tmp_file.exists()
     files.append(tmp_file)
 
+    tmp_file = tmp_dir.joinpath("check_mk", "piggyback_index", "pig")
+    tmp_file.parent.mkdir(parents=True, exist_ok=True)
+    with tmp_file.open("w") as f:
+        f.write("restored!")
+    assert tmp_file.exists()
+    files.append(tmp_file)
+
     return files
 
 